@@ -3,12 +3,13 @@ set -euo pipefail
 
 # Smoke test: run a minimal pipeline on `example_transcription.txt`
 # Steps: ingest -> tokenize -> stats. Validate outputs exist and are non-empty.
+# Outputs go to data/processed unless SMOKE_OUT_DIR names another directory.
 
 ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
 echo "Running smoke test from $ROOT"
 
 INPUT="$ROOT/example_transcription.txt"
-OUT_DIR="$ROOT/data/processed"
+OUT_DIR="${SMOKE_OUT_DIR:-$ROOT/data/processed}"
 INGEST_OUT="$OUT_DIR/example.jsonl"
 TOK_OUT="$OUT_DIR/example_tokens.jsonl"
 NGRAM_OUT="$OUT_DIR/example_ngrams.json"
@@ -0,0 +1,262 @@
+"""
+Change-point detection over folio x token counts.
+
+Finds boundaries in the manuscript where the token distribution changes
+(candidate scribe, section or topic boundaries) and ranks them by how much
+they explain.
+
+A run of folios with token counts c (n tokens) costs n log n - sum c log c
+nats: the negative log-likelihood of its tokens under its own unigram
+distribution. Splitting a run at a boundary lowers the cost by its gain,
+n * JSD_w(left, right), the Jensen-Shannon divergence of the two sides
+weighted by their token shares. Costs of arbitrary runs are differences of
+prefix sums, so each candidate split costs one pass over the vocabulary.
+
+Two searches are provided:
+- `binary_segmentation`: repeatedly splits the run whose best split gains
+  most, which ranks boundaries from strongest to weakest
+- `pelt`: the segmentation minimizing total cost + penalty per boundary,
+  with the pruning of Killick et al. (2012), in close to linear time
+
+The default penalty is calibrated on the data itself: the given quantile of
+the best single-split gain over random folio orders, i.e. the gain a boundary
+would reach by chance when folio order carried no information.
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.special import xlogy
+
+# (segments x tokens) cells evaluated at once
+COST_BLOCK = 1 << 22
+PERMUTATIONS = 20
+
+
+class SegmentCost:
+    """Multinomial negative log-likelihood of contiguous folio runs."""
+
+    def __init__(self, counts):
+        """
+        Args:
+            counts: (folios x tokens) counts, dense or scipy.sparse, rows in manuscript order
+        """
+        counts = sparse.csc_matrix(counts)
+        totals = np.asarray(counts.sum(axis=0)).ravel()
+        # tokens seen once contribute 1 log 1 = 0 to every run; they only count toward n
+        self.rows = counts[:, totals > 1].toarray().astype(float)
+        self.row_totals = np.asarray(counts.sum(axis=1), dtype=float).ravel()
+        self._accumulate()
+
+    def _accumulate(self):
+        self.n_folios = len(self.rows)
+        self.prefix = np.vstack([np.zeros((1, self.rows.shape[1])), np.cumsum(self.rows, axis=0)])
+        self.total_prefix = np.r_[0.0, np.cumsum(self.row_totals)]
+
+    def permuted(self, order) -> 'SegmentCost':
+        """The same folios in another order."""
+        other = object.__new__(SegmentCost)
+        other.rows, other.row_totals = self.rows[order], self.row_totals[order]
+        other._accumulate()
+        return other
+
+    def __call__(self, starts, ends) -> np.ndarray:
+        """Cost of the runs [starts[i], ends[i])."""
+        starts, ends = np.broadcast_arrays(np.asarray(starts, dtype=np.int64), np.asarray(ends, dtype=np.int64))
+        n = self.total_prefix[ends] - self.total_prefix[starts]
+        cost = xlogy(n, n)
+        batch = max(1, COST_BLOCK // max(self.prefix.shape[1], 1))
+        for i in range(0, len(starts), batch):
+            c = self.prefix[ends[i:i + batch]] - self.prefix[starts[i:i + batch]]
+            cost[i:i + batch] -= xlogy(c, c).sum(axis=1)
+        return cost
+
+    def tokens(self, start: int, end: int) -> float:
+        return float(self.total_prefix[end] - self.total_prefix[start])
+
+    def best_split(self, start: int, end: int, min_size: int = 1) -> Tuple[int, float]:
+        """Split point of [start, end) with the largest gain, or (-1, 0.0) if none is allowed."""
+        splits = np.arange(start + min_size, end - min_size + 1)
+        if not len(splits):
+            return -1, 0.0
+        gains = self([start], [end])[0] - self(np.full(len(splits), start), splits) - self(splits, np.full(len(splits), end))
+        best = int(np.argmax(gains))
+        return int(splits[best]), float(gains[best])
+
+
+def binary_segmentation(cost: SegmentCost, min_size: int = 1, max_changes: int = None,
+                        penalty: float = 0.0) -> List[Dict]:
+    """
+    Greedy binary segmentation.
+
+    Args:
+        cost: Segment cost over the folio sequence
+        min_size: Minimum number of folios per segment
+        max_changes: Stop after this many boundaries (default: no limit)
+        penalty: Only accept splits gaining more than this (nats)
+
+    Returns:
+        Boundaries in the order they were found (strongest first), each with
+        the run it split and its gain
+    """
+    runs = {(0, cost.n_folios): cost.best_split(0, cost.n_folios, min_size)}
+    found = []
+    while runs and (max_changes is None or len(found) < max_changes):
+        (start, end), (split, gain) = max(runs.items(), key=lambda item: item[1][1])
+        if split < 0 or gain <= penalty:
+            break
+        del runs[(start, end)]
+        found.append({'position': split, 'gain': gain, 'segment_start': start, 'segment_end': end,
+                      'segment_tokens': cost.tokens(start, end)})
+        for run in ((start, split), (split, end)):
+            runs[run] = cost.best_split(*run, min_size)
+    return found
+
+
+def pelt(cost: SegmentCost, penalty: float, min_size: int = 1) -> List[int]:
+    """
+    Optimal segmentation under a per-boundary penalty (PELT).
+
+    Splitting a run never increases its cost, so candidates whose cost
+    already exceeds the optimum can be pruned for good.
+
+    Returns:
+        Sorted boundary positions (index of the first folio of each new segment)
+    """
+    n = cost.n_folios
+    best = np.full(n + 1, np.inf)
+    best[0] = -penalty
+    last = np.zeros(n + 1, dtype=np.int64)
+    candidates = np.zeros(1, dtype=np.int64)
+    for t in range(min_size, n + 1):
+        if t - min_size >= min_size:
+            candidates = np.append(candidates, t - min_size)
+        values = best[candidates] + cost(candidates, np.full(len(candidates), t))
+        i = int(np.argmin(values))
+        best[t] = values[i] + penalty
+        last[t] = candidates[i]
+        candidates = candidates[values <= best[t]]
+    boundaries = []
+    t = n
+    while t > 0:
+        t = int(last[t])
+        if t > 0:
+            boundaries.append(t)
+    return sorted(boundaries)
+
+
+def permutation_penalty(cost: SegmentCost, quantile: float = 0.95, permutations: int = PERMUTATIONS,
+                        min_size: int = 1, seed: int = 0) -> float:
+    """Quantile of the best single-split gain over random folio orders."""
+    rng = np.random.default_rng(seed)
+    gains = []
+    for _ in range(permutations):
+        shuffled = cost.permuted(rng.permutation(cost.n_folios))
+        gains.append(shuffled.best_split(0, shuffled.n_folios, min_size)[1])
+    return float(np.quantile(gains, quantile)) if gains else 0.0
+
+
+def local_gains(cost: SegmentCost, boundaries: Sequence[int]) -> List[Dict]:
+    """Gain of each boundary given its neighbours (the segments it separates)."""
+    edges = [0] + list(boundaries) + [cost.n_folios]
+    out = []
+    for start, split, end in zip(edges, edges[1:], edges[2:]):
+        gain = float(cost([start], [end])[0] - cost([start], [split])[0] - cost([split], [end])[0])
+        out.append({'position': split, 'gain': gain, 'segment_start': start, 'segment_end': end,
+                    'segment_tokens': cost.tokens(start, end)})
+    return out
+
+
+def detect_change_points(counts, folios: Sequence[str], method: str = 'binseg', penalty: float = None,
+                         min_size: int = 2, max_changes: int = None, quantile: float = 0.95,
+                         permutations: int = PERMUTATIONS, seed: int = 0) -> pd.DataFrame:
+    """
+    Ranked change-point candidates over a folio sequence.
+
+    Args:
+        counts: (folios x tokens) counts, rows in manuscript order
+        folios: Folio identifiers of the rows
+        method: 'binseg' (greedy binary segmentation) or 'pelt'
+        penalty: Minimum gain (nats) per boundary; default calibrated by folio permutations
+        min_size: Minimum number of folios per segment
+        max_changes: Maximum number of boundaries (binseg only)
+        quantile: Quantile of the permutation null used as the default penalty
+        permutations: Number of random folio orders for the default penalty
+        seed: Seed of the permutations
+
+    Returns:
+        DataFrame ranked by gain: boundary folio (first folio of the new
+        segment), the folio before it, gain in nats, the weighted JSD between
+        the two sides (gain per token, nats) and gain relative to the penalty
+    """
+    if method not in ('binseg', 'pelt'):
+        raise ValueError(f"Unknown change-point method: {method}")
+    cost = SegmentCost(counts)
+    if penalty is None:
+        penalty = permutation_penalty(cost, quantile, permutations, min_size, seed)
+    if method == 'binseg':
+        found = binary_segmentation(cost, min_size, max_changes, penalty)
+    else:
+        found = local_gains(cost, pelt(cost, penalty, min_size))
+
+    columns = ['rank', 'position', 'folio', 'previous_folio', 'gain', 'jsd', 'score',
+               'segment_start', 'segment_end']
+    if not found:
+        return pd.DataFrame(columns=columns)
+    df = pd.DataFrame(found).sort_values('gain', ascending=False, kind='stable').reset_index(drop=True)
+    folios = np.asarray(folios, dtype=object)
+    df['folio'] = folios[df['position']]
+    df['previous_folio'] = folios[df['position'] - 1]
+    df['jsd'] = df['gain'] / df.pop('segment_tokens')
+    df['score'] = df['gain'] / penalty if penalty > 0 else np.inf
+    df['segment_start'] = folios[df['segment_start']]
+    df['segment_end'] = folios[df['segment_end'] - 1]
+    df['rank'] = np.arange(1, len(df) + 1)
+    return df[columns]
+
+
+def main():
+    """Detect change points for one or more token coordinate files (e.g. transcription variants)."""
+    import argparse
+
+    try:
+        from .temporal_evolution import TemporalAnalyzer
+    except ImportError:
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+        from src.analysis.temporal_evolution import TemporalAnalyzer
+
+    parser = argparse.ArgumentParser(description='Rank vocabulary change points across Voynich folios')
+    parser.add_argument('--token-coords', type=str, nargs='+',
+                       default=['data/processed/token_coords.jsonl'],
+                       help='Token coordinates files (JSONL or token store), one per variant')
+    parser.add_argument('--method', choices=['binseg', 'pelt'], default='binseg')
+    parser.add_argument('--penalty', type=float, default=None,
+                       help='Minimum gain per boundary in nats (default: folio-permutation quantile)')
+    parser.add_argument('--min-size', type=int, default=2, help='Minimum folios per segment')
+    parser.add_argument('--max-changes', type=int, default=None)
+    parser.add_argument('--out', type=str, default='reports/change_points.csv')
+
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    frames = []
+    for path in args.token_coords:
+        analyzer = TemporalAnalyzer(path, out.parent)
+        found = analyzer.detect_change_points(args.method, args.penalty, args.min_size, args.max_changes)
+        found.insert(0, 'source', path)
+        frames.append(found)
+        print(f"{path}: {len(found)} change points")
+        for row in found.head(10).itertuples():
+            print(f"  {row.rank:>2}. {row.previous_folio} | {row.folio}  gain={row.gain:.1f}  jsd={row.jsd:.4f}")
+
+    out.parent.mkdir(parents=True, exist_ok=True)
+    pd.concat(frames, ignore_index=True).to_csv(out, index=False)
+    print(f"Saved change points to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -15,6 +15,11 @@ Metrics computed:
 
 Usage:
   python3 src/analysis/report_metrics.py --input data/processed/voynich_takahashi.jsonl
+  python3 src/analysis/report_metrics.py --sketch shard1.json shard2.json
+
+With `--sketch`, metrics are computed over the merged n-gram sketches written by
+`src/analytics/stats.py --sketch` instead of a single JSONL (sketch bigrams do
+not cross line boundaries).
 
 """
 from __future__ import annotations
@@ -22,9 +27,12 @@ import argparse
 import json
 import math
 import re
+import sys
 from collections import Counter
 from pathlib import Path
 from typing import List, Tuple
+
+import numpy as np
 try:
     from ..utils.experiment_logger import enrich_record, make_run_id
 except Exception:
@@ -32,6 +40,13 @@ except Exception:
         return r
     def make_run_id():
         return 'local'
+try:
+    from ..analytics.sketch import NgramSketch, merge_all
+    from ..analytics.vocab import Vocabulary, count_keys, key_strings, ngram_keys, top_k, unigram_counts
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.analytics.sketch import NgramSketch, merge_all
+    from src.analytics.vocab import Vocabulary, count_keys, key_strings, ngram_keys, top_k, unigram_counts
 
 TOKEN_RE = re.compile(r"[a-z0-9]+", re.IGNORECASE)
 
@@ -59,14 +74,27 @@ def shannon_entropy(counter: Counter) -> float:
     return ent
 
 
+def entropy_from_counts(counts: np.ndarray) -> float:
+    counts = np.asarray(counts)
+    counts = counts[counts > 0]
+    if len(counts) == 0:
+        return 0.0
+    p = counts / counts.sum()
+    return float(-(p * np.log2(p)).sum())
+
+
 def zipf_slope(counter: Counter) -> float | None:
-    freqs = sorted(counter.values(), reverse=True)
-    if len(freqs) < 3:
+    return zipf_slope_from_counts(np.fromiter(counter.values(), dtype=float, count=len(counter)))
+
+
+def zipf_slope_from_counts(counts: np.ndarray) -> float | None:
+    counts = np.asarray(counts, dtype=float)
+    counts = counts[counts > 0]
+    if len(counts) < 3:
         return None
-    import numpy as np
 
-    ranks = np.arange(1, len(freqs) + 1)
-    vals = np.array(freqs, dtype=float)
+    vals = np.sort(counts)[::-1]
+    ranks = np.arange(1, len(vals) + 1)
     # use top N points to avoid tail noise
     N = min(len(vals), 1000)
     x = np.log10(ranks[:N])
@@ -96,33 +124,54 @@ def read_lines_from_jsonl(path: Path) -> List[str]:
 
 
 def compute_metrics(lines: List[str]) -> dict:
-    tokens = []
-    for t in lines:
-        tokens.extend(tokenize(t))
-
-    uni = Counter(tokens)
-    bi = Counter(' '.join(ng) for ng in ngrams(tokens, 2))
-    total_tokens = sum(uni.values())
-    vocab = len(uni)
-    hapax = sum(1 for v in uni.values() if v == 1)
-    hapax_ratio = hapax / vocab if vocab else 0.0
-    entropy = shannon_entropy(uni)
-    zipf = zipf_slope(uni)
+    vocab = Vocabulary()
+    ids = vocab.encode(tok for t in lines for tok in tokenize(t))
+    return metrics_from_ids(len(lines), vocab, ids)
+
+
+def metrics_from_ids(n_lines: int, vocab: Vocabulary, ids: np.ndarray) -> dict:
+    """Compute metrics from a flat array of token ids (bigrams span lines, as before)."""
+    size = len(vocab)
+    uni = unigram_counts(ids, size)
+    bi_keys, bi_counts = count_keys(ngram_keys(ids, 2, size))
+    total_tokens = int(uni.sum())
+    vocab_size = int((uni > 0).sum())
+    hapax = int((uni == 1).sum())
+    hapax_ratio = hapax / vocab_size if vocab_size else 0.0
+    top_bi = top_k(bi_counts, 30)
 
     metrics = {
-        'lines': len(lines),
+        'lines': n_lines,
         'tokens': total_tokens,
-        'vocab_size': vocab,
+        'vocab_size': vocab_size,
         'hapax_legomena': hapax,
         'hapax_ratio': hapax_ratio,
-        'unigram_entropy_bits': entropy,
-        'zipf_slope_loglog': zipf,
-        'top_unigrams': uni.most_common(30),
-        'top_bigrams': bi.most_common(30),
+        'unigram_entropy_bits': entropy_from_counts(uni),
+        'zipf_slope_loglog': zipf_slope_from_counts(uni),
+        'top_unigrams': [(vocab.tokens[i], int(uni[i])) for i in top_k(uni, 30).tolist()],
+        'top_bigrams': list(zip(key_strings(bi_keys[top_bi], 2, vocab), bi_counts[top_bi].tolist())),
     }
     return metrics
 
 
+def metrics_from_sketch(sketch: NgramSketch) -> dict:
+    """Compute the same metrics from a (merged) n-gram sketch."""
+    uni = np.fromiter(sketch.exact[1].values(), dtype=np.int64, count=len(sketch.exact[1]))
+    vocab_size = int((uni > 0).sum())
+    hapax = int((uni == 1).sum())
+    return {
+        'lines': sketch.lines,
+        'tokens': sketch.tokens,
+        'vocab_size': vocab_size,
+        'hapax_legomena': hapax,
+        'hapax_ratio': hapax / vocab_size if vocab_size else 0.0,
+        'unigram_entropy_bits': entropy_from_counts(uni),
+        'zipf_slope_loglog': zipf_slope_from_counts(uni),
+        'top_unigrams': sketch.top(1, 30),
+        'top_bigrams': sketch.top(2, 30) if sketch.max_n >= 2 else [],
+    }
+
+
 def interpret_metrics(metrics: dict) -> List[str]:
     notes = []
     ent = metrics.get('unigram_entropy_bits', 0.0)
@@ -199,14 +248,18 @@ def save_results(metrics: dict, out_dir: Path):
 
 def main():
     parser = argparse.ArgumentParser(description='Compute experiment metrics for Voynich processed file')
-    parser.add_argument('--input', required=True, help='Path to processed JSONL with `text` field')
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument('--input', help='Path to processed JSONL with `text` field')
+    src.add_argument('--sketch', nargs='+', help='N-gram sketch JSON files (one per shard) to merge')
     parser.add_argument('--out', default='reports', help='Output directory to write experiment_metrics.json and .md')
     args = parser.parse_args()
 
-    input_p = Path(args.input)
     out_p = Path(args.out)
-    lines = read_lines_from_jsonl(input_p)
-    metrics = compute_metrics(lines)
+    if args.sketch:
+        metrics = metrics_from_sketch(merge_all(NgramSketch.load(p) for p in args.sketch))
+    else:
+        lines = read_lines_from_jsonl(Path(args.input))
+        metrics = compute_metrics(lines)
     save_results(metrics, out_p)
 
 
@@ -6,41 +6,214 @@ Analyzes token usage patterns across manuscript pages to detect:
 - Vocabulary diversity changes across sections
 - Temporal clustering of specific tokens
 - Statistical shifts that might indicate authorial changes or topic shifts
+
+Folio statistics are computed in one pass over integer token ids; the
+analyzer keeps a sparse folio x token count matrix (`folio_token_counts`,
+rows in manuscript order, columns indexing `vocab`) that the evolution and
+shift analyses read instead of per-folio token lists.
+
+Figures are optional: `run_full_analysis(render=False)` computes the metrics
+and report only, and `render_figures` draws them later, in any matplotlib
+format (e.g. svg) and optionally in parallel processes. matplotlib and
+seaborn are imported only when a figure is drawn; the backend is left alone
+(so notebooks keep plotting inline) except in render worker processes and
+the command line entry point, which use Agg.
 """
 
 import json
+import sys
 import pandas as pd
 import numpy as np
+from multiprocessing import Pool
 from pathlib import Path
-from collections import Counter, defaultdict
 from typing import Dict, List, Tuple
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import entropy
+from scipy import sparse
+from scipy.special import rel_entr
+
+try:
+    from ..analytics.vocab import top_k
+    from ..ingest.token_store import is_token_store, load_token_store
+    from .change_points import detect_change_points
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.analytics.vocab import top_k
+    from src.ingest.token_store import is_token_store, load_token_store
+    from src.analysis.change_points import detect_change_points
+
+# (window positions x tokens) cells evaluated at once by the shift scan
+SHIFT_BLOCK = 1 << 22
+FIGURES = ('token_frequency_heatmap', 'vocabulary_diversity_evolution', 'vocabulary_shifts')
+# heatmap cells are annotated with their value only up to this many cells
+ANNOTATE_MAX_CELLS = 400
+
+
+def _pyplot():
+    """pyplot, imported on first use."""
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _use_agg():
+    """Select the non-interactive backend (worker processes and the CLI only)."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def plot_token_frequency_heatmap(freq_df: pd.DataFrame, output_path: Path, dpi: int = 300,
+                                 annotate: bool = None):
+    """Heatmap of token frequencies (rows: tokens, columns: folios)."""
+    plt = _pyplot()
+    import seaborn as sns
+    
+    if annotate is None:
+        annotate = freq_df.size <= ANNOTATE_MAX_CELLS
+    plt.figure(figsize=(14, 8))
+    sns.heatmap(freq_df, cmap='YlOrRd', annot=annotate, fmt='.2f', 
+               cbar_kws={'label': 'Token Frequency'})
+    plt.title(f'Token Frequency Evolution Across Manuscript (Top {len(freq_df)} Tokens)', 
+             fontsize=14, fontweight='bold')
+    plt.xlabel('Folio', fontsize=12)
+    plt.ylabel('Token', fontsize=12)
+    plt.tight_layout()
+    
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    print(f"Saved heatmap to {output_path}")
+    plt.close()
+
+
+def plot_vocabulary_diversity(folio_stats: pd.DataFrame, output_path: Path, dpi: int = 300):
+    """Type-token ratio, token counts and unique tokens per folio."""
+    plt = _pyplot()
+    
+    fig, axes = plt.subplots(2, 1, figsize=(14, 10))
+    
+    # Plot 1: Vocabulary diversity (type-token ratio)
+    axes[0].plot(range(len(folio_stats)), 
+                folio_stats['vocabulary_diversity'], 
+                marker='o', linewidth=2, markersize=6, color='steelblue')
+    axes[0].axhline(folio_stats['vocabulary_diversity'].mean(), 
+                   color='red', linestyle='--', linewidth=2, 
+                   label=f'Mean: {folio_stats["vocabulary_diversity"].mean():.3f}')
+    axes[0].set_xlabel('Folio Sequence', fontsize=12)
+    axes[0].set_ylabel('Vocabulary Diversity\n(Type-Token Ratio)', fontsize=12)
+    axes[0].set_title('Vocabulary Diversity Evolution Across Manuscript', 
+                     fontsize=14, fontweight='bold')
+    axes[0].grid(True, alpha=0.3)
+    axes[0].legend()
+    axes[0].set_xticks(range(len(folio_stats)))
+    axes[0].set_xticklabels(folio_stats['folio'], rotation=45, ha='right')
+    
+    # Plot 2: Token count and unique tokens
+    x = range(len(folio_stats))
+    axes[1].bar(x, folio_stats['token_count'], alpha=0.6, 
+               label='Total Tokens', color='skyblue')
+    axes[1].plot(x, folio_stats['unique_tokens'], marker='o', 
+                linewidth=2, markersize=6, color='darkgreen', 
+                label='Unique Tokens')
+    axes[1].set_xlabel('Folio Sequence', fontsize=12)
+    axes[1].set_ylabel('Count', fontsize=12)
+    axes[1].set_title('Token Count vs Unique Tokens per Folio', 
+                     fontsize=14, fontweight='bold')
+    axes[1].grid(True, alpha=0.3, axis='y')
+    axes[1].legend()
+    axes[1].set_xticks(range(len(folio_stats)))
+    axes[1].set_xticklabels(folio_stats['folio'], rotation=45, ha='right')
+    
+    plt.tight_layout()
+    
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    print(f"Saved diversity plot to {output_path}")
+    plt.close()
+
+
+def plot_vocabulary_shifts(shifts: pd.DataFrame, output_path: Path, dpi: int = 300):
+    """Jaccard similarity and JSD between adjacent folio windows."""
+    plt = _pyplot()
+    
+    fig, axes = plt.subplots(2, 1, figsize=(14, 10))
+    
+    # Plot 1: Jaccard similarity
+    x = range(len(shifts))
+    axes[0].plot(x, shifts['jaccard_similarity'], marker='o', 
+                linewidth=2, markersize=6, color='purple')
+    axes[0].axhline(shifts['jaccard_similarity'].mean(), 
+                   color='red', linestyle='--', linewidth=2,
+                   label=f'Mean: {shifts["jaccard_similarity"].mean():.3f}')
+    axes[0].set_xlabel('Window Transition', fontsize=12)
+    axes[0].set_ylabel('Jaccard Similarity', fontsize=12)
+    axes[0].set_title('Vocabulary Overlap Between Adjacent Folio Windows', 
+                     fontsize=14, fontweight='bold')
+    axes[0].grid(True, alpha=0.3)
+    axes[0].legend()
+    axes[0].set_ylim(0, 1)
+    
+    # Plot 2: Jensen-Shannon Divergence
+    axes[1].plot(x, shifts['jsd_distance'], marker='s', 
+                linewidth=2, markersize=6, color='coral')
+    axes[1].axhline(shifts['jsd_distance'].mean(), 
+                   color='red', linestyle='--', linewidth=2,
+                   label=f'Mean: {shifts["jsd_distance"].mean():.3f}')
+    axes[1].set_xlabel('Window Transition', fontsize=12)
+    axes[1].set_ylabel('Jensen-Shannon Divergence', fontsize=12)
+    axes[1].set_title('Statistical Distance Between Adjacent Folio Windows', 
+                     fontsize=14, fontweight='bold')
+    axes[1].grid(True, alpha=0.3)
+    axes[1].legend()
+    
+    plt.tight_layout()
+    
+    plt.savefig(output_path, dpi=dpi, bbox_inches='tight')
+    print(f"Saved vocabulary shifts plot to {output_path}")
+    plt.close()
+
+
+def _render(job):
+    plot, data, output_path, dpi, options = job
+    plot(data, output_path, dpi, **options)
+    return output_path
 
 
 class TemporalAnalyzer:
     """Analyzes temporal patterns in Voynich Manuscript token usage."""
     
-    def __init__(self, token_coords_path: str, output_dir: str = "reports/figures/timeline"):
+    def __init__(self, token_coords_path: str, output_dir: str = "reports/figures/timeline",
+                 figure_format: str = 'png', dpi: int = 300, annotate: bool = None):
         """
         Initialize the temporal analyzer.
         
         Args:
-            token_coords_path: Path to token_coords.jsonl file
-            output_dir: Directory to save visualizations
+            token_coords_path: Path to token_coords.jsonl or a columnar token store
+            output_dir: Directory to save visualizations (created when figures are drawn)
+            figure_format: File format of the figures (png, svg, pdf, ...)
+            dpi: Resolution of raster figures
+            annotate: Write each value into the frequency heatmap's cells
+                (default: only when it has at most `ANNOTATE_MAX_CELLS` cells)
         """
         self.token_coords_path = Path(token_coords_path)
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.figure_format = figure_format.lstrip('.')
+        self.dpi = dpi
+        self.annotate = annotate
         
         self.tokens_df = None
         self.folio_stats = None
+        # set by compute_folio_statistics: folios (manuscript order) x tokens counts
+        # and the token of each column, numbered by first appearance in that order
+        self.folio_token_counts = None
+        self.vocab: List[str] = []
+        self.token_ids: Dict[str, int] = {}
+        self._token_columns = None
+        self._shifts: Dict[int, pd.DataFrame] = {}
         
     def load_data(self) -> pd.DataFrame:
         """Load token coordinate data."""
         print(f"Loading token data from {self.token_coords_path}...")
         
+        if is_token_store(self.token_coords_path):
+            self.tokens_df = load_token_store(self.token_coords_path).to_dataframe(bbox=False)
+            print(f"Loaded {len(self.tokens_df)} tokens from {self.tokens_df['folio'].nunique()} folios")
+            return self.tokens_df
+        
         tokens = []
         with open(self.token_coords_path, 'r', encoding='utf-8') as f:
             for line in f:
@@ -74,42 +247,156 @@ class TemporalAnalyzer:
         return 0, 'r'
     
     def compute_folio_statistics(self) -> pd.DataFrame:
-        """Compute statistics for each folio."""
+        """Compute statistics for each folio.
+
+        Tokens and folios are factorized to integer codes once; every
+        (folio, token) pair is then counted with a single `np.unique`, which
+        also yields the folio x token count matrix and each folio's most
+        common token (ties go to the token seen first in that folio).
+        """
         if self.tokens_df is None:
             self.load_data()
         
         print("Computing folio-level statistics...")
         
-        stats = []
-        for folio in sorted(self.tokens_df['folio'].unique(), 
-                          key=lambda x: self.extract_folio_order(x)[0]):
-            folio_tokens = self.tokens_df[self.tokens_df['folio'] == folio]
-            
-            tokens_list = folio_tokens['token'].tolist()
-            token_counts = Counter(tokens_list)
-            
-            order, side = self.extract_folio_order(folio)
-            
-            stat = {
-                'folio': folio,
-                'order': order,
-                'side': side,
-                'token_count': len(tokens_list),
-                'unique_tokens': len(token_counts),
-                'vocabulary_diversity': len(token_counts) / len(tokens_list) if tokens_list else 0,
-                'most_common_token': token_counts.most_common(1)[0][0] if token_counts else None,
-                'most_common_freq': token_counts.most_common(1)[0][1] if token_counts else 0,
-                'repetition_rate': token_counts.most_common(1)[0][1] / len(tokens_list) if tokens_list else 0,
-                'tokens': tokens_list
-            }
-            
-            stats.append(stat)
-        
-        self.folio_stats = pd.DataFrame(stats)
+        tok_codes, tok_names = pd.factorize(self.tokens_df['token'])
+        folio_codes, folio_names = pd.factorize(self.tokens_df['folio'])
+        keep = (tok_codes >= 0) & (folio_codes >= 0)
+        tok_codes, folio_codes = tok_codes[keep], folio_codes[keep]
+        folio_names = [str(f) for f in folio_names]
+        n_folios, n_types = len(folio_names), len(tok_names)
+        
+        # manuscript order; folios with equal order keep their first-seen order
+        orders = [self.extract_folio_order(f) for f in folio_names]
+        rank = sorted(range(n_folios), key=lambda i: orders[i][0])
+        position = np.empty(n_folios, dtype=np.int64)
+        position[rank] = np.arange(n_folios)
+        
+        keys = position[folio_codes] * n_types + tok_codes
+        pairs, first, counts = np.unique(keys, return_index=True, return_counts=True)
+        pair_folio, pair_tok = pairs // n_types, pairs % n_types
+        
+        # number tokens by first appearance in manuscript order (as a Counter over all folios would)
+        _, first_pair = np.unique(pair_tok, return_index=True)
+        token_order = np.lexsort((first[first_pair], pair_folio[first_pair]))
+        new_id = np.empty(n_types, dtype=np.int64)
+        new_id[token_order] = np.arange(n_types)
+        self.vocab = [str(tok_names[i]) for i in token_order]
+        self.token_ids = {t: i for i, t in enumerate(self.vocab)}
+        self.folio_token_counts = sparse.csr_matrix(
+            (counts, (pair_folio, new_id[pair_tok])), shape=(n_folios, n_types), dtype=np.int64)
+        self._token_columns = None
+        self._shifts = {}
+        
+        token_count = np.bincount(pair_folio, weights=counts, minlength=n_folios).astype(np.int64)
+        unique_tokens = np.bincount(pair_folio, minlength=n_folios)
+        # per folio: highest count, then earliest first occurrence
+        best = np.lexsort((first, -counts, pair_folio))
+        best = best[np.r_[True, pair_folio[best][1:] != pair_folio[best][:-1]]] if len(best) else best
+        top_tok = np.full(n_folios, -1, dtype=np.int64)
+        top_freq = np.zeros(n_folios, dtype=np.int64)
+        top_tok[pair_folio[best]] = new_id[pair_tok[best]]
+        top_freq[pair_folio[best]] = counts[best]
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            diversity = np.where(token_count > 0, unique_tokens / token_count, 0.0)
+            repetition = np.where(token_count > 0, top_freq / token_count, 0.0)
+        self.folio_stats = pd.DataFrame({
+            'folio': [folio_names[i] for i in rank],
+            'order': [orders[i][0] for i in rank],
+            'side': [orders[i][1] for i in rank],
+            'token_count': token_count,
+            'unique_tokens': unique_tokens,
+            'vocabulary_diversity': diversity,
+            'most_common_token': [self.vocab[t] if t >= 0 else None for t in top_tok.tolist()],
+            'most_common_freq': top_freq,
+            'repetition_rate': repetition,
+        })
         print(f"Computed statistics for {len(self.folio_stats)} folios")
         
         return self.folio_stats
     
+    def token_totals(self) -> np.ndarray:
+        """Occurrences of every `vocab` token across all folios."""
+        if self.folio_stats is None:
+            self.compute_folio_statistics()
+        return np.asarray(self.folio_token_counts.sum(axis=0)).ravel()
+    
+    def most_common_tokens(self, n: int) -> List[Tuple[str, int]]:
+        """The `n` most frequent tokens, ties in order of first appearance."""
+        totals = self.token_totals()
+        return [(self.vocab[i], int(totals[i])) for i in top_k(totals, n).tolist()]
+    
+    def token_columns(self, tokens: List[str] = None) -> Tuple[List[str], sparse.csc_matrix]:
+        """
+        Folio x token count columns for `tokens` (default: the whole vocabulary).
+        
+        Unknown tokens get an all-zero column. Columns come from a CSC copy of
+        `folio_token_counts` built once, so each is a slice of its stored
+        folios rather than a scan over all tokens.
+        """
+        if self.folio_stats is None:
+            self.compute_folio_statistics()
+        if self._token_columns is None:
+            self._token_columns = self.folio_token_counts.tocsc()
+            self._token_columns.sort_indices()
+        if tokens is None:
+            return list(self.vocab), self._token_columns
+        tokens = list(tokens)
+        ids = np.array([self.token_ids.get(t, -1) for t in tokens], dtype=np.int64)
+        known = ids >= 0
+        if known.all():
+            return tokens, self._token_columns[:, ids]
+        # unknown tokens select an appended empty column
+        padded = sparse.hstack([self._token_columns, sparse.csc_matrix((len(self.folio_stats), 1), dtype=np.int64)],
+                               format='csc')
+        return tokens, padded[:, np.where(known, ids, padded.shape[1] - 1)]
+    
+    def token_evolution_matrix(self, tokens: List[str] = None, relative: bool = True) -> pd.DataFrame:
+        """
+        Per-folio usage of many tokens at once (rows: tokens, columns: folios in order).
+        
+        Args:
+            tokens: Tokens to include (default: the whole vocabulary)
+            relative: Frequencies within each folio instead of absolute counts
+            
+        Returns:
+            DataFrame of token frequencies (or counts) per folio
+        """
+        tokens, columns = self.token_columns(tokens)
+        values = columns.T.toarray()
+        if relative:
+            totals = self.folio_stats['token_count'].to_numpy()
+            values = np.where(totals > 0, values / np.maximum(totals, 1), 0.0)
+        return pd.DataFrame(values, index=tokens, columns=self.folio_stats['folio'].values)
+    
+    def analyze_token_evolutions(self, tokens: List[str] = None) -> pd.DataFrame:
+        """
+        Evolution summary for many tokens at once.
+        
+        Args:
+            tokens: Tokens to analyze (default: the whole vocabulary)
+            
+        Returns:
+            DataFrame indexed by token with first/last appearance, total
+            occurrences and number of folios containing the token
+        """
+        tokens, columns = self.token_columns(tokens)
+        columns.sort_indices()
+        appears = np.diff(columns.indptr).astype(np.int64)
+        present = appears > 0
+        folios = self.folio_stats['folio'].to_numpy(dtype=object)
+        first = np.full(len(tokens), None, dtype=object)
+        last = np.full(len(tokens), None, dtype=object)
+        first[present] = folios[columns.indices[columns.indptr[:-1][present]]]
+        last[present] = folios[columns.indices[columns.indptr[1:][present] - 1]]
+        return pd.DataFrame({
+            'first_appearance': first,
+            'last_appearance': last,
+            'total_occurrences': np.asarray(columns.sum(axis=0)).ravel(),
+            'appears_in_folios': appears,
+        }, index=pd.Index(tokens, name='token'))
+    
     def analyze_token_evolution(self, token: str) -> Dict:
         """
         Analyze how a specific token's usage evolves across folios.
@@ -120,27 +407,23 @@ class TemporalAnalyzer:
         Returns:
             Dictionary with evolution statistics
         """
-        if self.folio_stats is None:
-            self.compute_folio_statistics()
-        
-        evolution = []
-        for _, row in self.folio_stats.iterrows():
-            token_freq = row['tokens'].count(token) / len(row['tokens']) if row['tokens'] else 0
-            evolution.append({
-                'folio': row['folio'],
-                'order': row['order'],
-                'frequency': token_freq,
-                'absolute_count': row['tokens'].count(token)
-            })
-        
-        evolution_df = pd.DataFrame(evolution)
+        summary = self.analyze_token_evolutions([token]).iloc[0]
+        _, column = self.token_columns([token])
+        counts = column.toarray().ravel()
+        totals = self.folio_stats['token_count'].to_numpy()
+        evolution_df = pd.DataFrame({
+            'folio': self.folio_stats['folio'],
+            'order': self.folio_stats['order'],
+            'frequency': np.where(totals > 0, counts / np.maximum(totals, 1), 0.0),
+            'absolute_count': counts,
+        })
         
         return {
             'token': token,
-            'first_appearance': evolution_df[evolution_df['absolute_count'] > 0]['folio'].iloc[0] if any(evolution_df['absolute_count'] > 0) else None,
-            'last_appearance': evolution_df[evolution_df['absolute_count'] > 0]['folio'].iloc[-1] if any(evolution_df['absolute_count'] > 0) else None,
-            'total_occurrences': evolution_df['absolute_count'].sum(),
-            'appears_in_folios': (evolution_df['absolute_count'] > 0).sum(),
+            'first_appearance': summary['first_appearance'],
+            'last_appearance': summary['last_appearance'],
+            'total_occurrences': summary['total_occurrences'],
+            'appears_in_folios': summary['appears_in_folios'],
             'evolution': evolution_df
         }
     
@@ -154,67 +437,166 @@ class TemporalAnalyzer:
         Returns:
             DataFrame with vocabulary shift metrics
         """
+        shifts = self.scan_vocabulary_shifts([window_size])
+        return shifts.drop(columns=['window_size', 'position']).reset_index(drop=True)
+    
+    def scan_vocabulary_shifts(self, window_sizes: List[int] = (1, 2, 4, 8)) -> pd.DataFrame:
+        """
+        Compare adjacent folio windows at every position for several window sizes.
+        
+        For each size w and position i, the folios [i, i+w) are compared with
+        the following (up to) w folios. Results are memoized per window size.
+        
+        Args:
+            window_sizes: Window sizes (in folios) to evaluate
+            
+        Returns:
+            DataFrame with one row per (window_size, position) and the
+            columns of `detect_vocabulary_shifts`
+        """
         if self.folio_stats is None:
             self.compute_folio_statistics()
         
-        print(f"Detecting vocabulary shifts with window size {window_size}...")
+        sizes = list(dict.fromkeys(int(w) for w in window_sizes))
+        missing = [w for w in sizes if w not in self._shifts]
+        if missing:
+            print(f"Detecting vocabulary shifts with window size {', '.join(map(str, missing))}...")
+            self._shifts.update(self._window_shifts(missing))
+            print(f"Detected {sum(len(self._shifts[w]) for w in missing)} vocabulary shift measurements")
+        return pd.concat([self._shifts[w] for w in sizes], ignore_index=True)
+    
+    def _window_shifts(self, window_sizes: List[int]) -> Dict[int, pd.DataFrame]:
+        """
+        Shift metrics for all positions of `window_sizes` in one vectorized pass.
         
-        shifts = []
+        Window counts are differences of prefix sums over the folio x token
+        matrix. Every metric is a sum over tokens (the JSD terms included,
+        since window totals come from the token_count prefix), so the
+        vocabulary is processed in column blocks of bounded size.
+        """
+        n_folios = len(self.folio_stats)
+        bounds = []
+        for w in window_sizes:
+            if w < 1:
+                raise ValueError(f"window_size must be positive, got {w}")
+            starts = np.arange(max(n_folios - w, 0))
+            bounds.append((np.full(len(starts), w), starts, starts + w, np.minimum(starts + 2 * w, n_folios)))
+        size, a0, a1, b1 = (np.concatenate(parts) for parts in zip(*bounds))
+        
+        total_prefix = np.r_[0, np.cumsum(self.folio_stats['token_count'].to_numpy())]
+        n1, n2 = total_prefix[a1] - total_prefix[a0], total_prefix[b1] - total_prefix[a1]
+        
+        overlap, union, vocab1, vocab2 = (np.zeros(len(size), dtype=np.int64) for _ in range(4))
+        jsd = np.zeros(len(size))
+        _, columns = self.token_columns()
+        block = max(1, SHIFT_BLOCK // max(len(size), n_folios + 1))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for start in range(0, columns.shape[1] if len(size) else 0, block):
+                dense = columns[:, start:start + block].toarray()
+                prefix = np.vstack([np.zeros((1, dense.shape[1]), dtype=dense.dtype), np.cumsum(dense, axis=0)])
+                counts1, counts2 = prefix[a1] - prefix[a0], prefix[b1] - prefix[a1]
+                in1, in2 = counts1 > 0, counts2 > 0
+                overlap += (in1 & in2).sum(axis=1)
+                union += (in1 | in2).sum(axis=1)
+                vocab1 += in1.sum(axis=1)
+                vocab2 += in2.sum(axis=1)
+                
+                # Jensen-Shannon Divergence (natural log), accumulated over the block
+                freq1, freq2 = counts1 / n1[:, None], counts2 / n2[:, None]
+                m = 0.5 * (freq1 + freq2)
+                jsd += 0.5 * rel_entr(freq1, m).sum(axis=1) + 0.5 * rel_entr(freq2, m).sum(axis=1)
+        
+        folios = self.folio_stats['folio'].to_numpy(dtype=object)
+        keep = (n1 > 0) & (n2 > 0)
+        shifts = pd.DataFrame({
+            'window_size': size,
+            'position': a0,
+            'window_start': folios[a0],
+            'window_end': folios[np.maximum(b1 - 1, 0)],
+            'jaccard_similarity': np.where(union > 0, overlap / np.maximum(union, 1), 0.0),
+            'jsd_distance': jsd,
+            'vocab_size_1': vocab1,
+            'vocab_size_2': vocab2,
+            'new_tokens': vocab2 - overlap,
+            'disappeared_tokens': vocab1 - overlap,
+        })[keep]
+        return {w: shifts[shifts['window_size'] == w].reset_index(drop=True) for w in window_sizes}
+    
+    def detect_change_points(self, method: str = 'binseg', penalty: float = None, min_size: int = 2,
+                             max_changes: int = None) -> pd.DataFrame:
+        """
+        Rank candidate section/scribe boundaries (see `change_points.detect_change_points`).
         
-        for i in range(len(self.folio_stats) - window_size):
-            window1 = self.folio_stats.iloc[i:i+window_size]
-            window2 = self.folio_stats.iloc[i+window_size:i+2*window_size]
-            
-            # Collect all tokens from each window
-            tokens1 = []
-            tokens2 = []
-            for tokens in window1['tokens']:
-                tokens1.extend(tokens)
-            for tokens in window2['tokens']:
-                tokens2.extend(tokens)
-            
-            if not tokens1 or not tokens2:
-                continue
-            
-            # Calculate vocabulary overlap
-            vocab1 = set(tokens1)
-            vocab2 = set(tokens2)
-            
-            overlap = len(vocab1 & vocab2)
-            union = len(vocab1 | vocab2)
-            jaccard = overlap / union if union > 0 else 0
-            
-            # Calculate frequency distribution similarity (JSD)
-            counter1 = Counter(tokens1)
-            counter2 = Counter(tokens2)
-            
-            all_tokens = set(counter1.keys()) | set(counter2.keys())
-            
-            freq1 = np.array([counter1.get(t, 0) for t in all_tokens])
-            freq2 = np.array([counter2.get(t, 0) for t in all_tokens])
-            
-            freq1 = freq1 / freq1.sum()
-            freq2 = freq2 / freq2.sum()
+        Args:
+            method: 'binseg' (greedy binary segmentation) or 'pelt'
+            penalty: Minimum gain (nats) per boundary; default calibrated by folio permutations
+            min_size: Minimum number of folios per segment
+            max_changes: Maximum number of boundaries (binseg only)
             
-            # Jensen-Shannon Divergence
-            m = 0.5 * (freq1 + freq2)
-            jsd = 0.5 * entropy(freq1, m) + 0.5 * entropy(freq2, m)
+        Returns:
+            DataFrame of boundaries ranked by gain
+        """
+        if self.folio_stats is None:
+            self.compute_folio_statistics()
+        
+        print(f"Detecting change points ({method})...")
+        found = detect_change_points(self.folio_token_counts, self.folio_stats['folio'].tolist(),
+                                     method, penalty, min_size, max_changes)
+        print(f"Found {len(found)} change points")
+        return found
+    
+    def figure_path(self, name: str) -> Path:
+        return self.output_dir / f'{name}.{self.figure_format}'
+    
+    def figure_jobs(self, figures: List[str] = FIGURES, top_n: int = 10) -> List[Tuple]:
+        """
+        Data of each figure, ready to draw with `_render`.
+        
+        Preparing the data is cheap (the metrics are cached on the analyzer);
+        drawing is where the time goes, so it can be deferred or farmed out.
+        """
+        if self.folio_stats is None:
+            self.compute_folio_statistics()
+        
+        jobs = []
+        for name in figures:
+            options = {}
+            if name == 'token_frequency_heatmap':
+                top_tokens = [token for token, _ in self.most_common_tokens(top_n)]
+                jobs.append((plot_token_frequency_heatmap, self.token_evolution_matrix(top_tokens)))
+                options['annotate'] = self.annotate
+            elif name == 'vocabulary_diversity_evolution':
+                jobs.append((plot_vocabulary_diversity, self.folio_stats))
+            elif name == 'vocabulary_shifts':
+                shifts = self.detect_vocabulary_shifts(window_size=1)
+                if shifts.empty:
+                    print("No vocabulary shifts detected")
+                    continue
+                jobs.append((plot_vocabulary_shifts, shifts))
+            else:
+                raise ValueError(f"Unknown figure: {name}")
+            jobs[-1] += (self.figure_path(name), self.dpi, options)
+        return jobs
+    
+    def render_figures(self, figures: List[str] = FIGURES, jobs: int = 1, top_n: int = 10) -> List[Path]:
+        """
+        Draw the figures (all of `FIGURES` by default).
+        
+        Args:
+            figures: Names of the figures to draw
+            jobs: Number of processes drawing figures in parallel
+            top_n: Number of tokens in the frequency heatmap
             
-            shifts.append({
-                'window_start': window1['folio'].iloc[0],
-                'window_end': window2['folio'].iloc[-1],
-                'jaccard_similarity': jaccard,
-                'jsd_distance': jsd,
-                'vocab_size_1': len(vocab1),
-                'vocab_size_2': len(vocab2),
-                'new_tokens': len(vocab2 - vocab1),
-                'disappeared_tokens': len(vocab1 - vocab2)
-            })
-        
-        shifts_df = pd.DataFrame(shifts)
-        print(f"Detected {len(shifts_df)} vocabulary shift measurements")
-        
-        return shifts_df
+        Returns:
+            Paths of the figures written
+        """
+        tasks = self.figure_jobs(figures, top_n)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        print(f"Rendering {len(tasks)} figures ({self.figure_format}, {jobs} job(s))...")
+        if jobs > 1 and len(tasks) > 1:
+            with Pool(min(jobs, len(tasks)), initializer=_use_agg) as pool:
+                return pool.map(_render, tasks)
+        return [_render(task) for task in tasks]
     
     def visualize_token_frequency_evolution(self, top_n: int = 10):
         """
@@ -223,144 +605,27 @@ class TemporalAnalyzer:
         Args:
             top_n: Number of most frequent tokens to visualize
         """
-        if self.folio_stats is None:
-            self.compute_folio_statistics()
-        
         print(f"Visualizing evolution of top {top_n} tokens...")
-        
-        # Get overall most common tokens
-        all_tokens = []
-        for tokens in self.folio_stats['tokens']:
-            all_tokens.extend(tokens)
-        
-        top_tokens = [token for token, _ in Counter(all_tokens).most_common(top_n)]
-        
-        # Build frequency matrix
-        freq_matrix = []
-        for token in top_tokens:
-            evolution = self.analyze_token_evolution(token)
-            freq_matrix.append(evolution['evolution']['frequency'].values)
-        
-        freq_df = pd.DataFrame(
-            freq_matrix,
-            index=top_tokens,
-            columns=self.folio_stats['folio'].values
-        )
-        
-        # Create heatmap
-        plt.figure(figsize=(14, 8))
-        sns.heatmap(freq_df, cmap='YlOrRd', annot=True, fmt='.2f', 
-                   cbar_kws={'label': 'Token Frequency'})
-        plt.title(f'Token Frequency Evolution Across Manuscript (Top {top_n} Tokens)', 
-                 fontsize=14, fontweight='bold')
-        plt.xlabel('Folio', fontsize=12)
-        plt.ylabel('Token', fontsize=12)
-        plt.tight_layout()
-        
-        output_path = self.output_dir / 'token_frequency_heatmap.png'
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        print(f"Saved heatmap to {output_path}")
-        plt.close()
+        self.render_figures(['token_frequency_heatmap'], top_n=top_n)
     
     def visualize_vocabulary_diversity(self):
         """Create visualization of vocabulary diversity over time."""
-        if self.folio_stats is None:
-            self.compute_folio_statistics()
-        
         print("Visualizing vocabulary diversity evolution...")
-        
-        fig, axes = plt.subplots(2, 1, figsize=(14, 10))
-        
-        # Plot 1: Vocabulary diversity (type-token ratio)
-        axes[0].plot(range(len(self.folio_stats)), 
-                    self.folio_stats['vocabulary_diversity'], 
-                    marker='o', linewidth=2, markersize=6, color='steelblue')
-        axes[0].axhline(self.folio_stats['vocabulary_diversity'].mean(), 
-                       color='red', linestyle='--', linewidth=2, 
-                       label=f'Mean: {self.folio_stats["vocabulary_diversity"].mean():.3f}')
-        axes[0].set_xlabel('Folio Sequence', fontsize=12)
-        axes[0].set_ylabel('Vocabulary Diversity\n(Type-Token Ratio)', fontsize=12)
-        axes[0].set_title('Vocabulary Diversity Evolution Across Manuscript', 
-                         fontsize=14, fontweight='bold')
-        axes[0].grid(True, alpha=0.3)
-        axes[0].legend()
-        axes[0].set_xticks(range(len(self.folio_stats)))
-        axes[0].set_xticklabels(self.folio_stats['folio'], rotation=45, ha='right')
-        
-        # Plot 2: Token count and unique tokens
-        x = range(len(self.folio_stats))
-        axes[1].bar(x, self.folio_stats['token_count'], alpha=0.6, 
-                   label='Total Tokens', color='skyblue')
-        axes[1].plot(x, self.folio_stats['unique_tokens'], marker='o', 
-                    linewidth=2, markersize=6, color='darkgreen', 
-                    label='Unique Tokens')
-        axes[1].set_xlabel('Folio Sequence', fontsize=12)
-        axes[1].set_ylabel('Count', fontsize=12)
-        axes[1].set_title('Token Count vs Unique Tokens per Folio', 
-                         fontsize=14, fontweight='bold')
-        axes[1].grid(True, alpha=0.3, axis='y')
-        axes[1].legend()
-        axes[1].set_xticks(range(len(self.folio_stats)))
-        axes[1].set_xticklabels(self.folio_stats['folio'], rotation=45, ha='right')
-        
-        plt.tight_layout()
-        
-        output_path = self.output_dir / 'vocabulary_diversity_evolution.png'
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        print(f"Saved diversity plot to {output_path}")
-        plt.close()
+        self.render_figures(['vocabulary_diversity_evolution'])
     
     def visualize_vocabulary_shifts(self):
         """Visualize vocabulary shifts between manuscript sections."""
-        shifts = self.detect_vocabulary_shifts(window_size=1)
-        
-        if shifts.empty:
-            print("No vocabulary shifts detected")
-            return
-        
         print("Visualizing vocabulary shifts...")
-        
-        fig, axes = plt.subplots(2, 1, figsize=(14, 10))
-        
-        # Plot 1: Jaccard similarity
-        x = range(len(shifts))
-        axes[0].plot(x, shifts['jaccard_similarity'], marker='o', 
-                    linewidth=2, markersize=6, color='purple')
-        axes[0].axhline(shifts['jaccard_similarity'].mean(), 
-                       color='red', linestyle='--', linewidth=2,
-                       label=f'Mean: {shifts["jaccard_similarity"].mean():.3f}')
-        axes[0].set_xlabel('Window Transition', fontsize=12)
-        axes[0].set_ylabel('Jaccard Similarity', fontsize=12)
-        axes[0].set_title('Vocabulary Overlap Between Adjacent Folio Windows', 
-                         fontsize=14, fontweight='bold')
-        axes[0].grid(True, alpha=0.3)
-        axes[0].legend()
-        axes[0].set_ylim(0, 1)
-        
-        # Plot 2: Jensen-Shannon Divergence
-        axes[1].plot(x, shifts['jsd_distance'], marker='s', 
-                    linewidth=2, markersize=6, color='coral')
-        axes[1].axhline(shifts['jsd_distance'].mean(), 
-                       color='red', linestyle='--', linewidth=2,
-                       label=f'Mean: {shifts["jsd_distance"].mean():.3f}')
-        axes[1].set_xlabel('Window Transition', fontsize=12)
-        axes[1].set_ylabel('Jensen-Shannon Divergence', fontsize=12)
-        axes[1].set_title('Statistical Distance Between Adjacent Folio Windows', 
-                         fontsize=14, fontweight='bold')
-        axes[1].grid(True, alpha=0.3)
-        axes[1].legend()
-        
-        plt.tight_layout()
-        
-        output_path = self.output_dir / 'vocabulary_shifts.png'
-        plt.savefig(output_path, dpi=300, bbox_inches='tight')
-        print(f"Saved vocabulary shifts plot to {output_path}")
-        plt.close()
-    
-    def generate_timeline_report(self) -> str:
+        self.render_figures(['vocabulary_shifts'])
+    
+    def generate_timeline_report(self, change_points: bool = True) -> str:
         """
         Generate comprehensive timeline analysis report.
         
+        Args:
+            change_points: Include the change-point ranking; its penalty is calibrated
+                on folio permutations, the slowest part of the report
+        
         Returns:
             Markdown-formatted report text
         """
@@ -370,12 +635,9 @@ class TemporalAnalyzer:
         print("Generating timeline analysis report...")
         
         # Compute overall statistics
-        all_tokens = []
-        for tokens in self.folio_stats['tokens']:
-            all_tokens.extend(tokens)
-        
-        token_counter = Counter(all_tokens)
-        top_5_tokens = token_counter.most_common(5)
+        n_tokens = int(self.folio_stats['token_count'].sum())
+        n_types = int((self.token_totals() > 0).sum())
+        top_5_tokens = self.most_common_tokens(5)
         
         shifts = self.detect_vocabulary_shifts(window_size=1)
         
@@ -398,9 +660,9 @@ examining how vocabulary, token frequency, and writing patterns change across fo
 ## Dataset Summary
 
 - **Total Folios Analyzed**: {len(self.folio_stats)}
-- **Total Tokens**: {len(all_tokens)}
-- **Unique Tokens**: {len(token_counter)}
-- **Global Vocabulary Diversity**: {len(token_counter) / len(all_tokens):.3f}
+- **Total Tokens**: {n_tokens}
+- **Unique Tokens**: {n_types}
+- **Global Vocabulary Diversity**: {n_types / n_tokens:.3f}
 
 ### Folio Coverage
 
@@ -412,7 +674,7 @@ The most frequent tokens throughout the entire manuscript:
 
 """
         for i, (token, count) in enumerate(top_5_tokens, 1):
-            freq = count / len(all_tokens) * 100
+            freq = count / n_tokens * 100
             report += f"{i}. **{token}**: {count} occurrences ({freq:.2f}%)\n"
         
         report += f"""
@@ -458,6 +720,21 @@ This shift might indicate:
 
 """
         
+        found = self.detect_change_points() if change_points else None
+        if found is not None and not found.empty:
+            report += f"""## Change Points
+
+Binary segmentation of the folio sequence by token distribution. Each boundary's gain is
+the log-likelihood (nats) gained by modelling the two sides separately; the score compares
+it with the best split found in randomly reordered folios (score > 1 beats chance).
+
+| Rank | Boundary | Gain (nats) | Weighted JSD | Score |
+|------|----------|-------------|--------------|-------|
+"""
+            for row in found.head(10).itertuples():
+                report += f"| {row.rank} | {row.previous_folio} / {row.folio} | {row.gain:.1f} | {row.jsd:.4f} | {row.score:.2f} |\n"
+            report += "\n"
+        
         # Analyze specific token patterns
         report += f"""## Token-Specific Evolution
 
@@ -476,7 +753,7 @@ This shift might indicate:
 
 1. **Vocabulary Consistency**: The manuscript shows {'relatively stable' if self.folio_stats['vocabulary_diversity'].std() < 0.1 else 'significant variation in'} vocabulary diversity across folios (σ = {self.folio_stats['vocabulary_diversity'].std():.3f}).
 
-2. **Token Distribution**: The top 5 tokens account for {sum(c for _, c in top_5_tokens) / len(all_tokens) * 100:.1f}% of all tokens, suggesting {'high repetitiveness' if sum(c for _, c in top_5_tokens) / len(all_tokens) > 0.3 else 'moderate linguistic diversity'}.
+2. **Token Distribution**: The top 5 tokens account for {sum(c for _, c in top_5_tokens) / n_tokens * 100:.1f}% of all tokens, suggesting {'high repetitiveness' if sum(c for _, c in top_5_tokens) / n_tokens > 0.3 else 'moderate linguistic diversity'}.
 
 3. **Temporal Patterns**: {'Significant vocabulary shifts detected' if max_shift is not None and max_shift['jsd_distance'] > 0.3 else 'Vocabulary remains relatively stable'} across the manuscript's folios.
 
@@ -487,14 +764,14 @@ This shift might indicate:
 The temporal analysis reveals:
 
 - **Encoding Consistency**: {'The manuscript appears to use consistent encoding throughout' if not shifts.empty and shifts['jsd_distance'].mean() < 0.3 else 'Significant statistical shifts suggest possible multiple encoding schemes or topic changes'}
-- **Linguistic Structure**: {'Strong repetition patterns consistent with constructed language or cipher' if sum(c for _, c in top_5_tokens) / len(all_tokens) > 0.3 else 'Vocabulary distribution more typical of natural language'}
+- **Linguistic Structure**: {'Strong repetition patterns consistent with constructed language or cipher' if sum(c for _, c in top_5_tokens) / n_tokens > 0.3 else 'Vocabulary distribution more typical of natural language'}
 - **Manuscript Sections**: {'Clear vocabulary boundaries suggest distinct sections or topics' if max_shift is not None and max_shift['jsd_distance'] > 0.5 else 'Smooth vocabulary transitions suggest unified composition'}
 
 ## Visualizations Generated
 
-1. `token_frequency_heatmap.png` - Evolution of top token frequencies across folios
-2. `vocabulary_diversity_evolution.png` - Vocabulary diversity and token counts over time
-3. `vocabulary_shifts.png` - Statistical similarity between adjacent folio windows
+1. `token_frequency_heatmap.{self.figure_format}` - Evolution of top token frequencies across folios
+2. `vocabulary_diversity_evolution.{self.figure_format}` - Vocabulary diversity and token counts over time
+3. `vocabulary_shifts.{self.figure_format}` - Statistical similarity between adjacent folio windows
 
 ## Recommendations for Further Analysis
 
@@ -510,8 +787,16 @@ The temporal analysis reveals:
         
         return report
     
-    def run_full_analysis(self):
-        """Run complete timeline analysis pipeline."""
+    def run_full_analysis(self, render: bool = True, jobs: int = 1, change_points: bool = True):
+        """
+        Run complete timeline analysis pipeline.
+        
+        Args:
+            render: Draw the figures; False computes the metrics and report only
+                (call `render_figures` later to draw them)
+            jobs: Number of processes drawing figures in parallel
+            change_points: Include change-point detection in the report
+        """
         print("=" * 60)
         print("VOYNICH MANUSCRIPT TIMELINE ANALYSIS")
         print("=" * 60)
@@ -523,22 +808,23 @@ The temporal analysis reveals:
         # Compute statistics
         self.compute_folio_statistics()
         
-        # Generate visualizations
-        self.visualize_token_frequency_evolution(top_n=10)
-        self.visualize_vocabulary_diversity()
-        self.visualize_vocabulary_shifts()
-        
         # Generate report
-        report = self.generate_timeline_report()
+        report = self.generate_timeline_report(change_points)
         
         # Save report
         report_path = self.output_dir.parent / 'timeline_analysis.md'
+        report_path.parent.mkdir(parents=True, exist_ok=True)
         with open(report_path, 'w', encoding='utf-8') as f:
             f.write(report)
         
+        # Generate visualizations
+        if render:
+            self.render_figures(jobs=jobs)
+        
         print()
         print(f"Timeline analysis complete! Report saved to {report_path}")
-        print(f"Visualizations saved to {self.output_dir}")
+        if render:
+            print(f"Visualizations saved to {self.output_dir}")
         
         return report
 
@@ -550,15 +836,28 @@ def main():
     parser = argparse.ArgumentParser(description='Analyze temporal patterns in Voynich Manuscript')
     parser.add_argument('--token-coords', type=str, 
                        default='data/processed/token_coords.jsonl',
-                       help='Path to token coordinates file')
+                       help='Path to token coordinates file (JSONL or token store)')
     parser.add_argument('--output-dir', type=str,
                        default='reports/figures/timeline',
                        help='Directory for output visualizations')
+    parser.add_argument('--metrics-only', action='store_true',
+                       help='Compute statistics and the report without drawing figures')
+    parser.add_argument('--no-change-points', dest='change_points', action='store_false',
+                       help='Leave change-point detection out of the report')
+    parser.add_argument('--format', type=str, default='png',
+                       help='Figure format (png, svg, pdf, ...)')
+    parser.add_argument('--dpi', type=int, default=300,
+                       help='Resolution of raster figures')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Processes drawing figures in parallel')
+    parser.add_argument('--annotate', action=argparse.BooleanOptionalAction, default=None,
+                       help=f'Write values into heatmap cells (default: up to {ANNOTATE_MAX_CELLS} cells)')
     
     args = parser.parse_args()
     
-    analyzer = TemporalAnalyzer(args.token_coords, args.output_dir)
-    analyzer.run_full_analysis()
+    _use_agg()
+    analyzer = TemporalAnalyzer(args.token_coords, args.output_dir, args.format, args.dpi, args.annotate)
+    analyzer.run_full_analysis(render=not args.metrics_only, jobs=args.jobs, change_points=args.change_points)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,185 @@
+"""Bootstrap intervals for divergences and embedding similarities.
+
+`bootstrap_jsd` resamples a reference distribution and any number of others
+as multinomial draws of their own sizes and reports, per other distribution,
+the JSD point estimate, a percentile interval, the bootstrap standard error
+and `p_best`: the share of resamples in which it was the closest one (ties
+split the share), which says how stable a ranking is.
+
+Resampling is cheap because JSD only depends on the keys both sides share
+(see `divergence.shared_jsd_terms`) plus the total mass of each side's other
+keys. By the aggregation property of the multinomial, a draw over the shared
+keys plus one pooled category for the rest has exactly the same distribution
+of JSD as a draw over the full support, so each pair costs O(shared keys)
+per resample however large the corpus vocabulary is. The reference is drawn
+once per resample over its full support and shared by every pair, so `p_best`
+compares corpora on the same resampled reference. Draws are processed in
+batches, and with `jobs > 1` the others are split across worker processes.
+Every distribution has its own seed, so the results do not depend on `jobs`.
+
+`bootstrap_similarity` does the same for the mean pairwise cosine similarity
+of two embedding samples by resampling their rows.
+"""
+from __future__ import annotations
+import warnings
+from multiprocessing import Pool
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .divergence import SparseCounts, divergences, shared_jsd_terms
+except ImportError:
+    from divergence import SparseCounts, divergences, shared_jsd_terms
+
+DEFAULT_DRAWS = 1000
+# resamples drawn at once; bounds the (batch x reference support) draw matrix
+BATCH = 250
+
+
+def _reference_draws(ref: SparseCounts, draws: int, seed: np.random.SeedSequence, resample: bool, batch: int):
+    """Yield normalized (batch x len(ref)) reference probabilities; identical for every caller with `seed`."""
+    rng = np.random.default_rng(seed)
+    n = int(round(ref.total))
+    probs = ref.probs()
+    for start in range(0, draws, batch):
+        size = min(batch, draws - start)
+        if resample and n > 0:
+            yield rng.multinomial(n, probs, size=size) / n
+        else:
+            yield np.broadcast_to(probs, (size, len(probs)))
+
+
+def _pair_setup(ref: SparseCounts, other: SparseCounts):
+    """Positions of the shared keys in `ref`, and `other`'s counts on them plus one pooled category."""
+    shared, ref_pos, other_pos = np.intersect1d(ref.ids, other.ids, assume_unique=True, return_indices=True)
+    counts = other.counts[other_pos]
+    rest = max(other.total - float(counts.sum()), 0.0)
+    return ref_pos, np.append(counts, rest)
+
+
+def _jsd_draws(ref: SparseCounts, others: Sequence[SparseCounts], draws: int, ref_seed, other_seeds,
+               resample_ref: bool, resample_others: bool, batch: int) -> np.ndarray:
+    """(draws x len(others)) resampled JSDs; NaN where either side is empty."""
+    out = np.full((draws, len(others)), np.nan)
+    pairs = [_pair_setup(ref, o) for o in others]
+    rngs = [np.random.default_rng(s) for s in other_seeds]
+    start = 0
+    for p_batch in _reference_draws(ref, draws, ref_seed, resample_ref, batch):
+        size = len(p_batch)
+        for j, ((ref_pos, q_counts), rng) in enumerate(zip(pairs, rngs)):
+            n = int(round(q_counts.sum()))
+            if n <= 0 or not len(ref):
+                continue
+            if resample_others:
+                q = rng.multinomial(n, q_counts / q_counts.sum(), size=size)[:, :-1] / n
+            else:
+                q = np.broadcast_to(q_counts[:-1] / q_counts.sum(), (size, len(ref_pos)))
+            p = p_batch[:, ref_pos]
+            terms = np.where((p > 0) & (q > 0), shared_jsd_terms(p, q), 0.0)
+            out[start:start + size, j] = np.clip(1.0 - 0.5 * terms.sum(axis=1), 0.0, 1.0)
+        start += size
+    return out
+
+
+def _jsd_task(args):
+    return _jsd_draws(*args)
+
+
+def _summarize(point: np.ndarray, samples: np.ndarray, alpha: float, lower_is_better: bool) -> Dict[str, np.ndarray]:
+    valid = ~np.isnan(samples)
+    with warnings.catch_warnings():
+        # all-NaN columns (empty distributions, missing embeddings) stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        low, high = np.nanquantile(samples, [alpha / 2, 1 - alpha / 2], axis=0) if samples.size else (point, point)
+        std = np.nanstd(samples, axis=0) if samples.size else np.zeros_like(point)
+    if samples.size and samples.shape[1]:
+        ranked = np.where(valid, samples if lower_is_better else -samples, np.inf)
+        has_any = valid.any(axis=1)
+        # resamples with tied best scores split their vote between the tied distributions
+        best = (ranked == ranked.min(axis=1, keepdims=True))[has_any]
+        p_best = (best / best.sum(axis=1, keepdims=True)).sum(axis=0) / max(int(has_any.sum()), 1)
+    else:
+        p_best = np.zeros_like(point)
+    return {'point': point, 'low': np.asarray(low), 'high': np.asarray(high), 'std': np.asarray(std),
+            'p_best': p_best}
+
+
+def bootstrap_jsd(ref: SparseCounts, others: Sequence[SparseCounts], draws: int = DEFAULT_DRAWS,
+                  alpha: float = 0.05, seed: int = 0, resample_ref: bool = True, resample_others: bool = True,
+                  jobs: int = 1, batch: int = BATCH, keep: bool = False) -> Dict[str, np.ndarray]:
+    """Bootstrap JSD between `ref` and each of `others` (all `SparseCounts` over one index).
+
+    Returns one array per key: `point` (JSD of the observed counts), `low` and
+    `high` (percentile (1 - alpha) interval), `std`, `p_best`, plus `samples`
+    (draws x others) with `keep`. Counts are treated as integer sample sizes.
+    """
+    ss = np.random.SeedSequence(seed)
+    ref_seed, *other_seeds = ss.spawn(len(others) + 1)
+    point = divergences(ref, others, ('jsd',))['jsd'] if others else np.zeros(0)
+    point = np.where([len(o) == 0 or not len(ref) for o in others], np.nan, point) if others else point
+    if jobs > 1 and len(others) > 1:
+        chunks = [list(c) for c in np.array_split(np.arange(len(others)), min(jobs, len(others)))]
+        tasks = [(ref, [others[i] for i in c], draws, ref_seed, [other_seeds[i] for i in c],
+                  resample_ref, resample_others, batch) for c in chunks]
+        with Pool(len(chunks)) as pool:
+            samples = np.concatenate(pool.map(_jsd_task, tasks), axis=1)
+    else:
+        samples = _jsd_draws(ref, others, draws, ref_seed, other_seeds, resample_ref, resample_others, batch)
+    out = _summarize(point, samples, alpha, lower_is_better=True)
+    if keep:
+        out['samples'] = samples
+    return out
+
+
+def jsd_interval(ref: SparseCounts, other: SparseCounts, draws: int = 200, alpha: float = 0.05,
+                 n: int | None = None, seed: int = 0, batch: int = 32) -> Tuple[float, float]:
+    """Bootstrap (1 - alpha) interval of JSD(ref, other) under resampling of `other` only.
+
+    `other` is treated as `n` draws (default: its total count) from its own
+    distribution. Overlapping n-grams of one word are not independent draws,
+    so the interval is somewhat optimistic.
+    """
+    n = int(round(other.total if n is None else n))
+    if n <= 0 or draws <= 0:
+        return float('nan'), float('nan')
+    scaled = SparseCounts(other.ids, other.probs() * n)
+    res = bootstrap_jsd(ref, [scaled], draws, alpha, seed, resample_ref=False, batch=batch)
+    return float(res['low'][0]), float(res['high'][0])
+
+
+def _unit_rows(emb: np.ndarray) -> np.ndarray:
+    return emb / (np.linalg.norm(emb, axis=1, keepdims=True) + 1e-12)
+
+
+def bootstrap_similarity(ref_emb: np.ndarray, other_embs: Sequence[np.ndarray | None], draws: int = DEFAULT_DRAWS,
+                         alpha: float = 0.05, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Bootstrap the mean pairwise cosine similarity between `ref_emb` and each of `other_embs`.
+
+    Rows of both samples are resampled with replacement; a resampled mean
+    pairwise cosine is the dot product of the weighted centroids, so each
+    side is one (draws x rows) @ (rows x dim) product. None entries give NaN.
+    """
+    ss = np.random.SeedSequence(seed)
+    ref_seed, *other_seeds = ss.spawn(len(other_embs) + 1)
+
+    def centroids(emb, s):
+        emb = _unit_rows(np.asarray(emb, dtype=float))
+        weights = np.random.default_rng(s).multinomial(len(emb), np.full(len(emb), 1 / len(emb)), size=draws)
+        return emb.mean(axis=0), weights @ emb / len(emb)
+
+    ref_point, ref_draws = centroids(ref_emb, ref_seed)
+    point = np.full(len(other_embs), np.nan)
+    samples = np.full((draws, len(other_embs)), np.nan)
+    for j, (emb, s) in enumerate(zip(other_embs, other_seeds)):
+        if emb is None or not len(emb):
+            continue
+        c_point, c_draws = centroids(emb, s)
+        point[j] = float(ref_point @ c_point)
+        samples[:, j] = np.einsum('ij,ij->i', ref_draws, c_draws)
+    return _summarize(point, samples, alpha, lower_is_better=False)
+
+
+def intervals(res: Dict[str, np.ndarray]) -> List[Tuple[float, float]]:
+    """(low, high) pairs of a bootstrap result, in input order."""
+    return [(float(lo), float(hi)) for lo, hi in zip(res['low'], res['high'])]
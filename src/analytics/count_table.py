@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Streaming TSV count tables for n-gram output.
+
+The table is written one order at a time, in chunks, so only `chunk_rows`
+n-gram strings exist at once:
+
+    # ngram count table v1
+    1	daiin	863
+    1	ol	537
+    ...
+    2	qokeedy qokeedy	61
+    ...
+    # index	1:34	2:81234	3:190553
+
+Rows are `order<TAB>ngram<TAB>count`, sorted by descending count within each
+order (ties in first-occurrence order, like `Counter.most_common`) unless
+written with `sort=False`, and pruned to `count >= min_count`. The trailing
+index gives the byte offset of each order's first row, so `read_count_table`
+can seek straight to an order and stop after the top `k` rows.
+
+Usage:
+  python3 src/analytics/count_table.py data/processed/ngrams.tsv --order 2 --top 20
+"""
+from __future__ import annotations
+import argparse
+import os
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    from .ngrams import NgramCounts
+    from .vocab import top_k
+except ImportError:
+    from ngrams import NgramCounts
+    from vocab import top_k
+
+HEADER = '# ngram count table v1\n'
+INDEX_PREFIX = '# index'
+
+
+def select_rows(c: NgramCounts, sort: bool = True, min_count: int = 1) -> np.ndarray:
+    """Indices of the entries of `c` to write: by descending count (or first occurrence), pruned to `min_count`."""
+    idx = top_k(c.counts, None) if sort else np.arange(len(c))
+    if min_count > 1:
+        idx = idx[c.counts[idx] >= min_count]
+    return idx
+
+
+def write_count_table(path: str, counts: Dict[int, NgramCounts], sort: bool = True,
+                      min_count: int = 1, chunk_rows: int = 65536) -> Dict[int, int]:
+    """Stream every order in `counts` to a TSV count table; return rows written per order."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    offsets: Dict[int, int] = {}
+    written: Dict[int, int] = {}
+    with open(path, 'wb') as fh:
+        fh.write(HEADER.encode('utf-8'))
+        for n in sorted(counts):
+            c = counts[n]
+            idx = select_rows(c, sort, min_count)
+            offsets[n] = fh.tell()
+            written[n] = len(idx)
+            for start in range(0, len(idx), chunk_rows):
+                part = idx[start:start + chunk_rows]
+                rows = [f'{n}\t{g}\t{v}\n' for g, v in zip(c.strings(part), c.counts[part].tolist())]
+                fh.write(''.join(rows).encode('utf-8'))
+        index = '\t'.join(f'{n}:{off}' for n, off in offsets.items())
+        fh.write(f'{INDEX_PREFIX}\t{index}\n'.encode('utf-8'))
+    return written
+
+
+def read_index(path: str) -> Dict[int, int]:
+    """Byte offset of each order's first row, from the table's trailing index line."""
+    with open(path, 'rb') as fh:
+        fh.seek(0, os.SEEK_END)
+        size = fh.tell()
+        fh.seek(max(0, size - 4096))
+        last = fh.read().rstrip(b'\n').rsplit(b'\n', 1)[-1].decode('utf-8')
+    if not last.startswith(INDEX_PREFIX):
+        raise ValueError(f'{path} has no count table index (truncated write?)')
+    fields = last.split('\t')[1:]
+    return {int(n): int(off) for n, off in (f.split(':') for f in fields)}
+
+
+def iter_count_table(path: str, n: int) -> Iterator[Tuple[str, int]]:
+    """Yield `(ngram, count)` rows of order `n` in file order."""
+    offsets = read_index(path)
+    if n not in offsets:
+        return
+    prefix = f'{n}\t'.encode('utf-8')
+    # the index holds byte offsets, which are only valid seek targets in binary mode
+    with open(path, 'rb') as fh:
+        fh.seek(offsets[n])
+        for line in fh:
+            if not line.startswith(prefix):
+                break
+            _, gram, count = line.decode('utf-8').rstrip('\n').split('\t')
+            yield gram, int(count)
+
+
+def read_count_table(path: str, n: int | None = None, top: int | None = None) -> Dict[int, List[Tuple[str, int]]]:
+    """Load order `n` (or every order), reading at most `top` rows per order."""
+    orders = [n] if n is not None else sorted(read_index(path))
+    out: Dict[int, List[Tuple[str, int]]] = {}
+    for order in orders:
+        rows = []
+        for row in iter_count_table(path, order):
+            if top is not None and len(rows) >= top:
+                break
+            rows.append(row)
+        out[order] = rows
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the top rows of an n-gram count table')
+    parser.add_argument('input', help='TSV count table written by stats.py')
+    parser.add_argument('--order', type=int, help='Only this n-gram order (default: all)')
+    parser.add_argument('--top', type=int, default=20, help='Rows to print per order')
+    args = parser.parse_args()
+
+    for n, rows in read_count_table(args.input, args.order, args.top).items():
+        print(f'Top {n}-grams:')
+        for gram, c in rows:
+            print(f'  {gram}: {c}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""Vectorized divergences between count distributions.
+
+Distributions are `SparseCounts`: sorted integer ids into a shared key index
+(a `Vocabulary` over n-gram strings) plus their counts. `divergences` compares
+one reference distribution against any number of others in a single numpy
+pass. The reference is expanded to a dense probability vector and every other
+distribution only touches its own non-zero entries, so the cost is linear in
+the total number of non-zero entries.
+
+All logarithms are base 2. Metrics:
+- `jsd`: Jensen-Shannon divergence (0..1)
+- `kl`: KL(reference || other); inf when `other` lacks part of the reference support
+- `kl_reverse`: KL(other || reference); inf likewise
+- `hellinger`: Hellinger distance (0..1)
+- `cosine`: cosine similarity of the two vectors
+
+`shared_jsd_terms` rewrites JSD over the keys two distributions share, which
+lets an inverted index (`Postings`) score many distributions from a query's
+keys alone; `Postings.jsd` fills a whole queries x rows JSD matrix that way.
+Bootstrap intervals live in `bootstrap.py`.
+"""
+from __future__ import annotations
+from typing import Dict, Hashable, Mapping, Sequence
+
+import numpy as np
+
+try:
+    from .vocab import Vocabulary
+except ImportError:
+    from vocab import Vocabulary
+
+METRICS = ('jsd', 'kl', 'kl_reverse', 'hellinger', 'cosine')
+
+
+class SparseCounts:
+    """Non-zero counts of one distribution, keyed by ids of a shared index."""
+
+    def __init__(self, ids: np.ndarray, counts: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        counts = np.asarray(counts, dtype=float)
+        keep = counts > 0
+        order = np.argsort(ids[keep], kind='stable')
+        self.ids = ids[keep][order]
+        self.counts = counts[keep][order]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def total(self) -> float:
+        return float(self.counts.sum())
+
+    @property
+    def size(self) -> int:
+        """Smallest index size covering every id."""
+        return int(self.ids[-1]) + 1 if len(self.ids) else 0
+
+    def probs(self) -> np.ndarray:
+        total = self.total
+        return self.counts / total if total else self.counts
+
+    def dense(self, size: int | None = None) -> np.ndarray:
+        out = np.zeros(max(size or 0, self.size))
+        out[self.ids] = self.probs()
+        return out
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[Hashable, float], index: Vocabulary, grow: bool = True) -> 'SparseCounts':
+        """Encode `{key: count}` into `index`, adding unseen keys.
+
+        With `grow=False` the index is left unchanged and unseen keys get fresh
+        ids past its end, so they count towards this distribution only.
+        """
+        ids = index.encode(mapping.keys(), grow=grow).astype(np.int64)
+        if not grow:
+            unknown = ids < 0
+            ids[unknown] = len(index) + np.arange(int(unknown.sum()))
+        return cls(ids, np.fromiter(mapping.values(), dtype=float, count=len(mapping)))
+
+
+def divergences(ref: SparseCounts, others: Sequence[SparseCounts],
+                metrics: Sequence[str] = METRICS) -> Dict[str, np.ndarray]:
+    """Compare `ref` with each of `others`; returns one array (len(others)) per metric."""
+    size = max([ref.size] + [o.size for o in others])
+    p = ref.dense(size)
+    # sums over the reference use its own entries; p's length (and so the summation order) depends on the batch
+    p_probs = ref.probs()
+    p_mass = float(p_probs.sum())
+    p_support = len(ref)
+
+    rows = len(others)
+    lengths = np.fromiter((len(o) for o in others), dtype=np.int64, count=rows)
+    row_of = np.repeat(np.arange(rows), lengths)
+    ids = np.concatenate([o.ids for o in others]) if rows else np.zeros(0, dtype=np.int64)
+    q = np.concatenate([o.probs() for o in others]) if rows else np.zeros(0)
+    pv = p[ids]
+
+    def rowsum(x):
+        # bincount adds each row's terms in order, so a row's sum does not depend on
+        # where it sits in the batch (reduceat's vectorized sums do, in the last bit)
+        return np.bincount(row_of, weights=np.asarray(x, dtype=float), minlength=rows)
+
+    covered = rowsum(pv > 0)
+    # reference mass on keys the other distribution lacks (exactly 0 when it covers the support)
+    p_only = np.where(covered < p_support, np.maximum(p_mass - rowsum(pv), 0.0), 0.0)
+
+    out: Dict[str, np.ndarray] = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if 'jsd' in metrics:
+            m = 0.5 * (pv + q)
+            terms = q * np.log2(q / m) + np.where(pv > 0, pv * np.log2(pv / m), 0.0)
+            # reference mass where `other` is zero contributes p * log2(p / (p / 2)) = p
+            out['jsd'] = np.clip(0.5 * (rowsum(terms) + p_only), 0.0, 1.0)
+        if 'kl' in metrics:
+            kl = rowsum(np.where(pv > 0, pv * np.log2(pv / q), 0.0))
+            out['kl'] = np.where(covered < p_support, np.inf, kl)
+        if 'kl_reverse' in metrics:
+            missing = rowsum(pv == 0)
+            kl = rowsum(np.where(pv > 0, q * np.log2(q / pv), 0.0))
+            out['kl_reverse'] = np.where(missing > 0, np.inf, kl)
+        if 'hellinger' in metrics:
+            # 0.5 * sum (sqrt p - sqrt q)^2 over the union; reference-only keys add their p
+            sq = rowsum((np.sqrt(pv) - np.sqrt(q)) ** 2) + p_only
+            out['hellinger'] = np.sqrt(np.clip(0.5 * sq, 0.0, 1.0))
+        if 'cosine' in metrics:
+            norms = np.sqrt(rowsum(q * q)) * np.sqrt(float(p_probs @ p_probs))
+            out['cosine'] = np.where(norms > 0, rowsum(pv * q) / np.where(norms > 0, norms, 1.0), 0.0)
+    return out
+
+
+def shared_jsd_terms(p: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Per-key terms t with JSD(P, Q) = 1 - 0.5 * sum(t) over the keys where both P and Q are non-zero.
+
+    Keys held by one side only contribute their mass times log2(2) = 1, so the
+    JSD of two normalized distributions only depends on their shared keys.
+    """
+    m = p + q
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return m - p * np.log2(2 * p / m) - q * np.log2(2 * q / m)
+
+
+class Postings:
+    """Inverted index over rows of `SparseCounts`: for each id, the rows holding it and their probabilities.
+
+    Args:
+        rows: Distributions to index
+        size: Index size (ids at or past it are unknown to every row); default: covers all rows
+    """
+
+    def __init__(self, rows: Sequence[SparseCounts], size: int | None = None):
+        self.n_rows = len(rows)
+        self.size = max([size or 0] + [r.size for r in rows])
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=self.n_rows)
+        ids = np.concatenate([r.ids for r in rows]) if self.n_rows else np.zeros(0, dtype=np.int64)
+        probs = np.concatenate([r.probs() for r in rows]) if self.n_rows else np.zeros(0)
+        order = np.argsort(ids, kind='stable')
+        self.offsets = np.searchsorted(ids[order], np.arange(self.size + 1))
+        self.rows = np.repeat(np.arange(self.n_rows), lengths)[order]
+        self.probs = probs[order]
+        self.empty = lengths == 0
+
+    def jsd(self, queries: Sequence[SparseCounts], batch_postings: int = 1 << 22) -> np.ndarray:
+        """JSD matrix (len(queries) x rows); NaN where either distribution is empty.
+
+        Queries are scored in batches touching about `batch_postings` postings.
+        """
+        out = np.ones((len(queries), self.n_rows))
+        start = 0
+        while start < len(queries):
+            stop, touched = start, 0
+            parts = []
+            while stop < len(queries) and (touched < batch_postings or stop == start):
+                q = queries[stop]
+                known = q.ids < self.size
+                ids, probs = q.ids[known], q.probs()[known]
+                lengths = self.offsets[ids + 1] - self.offsets[ids]
+                parts.append((stop - start, ids, probs, lengths))
+                touched += int(lengths.sum())
+                stop += 1
+            qrow = np.concatenate([np.repeat(np.full(len(ids), i), lengths) for i, ids, _, lengths in parts])
+            lengths = np.concatenate([p[3] for p in parts])
+            starts = np.concatenate([self.offsets[p[1]] for p in parts])
+            q = np.repeat(np.concatenate([p[2] for p in parts]), lengths)
+            pos = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+            cells = qrow.astype(np.int64) * self.n_rows + self.rows[pos]
+            terms = shared_jsd_terms(self.probs[pos], q)
+            shared = np.bincount(cells, weights=terms, minlength=(stop - start) * self.n_rows)
+            out[start:stop] = np.clip(1.0 - 0.5 * shared.reshape(stop - start, self.n_rows), 0.0, 1.0)
+            start = stop
+        empty_q = np.fromiter((len(q) == 0 for q in queries), dtype=bool, count=len(queries))
+        out[empty_q] = np.nan
+        out[:, self.empty] = np.nan
+        return out
+
+
+def compare_mappings(p: Mapping[Hashable, float], q: Mapping[Hashable, float],
+                     metrics: Sequence[str] = METRICS) -> Dict[str, float]:
+    """All `metrics` between two `{key: count or probability}` mappings."""
+    index = Vocabulary()
+    ref = SparseCounts.from_mapping(p, index)
+    res = divergences(ref, [SparseCounts.from_mapping(q, index)], metrics)
+    return {k: float(v[0]) for k, v in res.items()}
+
+
+def jensen_shannon(p: Mapping[Hashable, float], q: Mapping[Hashable, float]) -> float:
+    return compare_mappings(p, q, ('jsd',))['jsd']
+
@@ -0,0 +1,107 @@
+"""Batched n-gram counting over integer-encoded token streams.
+
+`count_ngrams` counts every order 1..N in one sweep: the n-gram at position i
+is keyed by the dense rank of the (n-1)-gram at i combined with token i+n-1,
+so keys stay below `(positions + 1) * V` for any order and never overflow.
+Windows crossing a segment (line) boundary are masked out.
+
+Each order is kept as `NgramCounts`: the start position of each distinct
+n-gram's first occurrence plus its count, in first-occurrence order. Strings
+are only built for the entries actually requested (`top`, `to_dict`).
+"""
+from __future__ import annotations
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    from .vocab import Vocabulary, group_keys, top_k
+except ImportError:
+    from vocab import Vocabulary, group_keys, top_k
+
+ORDER_NAMES = {1: 'unigrams', 2: 'bigrams', 3: 'trigrams'}
+
+
+def order_name(n: int) -> str:
+    return ORDER_NAMES.get(n, f'{n}grams')
+
+
+class NgramCounts:
+    """Counts of one n-gram order over a token id stream."""
+
+    def __init__(self, n: int, starts: np.ndarray, counts: np.ndarray, ids: np.ndarray, vocab: Vocabulary):
+        self.n = n
+        self.starts = starts
+        self.counts = counts
+        self.ids = ids
+        self.vocab = vocab
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    def id_tuples(self, idx: np.ndarray | None = None) -> np.ndarray:
+        """`[k, n]` token ids of the selected entries (all entries if `idx` is None)."""
+        starts = self.starts if idx is None else self.starts[idx]
+        return self.ids[starts[:, None] + np.arange(self.n)]
+
+    def strings(self, idx: np.ndarray | None = None, sep: str = ' ') -> List[str]:
+        tokens = self.vocab.tokens
+        return [sep.join(tokens[i] for i in row) for row in self.id_tuples(idx).tolist()]
+
+    def top(self, k: int | None, sep: str = ' ') -> List[Tuple[str, int]]:
+        idx = top_k(self.counts, k)
+        return list(zip(self.strings(idx, sep), self.counts[idx].tolist()))
+
+    def items(self, sep: str = ' ') -> Iterator[Tuple[str, int]]:
+        return zip(self.strings(sep=sep), self.counts.tolist())
+
+    def to_dict(self, sep: str = ' ') -> Dict[str, int]:
+        return dict(self.items(sep))
+
+
+def count_ngrams(ids: np.ndarray, vocab: Vocabulary, max_n: int = 3,
+                 segments: np.ndarray | None = None) -> Dict[int, NgramCounts]:
+    """Count all n-gram orders 1..`max_n` of `ids`, respecting `segments` boundaries."""
+    ids = np.asarray(ids, dtype=np.int64)
+    size = max(len(vocab), 1)
+    same = None
+    if segments is not None:
+        seg = np.asarray(segments)
+        same = seg[1:] == seg[:-1]
+
+    out: Dict[int, NgramCounts] = {}
+    dense = None
+    valid = np.ones(len(ids), dtype=bool)
+    for n in range(1, max_n + 1):
+        m = len(ids) - n + 1
+        if m <= 0:
+            empty = np.zeros(0, dtype=np.int64)
+            out[n] = NgramCounts(n, empty, empty, ids, vocab)
+            continue
+        if n == 1:
+            keys = ids
+        else:
+            keys = dense[:m] * size + ids[n - 1:]
+            valid = valid[:m].copy()
+            if same is not None:
+                valid &= same[n - 2:]
+        positions = np.flatnonzero(valid)
+        uniq, first, inverse, counts = group_keys(keys[positions])
+        # dense rank of every window; invalid windows share the sentinel rank len(uniq)
+        dense = np.full(m, len(uniq), dtype=np.int64)
+        dense[positions] = inverse
+        starts = positions[first]
+        order = _first_occurrence_order(starts, m)
+        out[n] = NgramCounts(n, starts[order], counts[order], ids, vocab)
+    return out
+
+
+def _first_occurrence_order(starts: np.ndarray, m: int) -> np.ndarray:
+    """Permutation sorting the (distinct, < m) `starts` ascending, in O(m) without a sort."""
+    slot = np.full(m, -1, dtype=np.int64)
+    slot[starts] = np.arange(len(starts))
+    return slot[slot >= 0]
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Serializable, mergeable n-gram counts for sharded statistics.
+
+Each shard (a transcription variant, a slice of a corpus) is counted
+independently into an `NgramSketch`; sketches are merged with `merge` / `+`
+and saved as JSON, so entropy and top n-grams can be computed over shards
+counted on different workers or machines.
+
+Modes:
+- `exact`: every order is an exact Counter; merging is exact and associative.
+- `heavy`: unigrams stay exact (vocabularies are small); higher orders keep a
+  Misra-Gries / space-saving table of at most `capacity` candidates plus a
+  Count-Min sketch (`width` x `depth`) for point estimates. Memory is bounded
+  regardless of corpus size; candidate counts undercount by at most `error`
+  and Count-Min estimates only ever overcount.
+
+N-grams are space-joined token strings and never cross a line boundary.
+
+Usage:
+  python3 src/analytics/sketch.py shard1.json shard2.json -o merged.json --top 20
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from .ngrams import NgramCounts, count_ngrams
+    from .vocab import encode_lines
+except ImportError:
+    from ngrams import NgramCounts, count_ngrams
+    from vocab import encode_lines
+
+SKETCH_VERSION = 1
+
+
+class CountMin:
+    """Count-Min sketch over strings with stable (process-independent) hashing."""
+
+    def __init__(self, width: int = 1 << 16, depth: int = 4, table: np.ndarray | None = None):
+        if not 1 <= depth <= 8:
+            raise ValueError('depth must be between 1 and 8')
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else np.zeros((depth, width), dtype=np.int64)
+
+    def _columns(self, keys: Sequence[str]) -> np.ndarray:
+        """`[len(keys), depth]` column indices from one blake2b digest per key."""
+        digests = b''.join(hashlib.blake2b(k.encode('utf-8'), digest_size=8 * self.depth).digest() for k in keys)
+        hashes = np.frombuffer(digests, dtype='<u8').reshape(len(keys), self.depth)
+        return (hashes % np.uint64(self.width)).astype(np.int64)
+
+    def add(self, keys: Sequence[str], counts: Sequence[int]):
+        if not len(keys):
+            return
+        cols = self._columns(keys)
+        counts = np.asarray(counts, dtype=np.int64)
+        for d in range(self.depth):
+            np.add.at(self.table[d], cols[:, d], counts)
+
+    def estimate(self, keys: Sequence[str]) -> np.ndarray:
+        if not len(keys):
+            return np.zeros(0, dtype=np.int64)
+        cols = self._columns(keys)
+        return self.table[np.arange(self.depth), cols].min(axis=1)
+
+    def merge(self, other: 'CountMin') -> 'CountMin':
+        if (self.width, self.depth) != (other.width, other.depth):
+            raise ValueError('cannot merge Count-Min sketches of different shapes')
+        return CountMin(self.width, self.depth, self.table + other.table)
+
+
+class HeavyHitters:
+    """Misra-Gries summary holding at most `capacity` candidate keys."""
+
+    def __init__(self, capacity: int = 10000, counts: Dict[str, int] | None = None, error: int = 0):
+        self.capacity = capacity
+        self.counts = Counter(counts or {})
+        self.error = error
+
+    def add(self, counts: Dict[str, int]):
+        self.counts.update(counts)
+        self._prune()
+
+    def _prune(self):
+        if len(self.counts) <= self.capacity:
+            return
+        values = np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts))
+        # subtracting the (capacity+1)-th largest count keeps at most `capacity` keys
+        cut = int(np.partition(values, len(values) - self.capacity - 1)[len(values) - self.capacity - 1])
+        self.counts = Counter({k: v - cut for k, v in self.counts.items() if v > cut})
+        self.error += cut
+
+    def merge(self, other: 'HeavyHitters') -> 'HeavyHitters':
+        out = HeavyHitters(min(self.capacity, other.capacity), self.counts + other.counts, self.error + other.error)
+        out._prune()
+        return out
+
+
+class NgramSketch:
+    """Mergeable n-gram counts (orders 1..`max_n`) for one or more shards."""
+
+    def __init__(self, max_n: int = 3, mode: str = 'exact', capacity: int = 10000,
+                 width: int = 1 << 16, depth: int = 4):
+        if mode not in ('exact', 'heavy'):
+            raise ValueError(f'unknown sketch mode {mode!r}')
+        self.max_n = max_n
+        self.mode = mode
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.lines = 0
+        self.tokens = 0
+        self.exact: Dict[int, Counter] = {}
+        self.heavy: Dict[int, HeavyHitters] = {}
+        self.cms: Dict[int, CountMin] = {}
+        for n in range(1, max_n + 1):
+            if self.is_exact(n):
+                self.exact[n] = Counter()
+            else:
+                self.heavy[n] = HeavyHitters(capacity)
+                self.cms[n] = CountMin(width, depth)
+
+    def is_exact(self, n: int) -> bool:
+        return self.mode == 'exact' or n == 1
+
+    def update(self, lines: Sequence[Sequence[str]]):
+        """Count a batch of tokenized lines into the sketch."""
+        vocab, ids, segments = encode_lines(lines)
+        self.add_counts(count_ngrams(ids, vocab, max_n=self.max_n, segments=segments), len(lines))
+
+    def add_counts(self, counts: Dict[int, NgramCounts], n_lines: int):
+        """Fold engine output (`count_ngrams`, orders 1..`max_n`) into the sketch."""
+        self.lines += n_lines
+        self.tokens += counts[1].total
+        for n in range(1, self.max_n + 1):
+            table = counts[n].to_dict()
+            if self.is_exact(n):
+                self.exact[n].update(table)
+            else:
+                self.heavy[n].add(table)
+                self.cms[n].add(list(table), list(table.values()))
+
+    def merge(self, other: 'NgramSketch') -> 'NgramSketch':
+        if (self.max_n, self.mode) != (other.max_n, other.mode):
+            raise ValueError('cannot merge sketches with different orders or modes')
+        out = NgramSketch(self.max_n, self.mode, min(self.capacity, other.capacity), self.width, self.depth)
+        out.lines = self.lines + other.lines
+        out.tokens = self.tokens + other.tokens
+        for n in out.exact:
+            out.exact[n] = self.exact[n] + other.exact[n]
+        for n in out.heavy:
+            out.heavy[n] = self.heavy[n].merge(other.heavy[n])
+            out.cms[n] = self.cms[n].merge(other.cms[n])
+        return out
+
+    __add__ = merge
+
+    def top(self, n: int, k: int | None = 20) -> List[Tuple[str, int]]:
+        if self.is_exact(n):
+            return self.exact[n].most_common(k)
+        keys = list(self.heavy[n].counts)
+        estimates = self.cms[n].estimate(keys)
+        ranked = sorted(zip(keys, estimates.tolist()), key=lambda t: -t[1])
+        return ranked if k is None else ranked[:k]
+
+    def estimate(self, n: int, gram: str) -> int:
+        if self.is_exact(n):
+            return self.exact[n].get(gram, 0)
+        return int(self.cms[n].estimate([gram])[0])
+
+    def entropy(self, n: int = 1) -> float:
+        """Shannon entropy (bits) of an exact order."""
+        if not self.is_exact(n):
+            raise ValueError(f'order {n} is approximate in {self.mode!r} mode')
+        values = np.fromiter(self.exact[n].values(), dtype=float, count=len(self.exact[n]))
+        values = values[values > 0]
+        if not len(values):
+            return 0.0
+        p = values / values.sum()
+        return float(-(p * np.log2(p)).sum())
+
+    def to_dict(self) -> dict:
+        return {
+            'version': SKETCH_VERSION,
+            'max_n': self.max_n,
+            'mode': self.mode,
+            'capacity': self.capacity,
+            'width': self.width,
+            'depth': self.depth,
+            'lines': self.lines,
+            'tokens': self.tokens,
+            'exact': {str(n): dict(c) for n, c in self.exact.items()},
+            'heavy': {str(n): {'counts': dict(h.counts), 'error': h.error} for n, h in self.heavy.items()},
+            'cms': {str(n): c.table.tolist() for n, c in self.cms.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: dict) -> 'NgramSketch':
+        if d.get('version') != SKETCH_VERSION:
+            raise ValueError(f"Unsupported sketch version {d.get('version')}")
+        sk = cls(d['max_n'], d['mode'], d['capacity'], d['width'], d['depth'])
+        sk.lines = d['lines']
+        sk.tokens = d['tokens']
+        for n, c in d['exact'].items():
+            sk.exact[int(n)] = Counter(c)
+        for n, h in d['heavy'].items():
+            sk.heavy[int(n)] = HeavyHitters(sk.capacity, h['counts'], h['error'])
+        for n, t in d['cms'].items():
+            sk.cms[int(n)] = CountMin(sk.width, sk.depth, np.asarray(t, dtype=np.int64))
+        return sk
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.to_dict(), fh, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'NgramSketch':
+        with open(path, 'r', encoding='utf-8') as fh:
+            return cls.from_dict(json.load(fh))
+
+
+def sketch_lines(lines: Iterable[Sequence[str]], batch_lines: int = 100000, **kwargs) -> NgramSketch:
+    """Count tokenized lines into a new sketch, `batch_lines` at a time."""
+    sk = NgramSketch(**kwargs)
+    batch: List[Sequence[str]] = []
+    for toks in lines:
+        batch.append(toks)
+        if len(batch) >= batch_lines:
+            sk.update(batch)
+            batch = []
+    if batch:
+        sk.update(batch)
+    return sk
+
+
+def merge_all(sketches: Iterable[NgramSketch]) -> NgramSketch:
+    it = iter(sketches)
+    out = next(it)
+    for sk in it:
+        out = out + sk
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge n-gram sketches and report entropy / top n-grams')
+    parser.add_argument('inputs', nargs='+', help='Sketch JSON files written by stats.py --sketch')
+    parser.add_argument('-o', '--output', help='Write the merged sketch here')
+    parser.add_argument('--top', type=int, default=20, help='How many top items to print per order')
+    args = parser.parse_args()
+
+    merged = merge_all(NgramSketch.load(p) for p in args.inputs)
+    if args.output:
+        merged.save(args.output)
+        print('Wrote merged sketch to', args.output)
+    print(f'Shards: {len(args.inputs)}  Lines: {merged.lines}  Tokens: {merged.tokens}')
+    print(f'Unigram entropy: {merged.entropy(1):.4f}')
+    for n in range(1, merged.max_n + 1):
+        print(f'Top {n}-grams{"" if merged.is_exact(n) else " (approximate)"}:')
+        for gram, c in merged.top(n, args.top):
+            print(f'  {gram}: {c}')
+
+
+if __name__ == '__main__':
+    main()
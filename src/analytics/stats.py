@@ -3,6 +3,21 @@
 
 Reads a JSONL with records containing a `text` field (normalized lines).
 Outputs top unigrams/bigrams/trigrams and writes n-gram counts to JSON.
+Records are streamed and encoded to integer token ids as they are read, then
+counted with the batched engine in `ngrams.py`; n-grams never cross a line
+boundary. `ngrams()` below is the plain reference implementation used by the
+parity tests.
+
+JSON counts keep first-occurrence order (sorted by frequency with `--sort`)
+and can be pruned with `--min-count`. If the output path ends in `.tsv` they
+are streamed to a count table (see `count_table.py`) instead of one indented
+JSON document; count tables are sorted unless `--no-sort` is given.
+
+With `--sketch` the counts are also saved as a mergeable `NgramSketch`
+(see `sketch.py`), so shards counted separately can be combined later.
+The sketch is filled from this run's exact counts, so `--sketch-mode heavy`
+bounds the size of the saved sketch, not the memory of the run; use
+`sketch.sketch_lines` to count a stream in bounded memory.
 """
 import argparse
 import json
@@ -11,6 +26,19 @@ import math
 import re
 from collections import Counter
 
+import numpy as np
+
+try:
+    from .count_table import select_rows, write_count_table
+    from .ngrams import count_ngrams, order_name
+    from .sketch import NgramSketch
+    from .vocab import encode_lines
+except ImportError:
+    from count_table import select_rows, write_count_table
+    from ngrams import count_ngrams, order_name
+    from sketch import NgramSketch
+    from vocab import encode_lines
+
 
 TOKEN_RE = re.compile(r"[a-z0-9]+", re.IGNORECASE)
 
@@ -46,40 +74,48 @@ def read_jsonl(path):
             yield json.loads(line)
 
 
-def analyze(input_path, output_path=None, top=20):
-    uni = Counter()
-    bi = Counter()
-    tri = Counter()
-    total_lines = 0
-    total_tokens = 0
+def analyze(input_path, output_path=None, top=20, max_n=3, sketch_path=None, sketch_mode="exact",
+            min_count=1, sort=None):
+    n_lines = 0
+
+    def lines():
+        nonlocal n_lines
+        for rec in read_jsonl(input_path):
+            n_lines += 1
+            yield tokenize(rec.get("text", ""))
 
-    for rec in read_jsonl(input_path):
-        text = rec.get("text", "")
-        tokens = tokenize(text)
-        total_lines += 1
-        total_tokens += len(tokens)
-        uni.update(tokens)
-        bi.update(ngrams(tokens, 2))
-        tri.update(ngrams(tokens, 3))
+    vocab, ids, segments = encode_lines(lines())
+    counts = count_ngrams(ids, vocab, max_n=max(max_n, 1), segments=segments)
+
+    uni = counts[1].counts
+    p = uni / uni.sum() if len(uni) else uni
 
     results = {
-        "lines": total_lines,
-        "tokens": total_tokens,
-        "unigram_count": sum(uni.values()),
-        "unigram_entropy": shannon_entropy(uni),
-        "top_unigrams": uni.most_common(top),
-        "top_bigrams": [([" ".join(t)], c) for t, c in bi.most_common(top)],
-        "top_trigrams": [([" ".join(t)], c) for t, c in tri.most_common(top)],
+        "lines": n_lines,
+        "tokens": int(len(ids)),
+        "unigram_count": counts[1].total,
+        "unigram_entropy": float(-(p * np.log2(p)).sum()) if len(p) else 0.0,
+        "top_unigrams": counts[1].top(top),
     }
+    for n in range(2, max_n + 1):
+        results[f"top_{order_name(n)}"] = [([s], c) for s, c in counts[n].top(top)]
 
-    if output_path:
+    if output_path and output_path.endswith(".tsv"):
+        write_count_table(output_path, {n: counts[n] for n in range(1, max_n + 1)},
+                          sort=sort is not False, min_count=min_count)
+    elif output_path:
         os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
         with open(output_path, "w", encoding="utf-8") as f:
-            json.dump({
-                "unigrams": dict(uni),
-                "bigrams": {" ".join(k): v for k, v in bi.items()},
-                "trigrams": {" ".join(k): v for k, v in tri.items()},
-            }, f, ensure_ascii=False, indent=2)
+            tables = {}
+            for n in range(1, max_n + 1):
+                idx = select_rows(counts[n], bool(sort), min_count)
+                tables[order_name(n)] = dict(zip(counts[n].strings(idx), counts[n].counts[idx].tolist()))
+            json.dump(tables, f, ensure_ascii=False, indent=2)
+
+    if sketch_path:
+        sketch = NgramSketch(max_n=max(max_n, 1), mode=sketch_mode)
+        sketch.add_counts(counts, n_lines)
+        sketch.save(sketch_path)
 
     return results
 
@@ -87,11 +123,21 @@ def analyze(input_path, output_path=None, top=20):
 def main():
     parser = argparse.ArgumentParser(description="Compute token and n-gram statistics from JSONL transcription")
     parser.add_argument("input", help="Path to JSONL produced by ingest script")
-    parser.add_argument("-o", "--output", default="data/processed/ngrams.json", help="Path to write n-gram counts JSON")
+    parser.add_argument("-o", "--output", default="data/processed/ngrams.json",
+                        help="Path to write n-gram counts (JSON, or a streamed count table if it ends in .tsv)")
     parser.add_argument("--top", type=int, default=20, help="How many top items to print")
+    parser.add_argument("--max-n", type=int, default=3, help="Highest n-gram order to count")
+    parser.add_argument("--min-count", type=int, default=1, help="Drop n-grams rarer than this")
+    parser.add_argument("--sort", action=argparse.BooleanOptionalAction, default=None,
+                        help="Sort counts by frequency (default: JSON in first-occurrence order, .tsv sorted)")
+    parser.add_argument("--sketch", help="Also write a mergeable n-gram sketch (JSON) for this shard")
+    parser.add_argument("--sketch-mode", choices=["exact", "heavy"], default="exact",
+                        help="exact counts, or bounded-size heavy hitters for orders >= 2")
     args = parser.parse_args()
 
-    res = analyze(args.input, args.output, top=args.top)
+    res = analyze(args.input, args.output, top=args.top, max_n=args.max_n,
+                  sketch_path=args.sketch, sketch_mode=args.sketch_mode,
+                  min_count=args.min_count, sort=args.sort)
 
     print(f"Lines: {res['lines']}")
     print(f"Tokens: {res['tokens']}")
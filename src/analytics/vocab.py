@@ -0,0 +1,177 @@
+"""Integer-encoded vocabulary and n-gram counting on numpy id arrays.
+
+Tokens are mapped once to dense ids in first-seen order. Unigram counts are a
+`bincount` over the ids, and an n-gram is packed into a single int64 key in
+base `len(vocab)` (bigram key = id1 * V + id2), counted with `np.unique`.
+
+Results are ordered by first occurrence, so converting them back to a
+`Counter` yields the same insertion order (and `most_common` tie order) as
+counting the token strings directly.
+"""
+from __future__ import annotations
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+
+class Vocabulary:
+    """Dense integer ids for token strings, assigned in first-seen order."""
+
+    def __init__(self, tokens: Iterable[str] = ()):
+        self.index: Dict[str, int] = {}
+        self.tokens: List[str] = []
+        for t in tokens:
+            self.add(t)
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.index
+
+    def add(self, token: str) -> int:
+        i = self.index.get(token)
+        if i is None:
+            i = self.index[token] = len(self.tokens)
+            self.tokens.append(token)
+        return i
+
+    def get(self, token: str, default: int = -1) -> int:
+        return self.index.get(token, default)
+
+    def encode(self, tokens: Iterable[str], grow: bool = True) -> np.ndarray:
+        """Return int32 ids for `tokens`; unseen tokens are added (or -1 if `grow=False`)."""
+        index = self.index
+        out = array('i')
+        if grow:
+            vocab = self.tokens
+            for t in tokens:
+                i = index.get(t)
+                if i is None:
+                    i = index[t] = len(vocab)
+                    vocab.append(t)
+                out.append(i)
+        else:
+            for t in tokens:
+                out.append(index.get(t, -1))
+        return np.frombuffer(out, dtype=np.int32) if len(out) else np.zeros(0, dtype=np.int32)
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        vocab = self.tokens
+        return [vocab[i] for i in ids]
+
+
+def unigram_counts(ids: np.ndarray, size: int) -> np.ndarray:
+    return np.bincount(ids, minlength=size) if len(ids) else np.zeros(size, dtype=np.int64)
+
+
+def ngram_keys(ids: np.ndarray, n: int, size: int, segments: np.ndarray | None = None) -> np.ndarray:
+    """Pack every length-`n` window of `ids` into one int64 key (base `size`).
+
+    If `segments` (one label per id, e.g. the line number) is given, windows
+    spanning two segments are dropped.
+    """
+    if size and n * np.log2(max(size, 2)) >= 63:
+        raise ValueError(f'{n}-gram keys over a vocabulary of {size} overflow int64')
+    ids = np.asarray(ids, dtype=np.int64)
+    m = len(ids) - n + 1
+    if n <= 0 or m <= 0:
+        return np.zeros(0, dtype=np.int64)
+    keys = ids[:m].copy()
+    for k in range(1, n):
+        keys *= size
+        keys += ids[k:k + m]
+    if segments is not None:
+        seg = np.asarray(segments)
+        keys = keys[seg[:m] == seg[n - 1:n - 1 + m]]
+    return keys
+
+
+def group_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Equivalent of `np.unique(keys, return_index, return_inverse, return_counts)` with a single sort."""
+    keys = np.asarray(keys)
+    if len(keys) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return keys, empty, empty, empty
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    is_new = np.empty(len(keys), dtype=bool)
+    is_new[0] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_new[1:])
+    bounds = np.flatnonzero(is_new)
+    first = np.minimum.reduceat(order, bounds)
+    counts = np.diff(np.append(bounds, len(keys)))
+    inverse = np.empty(len(keys), dtype=np.int64)
+    inverse[order] = np.cumsum(is_new) - 1
+    return sorted_keys[bounds], first, inverse, counts
+
+
+def count_keys(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Unique keys and their counts, ordered by first occurrence in `keys`."""
+    if len(keys) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    uniq, first, _, counts = group_keys(keys)
+    order = np.argsort(first, kind='stable')
+    return uniq[order], counts[order]
+
+
+def decode_keys(keys: np.ndarray, n: int, size: int) -> np.ndarray:
+    """Unpack int64 n-gram keys into an `[len(keys), n]` array of token ids."""
+    keys = np.asarray(keys, dtype=np.int64).copy()
+    out = np.empty((len(keys), n), dtype=np.int64)
+    for k in range(n - 1, -1, -1):
+        out[:, k] = keys % size
+        keys //= size
+    return out
+
+
+def key_strings(keys: np.ndarray, n: int, vocab: Vocabulary, sep: str = ' ') -> List[str]:
+    tokens = vocab.tokens
+    return [sep.join(tokens[i] for i in row) for row in decode_keys(keys, n, len(vocab)).tolist()]
+
+
+def top_k(counts: np.ndarray, k: int | None) -> np.ndarray:
+    """Indices of the `k` largest counts, ties broken by position (like `Counter.most_common`).
+
+    Uses a partial selection, so only the selected `k` entries are sorted.
+    """
+    counts = np.asarray(counts)
+    if k is None or k >= len(counts):
+        return np.argsort(-counts, kind='stable')
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    threshold = np.partition(counts, len(counts) - k)[len(counts) - k]
+    above = np.flatnonzero(counts > threshold)
+    ties = np.flatnonzero(counts == threshold)[:k - len(above)]
+    sel = np.concatenate([above, ties])
+    return sel[np.lexsort((sel, -counts[sel]))]
+
+
+def unigram_counter(vocab: Vocabulary, counts: np.ndarray) -> Counter:
+    return Counter({t: c for t, c in zip(vocab.tokens, counts.tolist()) if c})
+
+
+def ngram_counter(vocab: Vocabulary, keys: np.ndarray, counts: np.ndarray, n: int, sep: str = ' ') -> Counter:
+    return Counter(dict(zip(key_strings(keys, n, vocab, sep), counts.tolist())))
+
+
+def encode_lines(lines: Iterable[Sequence[str]], vocab: Vocabulary | None = None) -> Tuple[Vocabulary, np.ndarray, np.ndarray]:
+    """Encode tokenized lines into one flat id array plus a per-id line index.
+
+    `lines` is read once, so it can be a generator; only the ids and line
+    lengths are kept, not the token lists.
+    """
+    vocab = vocab if vocab is not None else Vocabulary()
+    lengths = array('q')
+
+    def tokens():
+        for toks in lines:
+            lengths.append(len(toks))
+            yield from toks
+
+    ids = vocab.encode(tokens())
+    lengths = np.frombuffer(lengths, dtype=np.int64) if len(lengths) else np.zeros(0, dtype=np.int64)
+    segments = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+    return vocab, ids, segments
@@ -42,12 +42,14 @@ def cmd_ingest(args: argparse.Namespace):
         cmd.append('--no-remove-numbers')
     if args.no_remove_uncertainty:
         cmd.append('--no-remove-uncertainty')
+    if args.workers and args.workers > 1:
+        cmd.extend(['--workers', str(args.workers)])
     run_cmd(cmd)
 
 
 def cmd_tokenize(args: argparse.Namespace):
     script = ROOT / 'src' / 'ingest' / 'tokenize.py'
-    cmd = [sys.executable, str(script), args.input, '-o', args.output]
+    cmd = [sys.executable, str(script), args.input, '-o', args.output, '--raw', args.raw]
     run_cmd(cmd)
 
 
@@ -56,6 +58,8 @@ def cmd_stats(args: argparse.Namespace):
     cmd = [sys.executable, str(script), args.input, '-o', args.output]
     if args.top:
         cmd.extend(['--top', str(args.top)])
+    if args.min_count > 1:
+        cmd.extend(['--min-count', str(args.min_count)])
     run_cmd(cmd)
 
 
@@ -105,7 +109,8 @@ def cmd_aggregate(args: argparse.Namespace):
 
 def cmd_compare_corpora(args: argparse.Namespace):
     script = ROOT / 'src' / 'compare' / 'compare_corpora.py'
-    cmd = [sys.executable, str(script), '--voynich', args.voynich, '--corpora', args.corpora, '--out', args.out]
+    cmd = [sys.executable, str(script), '--voynich', args.voynich, '--corpora', args.corpora, '--out', args.out,
+           '--jobs', str(args.jobs)]
     run_cmd(cmd)
 
 
@@ -119,17 +124,20 @@ def main(argv: list[str] | None = None):
     p_ing.add_argument('--no-strip-html', action='store_true')
     p_ing.add_argument('--no-remove-numbers', action='store_true')
     p_ing.add_argument('--no-remove-uncertainty', action='store_true')
+    p_ing.add_argument('--workers', type=int, default=1)
     p_ing.set_defaults(func=cmd_ingest)
 
     p_tok = sub.add_parser('tokenize', help='Run tokenize script')
     p_tok.add_argument('input')
     p_tok.add_argument('-o', '--output', default=str(ROOT / 'data' / 'processed' / 'tokens.jsonl'))
+    p_tok.add_argument('--raw', choices=['inline', 'ref'], default='inline')
     p_tok.set_defaults(func=cmd_tokenize)
 
     p_stats = sub.add_parser('stats', help='Run stats analysis')
     p_stats.add_argument('input')
     p_stats.add_argument('-o', '--output', default=str(ROOT / 'data' / 'processed' / 'ngrams.json'))
     p_stats.add_argument('--top', type=int, default=20)
+    p_stats.add_argument('--min-count', type=int, default=1)
     p_stats.set_defaults(func=cmd_stats)
 
     p_train = sub.add_parser('train-embeddings', help='Train gensim embeddings')
@@ -161,6 +169,7 @@ def main(argv: list[str] | None = None):
     p_cmp.add_argument('--voynich', default=str(ROOT / 'data' / 'processed' / 'voynich_takahashi.jsonl'))
     p_cmp.add_argument('--corpora', default=str(ROOT / 'data' / 'corpora'))
     p_cmp.add_argument('--out', default=str(ROOT / 'reports' / 'comparison'))
+    p_cmp.add_argument('--jobs', type=int, default=1)
     p_cmp.set_defaults(func=cmd_compare_corpora)
 
     args = parser.parse_args(argv)
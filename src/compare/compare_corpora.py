@@ -11,18 +11,46 @@ Writes outputs to `reports/comparison/`:
 - `{corpus}_details.json` with top ngrams and counts
 - `summary.md` human-readable ranking
 
+Corpora are scored from profiles (see `profiles.py`) stored under
+`--profiles` and keyed by file hash, so unchanged corpora are not re-read.
+The Voynich counts are encoded once (`VoynichCounts`); each profile is mapped
+onto their ids with array lookups and all corpora are scored with one
+`divergences` pass per feature (`corpus_details`).
+The embedding model is loaded once per run and embeddings are cached under
+`--embed-cache` (see `embeddings.py`).
+
+With `--jobs N`, corpora are profiled and scored in N worker processes; each
+`{corpus}_details.json` is written as soon as that corpus finishes, and the
+summaries are written at the end in corpus file order. Embedding similarity
+is still computed in the main process so the model is loaded only once.
+
+With `--group-by FIELD` (e.g. `folio` with token_coords.jsonl, or `section`)
+the Voynich lines are split by that record field and every group is compared
+with every corpus at once (`group_matrix`, one inverted-index pass per
+feature). Outputs go to `{field}_jsd.npz` (float32 groups x corpora matrices
+per feature plus labels), `{field}_nearest.csv` and one heatmap per feature.
+
+With `--bootstrap N`, every JSD and embedding similarity also gets a 95%
+bootstrap interval and `p_best` (share of resamples in which the corpus was
+the closest) from N resamples (see `analytics/bootstrap.py`); they are added
+to the details files and written to `summary_ci.csv`.
+
 Usage:
   python3 src/compare/compare_corpora.py --voynich data/processed/voynich_takahashi.jsonl --corpora data/corpora --out reports/comparison
+  python3 src/compare/compare_corpora.py --voynich data/processed/token_coords.jsonl --corpora data/corpora --group-by folio
 """
 from __future__ import annotations
 import argparse
+import importlib.util
 import json
-import math
 import os
-import re
+import sys
 from collections import Counter
+from multiprocessing import Pool
 from pathlib import Path
-from typing import Dict, Iterable, List, Tuple
+from typing import Dict, List, Tuple
+
+import numpy as np
 try:
     from ..utils.experiment_logger import enrich_record, make_run_id
 except Exception:
@@ -30,14 +58,24 @@ except Exception:
         return r
     def make_run_id():
         return 'local'
-
-TOKEN_RE = re.compile(r"[a-z0-9]+", re.IGNORECASE)
-
-
-def tokenize(text: str) -> List[str]:
-    if not text:
-        return []
-    return TOKEN_RE.findall(text.lower())
+try:
+    from ..analytics.bootstrap import bootstrap_jsd, bootstrap_similarity, intervals
+    from ..analytics.divergence import Postings, SparseCounts, divergences, jensen_shannon
+    from ..analytics.vocab import Vocabulary, count_keys, unigram_counts
+    from .embeddings import DEFAULT_MODEL, SAMPLE_LINES, EmbeddingService, get_service
+    from .profiles import BIGRAM_BASE, PROFILE_VERSION, CorpusProfile, ProfileStore, token_counts, tokenize
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.analytics.bootstrap import bootstrap_jsd, bootstrap_similarity, intervals
+    from src.analytics.divergence import Postings, SparseCounts, divergences, jensen_shannon
+    from src.analytics.vocab import Vocabulary, count_keys, unigram_counts
+    from src.compare.embeddings import DEFAULT_MODEL, SAMPLE_LINES, EmbeddingService, get_service
+    from src.compare.profiles import BIGRAM_BASE, PROFILE_VERSION, CorpusProfile, ProfileStore, token_counts, tokenize
+
+# bump when the scores or fields produced by `corpus_details` change; part of pipeline cache keys
+SCORE_VERSION = 3
+# n-grams listed per corpus in the details files
+TOP_ITEMS = 40
 
 
 def ngrams(tokens: List[str], n: int) -> List[Tuple[str, ...]]:
@@ -52,26 +90,8 @@ def counter_to_prob(counter: Counter) -> Dict[str, float]:
 
 
 def js_divergence(p: Dict[str, float], q: Dict[str, float]) -> float:
-    # Jensen-Shannon divergence using log2
-    keys = set(p.keys()) | set(q.keys())
-    m = {}
-    for k in keys:
-        m[k] = 0.5 * (p.get(k, 0.0) + q.get(k, 0.0))
-
-    def kl(a, b):
-        s = 0.0
-        for k, v in a.items():
-            if v == 0:
-                continue
-            bv = b.get(k, 0.0)
-            if bv == 0:
-                # avoid log(0); treat as large divergence
-                s += v * math.log2(v / (1e-12))
-            else:
-                s += v * math.log2(v / bv)
-        return s
-
-    return 0.5 * (kl(p, m) + kl(q, m))
+    # Jensen-Shannon divergence using log2; scoring uses `VoynichCounts` instead of dictionaries
+    return jensen_shannon(p, q)
 
 
 def read_voynich_lines(path: Path) -> List[str]:
@@ -87,6 +107,31 @@ def read_voynich_lines(path: Path) -> List[str]:
     return lines
 
 
+def read_voynich_groups(path: Path, field: str | None = None) -> Dict[str, List[str]]:
+    """Voynich lines grouped by a record field such as 'folio' or 'section'.
+
+    Reads processed line records (`text`/`tokens`) as well as token records
+    (`token` plus `line_id`, e.g. token_coords.jsonl), whose tokens are joined
+    back into lines. Without `field` every line goes to one group, 'all';
+    records lacking the field go to 'unknown'. Groups keep first-seen order.
+    """
+    groups: Dict[str, Dict] = {}
+    with path.open('r', encoding='utf-8') as fh:
+        for i, ln in enumerate(fh):
+            if not ln.strip():
+                continue
+            obj = json.loads(ln)
+            group = str(obj.get(field, 'unknown')) if field else 'all'
+            lines = groups.setdefault(group, {})
+            if 'token' in obj and 'text' not in obj and 'tokens' not in obj:
+                lines.setdefault(('line', obj.get('line_id', obj.get('line'))), []).append(str(obj['token']))
+            else:
+                text = obj.get('text') or ' '.join(obj.get('tokens', []))
+                if text:
+                    lines[('record', i)] = [text]
+    return {g: [' '.join(parts) for parts in lines.values()] for g, lines in groups.items() if lines}
+
+
 def read_corpus_text(path: Path) -> str:
     with path.open('r', encoding='utf-8', errors='ignore') as fh:
         return fh.read()
@@ -96,86 +141,167 @@ def top_items(counter: Counter, n=30):
     return counter.most_common(n)
 
 
-def embed_similarity(v_texts: List[str], c_texts: List[str], model_name='all-MiniLM-L6-v2') -> float | None:
-    try:
-        from sentence_transformers import SentenceTransformer
-        import numpy as np
-    except Exception:
-        return None
-
-    model = SentenceTransformer(model_name)
-    # sample up to 200 lines each
-    s_v = v_texts[:200]
-    s_c = c_texts[:200]
-    if not s_v or not s_c:
-        return None
-    emb_v = model.encode(s_v, show_progress_bar=False, convert_to_numpy=True)
-    emb_c = model.encode(s_c, show_progress_bar=False, convert_to_numpy=True)
-    # compute mean pairwise cosine similarity (approx: mean of normalized dot products)
-    def mean_sim(a, b):
-        a_norm = a / (np.linalg.norm(a, axis=1, keepdims=True) + 1e-12)
-        b_norm = b / (np.linalg.norm(b, axis=1, keepdims=True) + 1e-12)
-        sims = a_norm @ b_norm.T
-        return float(sims.mean())
-
-    return mean_sim(emb_v, emb_c)
-
-
-def compare(voynich_path: Path, corpora_dir: Path, out_dir: Path):
-    out_dir.mkdir(parents=True, exist_ok=True)
-    run_id = make_run_id()
-    # write run-level metadata
-    meta = {
-        'run_id': run_id,
-        'voynich_source': str(voynich_path),
-        'corpora_dir': str(corpora_dir),
+def embed_similarity(v_texts: List[str], c_texts: List[str], model_name=DEFAULT_MODEL) -> float | None:
+    # mean pairwise cosine similarity of the first 200 lines of each side; the
+    # model is loaded once per process (see embeddings.py)
+    return get_service(model_name).similarity(v_texts[:SAMPLE_LINES], c_texts[:SAMPLE_LINES])
+
+
+def voynich_counts(v_lines: List[str]) -> Tuple[Counter, Counter]:
+    return token_counts(tok for t in v_lines for tok in tokenize(t))
+
+
+def with_fresh_ids(ids: np.ndarray, size: int) -> np.ndarray:
+    """`ids` with every -1 replaced by its own id past `size` (keys unknown to the reference)."""
+    ids = np.array(ids, dtype=np.int64)
+    unknown = ids < 0
+    ids[unknown] = size + np.arange(int(unknown.sum()))
+    return ids
+
+
+class VoynichCounts:
+    """Voynich token and bigram counts on integer ids, encoded once per run.
+
+    Token ids come from `vocab`; bigram ids number the distinct Voynich
+    bigrams in first-seen order. `align` puts a corpus profile on the same
+    ids with one dictionary lookup per distinct corpus token and array
+    lookups for its bigrams; keys the Voynich text lacks get fresh ids past
+    the end, so they only count for that corpus.
+
+    Args:
+        vocab: Vocabulary the Voynich token stream was encoded with
+        ids: The Voynich token stream (bigrams span consecutive ids)
+    """
+
+    def __init__(self, vocab: Vocabulary, ids: np.ndarray):
+        ids = np.asarray(ids, dtype=np.int64)
+        self.vocab = vocab
+        self.unigrams = SparseCounts(np.arange(len(vocab)), unigram_counts(ids, len(vocab)))
+        keys, counts = count_keys(ids[:-1] * BIGRAM_BASE + ids[1:])
+        self.bigrams = SparseCounts(np.arange(len(keys)), counts)
+        self.n_bigrams = len(keys)
+        self._bigram_order = np.argsort(keys)
+        self._sorted_bigrams = keys[self._bigram_order]
+
+    @classmethod
+    def from_lines(cls, v_lines: List[str]) -> 'VoynichCounts':
+        vocab = Vocabulary()
+        return cls(vocab, vocab.encode(tok for t in v_lines for tok in tokenize(t)))
+
+    def align(self, profile: CorpusProfile) -> Tuple[SparseCounts, SparseCounts]:
+        """Unigram and bigram counts of `profile` on the Voynich ids."""
+        to_voy = self.vocab.encode(profile.tokens, grow=False).astype(np.int64)
+        unigrams = SparseCounts(with_fresh_ids(to_voy, len(self.vocab)), profile.unigram_counts)
+        first, second = np.divmod(profile.bigram_keys, BIGRAM_BASE)
+        a, b = to_voy[first], to_voy[second]
+        keys = a * BIGRAM_BASE + b
+        ids = np.full(len(keys), -1, dtype=np.int64)
+        if self.n_bigrams:
+            pos = np.minimum(np.searchsorted(self._sorted_bigrams, keys), self.n_bigrams - 1)
+            found = (a >= 0) & (b >= 0) & (self._sorted_bigrams[pos] == keys)
+            ids[found] = self._bigram_order[pos[found]]
+        return unigrams, SparseCounts(with_fresh_ids(ids, self.n_bigrams), profile.bigram_counts)
+
+
+def score_corpus(corpus_file: Path, v_lines: List[str], p_v_uni: Dict[str, float], p_v_bi: Dict[str, float],
+                 run_id: str, voynich_source: str, profiles: ProfileStore | None = None,
+                 embedder: EmbeddingService | None = None) -> dict:
+    """Score a single corpus file against the Voynich distributions."""
+    profiles = profiles or ProfileStore(None)
+    return score_profile(corpus_file, profiles.get(corpus_file), v_lines, p_v_uni, p_v_bi, run_id, voynich_source,
+                         embedder=embedder, profiles=profiles)
+
+
+def score_profile(corpus_file: Path, profile: CorpusProfile, v_lines: List[str], p_v_uni: Dict[str, float],
+                  p_v_bi: Dict[str, float], run_id: str, voynich_source: str,
+                  embedder: EmbeddingService | None = None, profiles: ProfileStore | None = None,
+                  embed: bool = True) -> dict:
+    """Score a corpus profile; with `embed=False` the embedding similarity is left as None."""
+    detail = corpus_detail(corpus_file, profile, v_lines, p_v_uni, p_v_bi, embedder=embedder, profiles=profiles,
+                           embed=embed)
+    return stamp_detail(detail, run_id, voynich_source)
+
+
+def corpus_detail(corpus_file: Path, profile: CorpusProfile, v_lines: List[str], p_v_uni: Dict[str, float],
+                  p_v_bi: Dict[str, float], embedder: EmbeddingService | None = None,
+                  profiles: ProfileStore | None = None, embed: bool = True) -> dict:
+    """`corpus_details` of one profile against Voynich probability dictionaries (kept for callers holding those)."""
+    jsd_uni = js_divergence(p_v_uni, counter_to_prob(profile.unigrams))
+    jsd_bi = js_divergence(p_v_bi, counter_to_prob(profile.bigrams))
+    return make_detail(corpus_file, profile, jsd_uni, jsd_bi, v_lines, embedder, profiles, embed)
+
+
+def corpus_details(files: List[Path], corpus_profiles: List[CorpusProfile], voy: VoynichCounts,
+                   v_lines: List[str], embedder: EmbeddingService | None = None,
+                   profiles: ProfileStore | None = None, embed: bool = True) -> List[dict]:
+    """Scores of corpus profiles without provenance, so they can be cached across runs.
+
+    Every profile is aligned with `voy` and each feature is one `divergences`
+    pass over all of them.
+    """
+    aligned = [voy.align(p) for p in corpus_profiles]
+    jsd_uni = divergences(voy.unigrams, [uni for uni, _ in aligned], ('jsd',))['jsd'].tolist()
+    jsd_bi = divergences(voy.bigrams, [bi for _, bi in aligned], ('jsd',))['jsd'].tolist()
+    return [make_detail(f, p, ju, jb, v_lines, embedder, profiles, embed)
+            for f, p, ju, jb in zip(files, corpus_profiles, jsd_uni, jsd_bi)]
+
+
+def make_detail(corpus_file: Path, profile: CorpusProfile, jsd_uni: float, jsd_bi: float, v_lines: List[str],
+                embedder: EmbeddingService | None = None, profiles: ProfileStore | None = None,
+                embed: bool = True) -> dict:
+    # try embedding similarity (may be None); the corpus centroid is kept on its profile
+    emb_sim = None
+    if embed:
+        embedder = embedder or get_service()
+        emb_sim = embedder.similarity(v_lines[:SAMPLE_LINES], c_centroid=embedder.profile_centroid(profile, profiles))
+
+    detail = {
+        'corpus': corpus_file.stem,
+        'file': str(corpus_file),
+        'jsd_unigram': jsd_uni,
+        'jsd_bigram': jsd_bi,
+        'embedding_similarity': emb_sim,
+        'top_unigrams': profile.top_unigrams(TOP_ITEMS),
+        'top_bigrams': profile.top_bigrams(TOP_ITEMS),
+    }
+    return detail
+
+
+def scoring_params(embedder: EmbeddingService | None = None) -> dict:
+    """Everything besides the input files that determines `corpus_details`' output."""
+    return {
+        'score_version': SCORE_VERSION,
+        'profile_version': PROFILE_VERSION,
+        'top_items': TOP_ITEMS,
+        'sample_lines': SAMPLE_LINES,
+        'embedding_model': embedder.model_name if embedder else DEFAULT_MODEL,
+        # similarities are None without sentence-transformers; installing it must invalidate them
+        'embeddings_available': importlib.util.find_spec('sentence_transformers') is not None,
     }
+
+
+def stamp_detail(detail: dict, run_id: str, voynich_source: str) -> dict:
+    """Attach the provenance metadata of the run reporting `detail`."""
+    return enrich_record(detail, run_id=run_id, input_file=voynich_source, params={'corpus': detail['corpus']})
+
+
+def corpus_files(corpora_dir: Path) -> List[Path]:
+    return [p for p in sorted(corpora_dir.iterdir()) if p.is_file()]
+
+
+def write_metadata(meta: dict, out_dir: Path):
+    out_dir.mkdir(parents=True, exist_ok=True)
     with (out_dir / 'comparison_metadata.json').open('w', encoding='utf-8') as fh:
         json.dump(meta, fh, ensure_ascii=False, indent=2)
-    # load Voynich lines
-    v_lines = read_voynich_lines(voynich_path)
-    v_tokens = []
-    for t in v_lines:
-        v_tokens.extend(tokenize(t))
-
-    v_uni = Counter(v_tokens)
-    v_bi = Counter(' '.join(ng) for ng in ngrams(v_tokens, 2))
-    p_v_uni = counter_to_prob(v_uni)
-    p_v_bi = counter_to_prob(v_bi)
-
-    results = []
-    for corpus_file in sorted(corpora_dir.iterdir()):
-        if not corpus_file.is_file():
-            continue
-        name = corpus_file.stem
-        text = read_corpus_text(corpus_file)
-        c_tokens = tokenize(text)
-        c_uni = Counter(c_tokens)
-        c_bi = Counter(' '.join(ng) for ng in ngrams(c_tokens, 2))
-        p_c_uni = counter_to_prob(c_uni)
-        p_c_bi = counter_to_prob(c_bi)
-        jsd_uni = js_divergence(p_v_uni, p_c_uni)
-        jsd_bi = js_divergence(p_v_bi, p_c_bi)
-
-        # try embedding similarity (may be None)
-        emb_sim = embed_similarity(v_lines, text.splitlines())
-
-        detail = {
-            'corpus': name,
-            'file': str(corpus_file),
-            'jsd_unigram': jsd_uni,
-            'jsd_bigram': jsd_bi,
-            'embedding_similarity': emb_sim,
-            'top_unigrams': top_items(c_uni, 40),
-            'top_bigrams': top_items(c_bi, 40),
-        }
-        # attach provenance metadata
-        detail = enrich_record(detail, run_id=run_id, input_file=str(voynich_path), params={'corpus': name})
-        results.append(detail)
-        # write detail per corpus
-        with (out_dir / f"{name}_details.json").open('w', encoding='utf-8') as fh:
-            json.dump(detail, fh, ensure_ascii=False, indent=2)
 
+
+def write_detail(detail: dict, out_dir: Path):
+    with (out_dir / f"{detail['corpus']}_details.json").open('w', encoding='utf-8') as fh:
+        json.dump(detail, fh, ensure_ascii=False, indent=2)
+
+
+def write_summary(results: List[dict], out_dir: Path, meta: dict):
+    """Write the CSV/markdown summaries (rows in the order of `results`)."""
     # write summary CSV
     import csv
     csv_p = out_dir / 'summary.csv'
@@ -189,23 +315,244 @@ def compare(voynich_path: Path, corpora_dir: Path, out_dir: Path):
     md_p = out_dir / 'summary.md'
     with md_p.open('w', encoding='utf-8') as fh:
         fh.write('# Corpus comparison summary\n\n')
-        fh.write(f'Voynich source: {voynich_path}\n\n')
+        fh.write(f"Voynich source: {meta.get('voynich_source')}\n\n")
         fh.write('| corpus | jsd_unigram | jsd_bigram | embedding_similarity |\n')
         fh.write('|---|---:|---:|---:|\n')
         # sort by jsd_unigram ascending (more similar = lower)
         for r in sorted(results, key=lambda x: x['jsd_unigram'] if x['jsd_unigram'] is not None else 1e9):
-            fh.write(f"| {r['corpus']} | {r['jsd_unigram']:.6f} | {r['jsd_bigram']:.6f} | {'' if r['embedding_similarity'] is None else f'{r['embedding_similarity']:.4f}'} |\n")
+            emb = '' if r['embedding_similarity'] is None else f"{r['embedding_similarity']:.4f}"
+            fh.write(f"| {r['corpus']} | {r['jsd_unigram']:.6f} | {r['jsd_bigram']:.6f} | {emb} |\n")
+
 
+def write_comparison(results: List[dict], out_dir: Path, meta: dict):
+    """Write run metadata, per-corpus details and the CSV/markdown summaries."""
+    write_metadata(meta, out_dir)
+    for detail in results:
+        write_detail(detail, out_dir)
+    write_summary(results, out_dir, meta)
     print('Wrote comparison outputs to', out_dir)
 
 
+# per-process state of --jobs workers, set once by _init_worker
+_worker: dict = {}
+
+
+def _init_worker(state: dict):
+    _worker.update(state)
+    _worker['profiles'] = ProfileStore(state['profiles_dir'])
+
+
+def _score_task(corpus_file: Path):
+    """Profile and score one corpus in a worker; embedding similarity is left to the parent.
+
+    Returns the detail plus the profile's stored centroid, or the profile itself
+    when it has none, so the parent can compute the centroid and store it.
+    """
+    w = _worker
+    profile = w['profiles'].get(corpus_file)
+    detail = corpus_details([corpus_file], [profile], w['voy'], [], embed=False)[0]
+    detail = stamp_detail(detail, w['run_id'], w['voynich_source'])
+    cached = profile.centroids.get(w['model_name'])
+    return detail, cached, profile if cached is None else None
+
+
+def score_parallel(files: List[Path], jobs: int, state: dict, embedder: EmbeddingService, v_lines: List[str],
+                   out_dir: Path) -> List[dict]:
+    """Score `files` in `jobs` processes, writing each detail file as it completes."""
+    profiles = ProfileStore(state['profiles_dir'])
+    done = {}
+    with Pool(min(jobs, len(files)), initializer=_init_worker, initargs=(state,)) as pool:
+        for detail, cached, profile in pool.imap_unordered(_score_task, files):
+            c = embedder.profile_centroid(profile, profiles) if cached is None else np.asarray(cached)
+            detail['embedding_similarity'] = embedder.similarity(v_lines[:SAMPLE_LINES], c_centroid=c)
+            write_detail(detail, out_dir)
+            print('Scored', detail['corpus'])
+            done[detail['file']] = detail
+    return [done[str(f)] for f in files]
+
+
+def bootstrap_scores(results: List[dict], corpus_profiles: List[CorpusProfile], voy: VoynichCounts,
+                     draws: int, jobs: int = 1, embedder: EmbeddingService | None = None,
+                     v_lines: List[str] | None = None):
+    """Add bootstrap intervals and `p_best` for each JSD (and embedding similarity) to `results`."""
+    aligned = [voy.align(p) for p in corpus_profiles]
+    for i, (feature, ref) in enumerate((('unigram', voy.unigrams), ('bigram', voy.bigrams))):
+        res = bootstrap_jsd(ref, [a[i] for a in aligned], draws, jobs=jobs)
+        for detail, ci, p_best in zip(results, intervals(res), res['p_best'].tolist()):
+            detail[f'jsd_{feature}_ci'] = list(ci)
+            detail[f'p_best_{feature}'] = p_best
+    v_emb = embedder.embed(v_lines[:SAMPLE_LINES]) if embedder is not None and v_lines else None
+    if v_emb is not None:
+        c_embs = [embedder.embed(p.sample_lines[:SAMPLE_LINES]) for p in corpus_profiles]
+        res = bootstrap_similarity(v_emb, c_embs, draws)
+        for detail, ci, p_best in zip(results, intervals(res), res['p_best'].tolist()):
+            detail['embedding_similarity_ci'] = list(ci)
+            detail['p_best_embedding'] = p_best
+
+
+def write_intervals(results: List[dict], out_dir: Path):
+    import csv
+    # (score column, p_best suffix)
+    cols = [('jsd_unigram', 'unigram'), ('jsd_bigram', 'bigram'), ('embedding_similarity', 'embedding')]
+    with (out_dir / 'summary_ci.csv').open('w', encoding='utf-8', newline='') as fh:
+        w = csv.writer(fh)
+        w.writerow(['corpus'] + [c + suffix for c, _ in cols for suffix in ('', '_low', '_high', '_p_best')])
+        for r in results:
+            row = [r['corpus']]
+            for c, key in cols:
+                lo, hi = r.get(c + '_ci') or (None, None)
+                row += [r[c], lo, hi, r.get('p_best_' + key)]
+            w.writerow(row)
+
+
+def compare(voynich_path: Path, corpora_dir: Path, out_dir: Path, profiles_dir: Path | None = None,
+            model_name: str = DEFAULT_MODEL, embed_cache: Path | None = None, jobs: int = 1,
+            bootstrap: int = 0):
+    run_id = make_run_id()
+    meta = {
+        'run_id': run_id,
+        'voynich_source': str(voynich_path),
+        'corpora_dir': str(corpora_dir),
+    }
+    # load Voynich lines
+    v_lines = read_voynich_lines(voynich_path)
+    voy = VoynichCounts.from_lines(v_lines)
+
+    files = corpus_files(corpora_dir)
+    write_metadata(meta, out_dir)
+    embedder = EmbeddingService(model_name, cache_dir=embed_cache)
+    if jobs > 1 and len(files) > 1:
+        state = {
+            'voy': voy, 'run_id': run_id, 'voynich_source': str(voynich_path),
+            'profiles_dir': profiles_dir, 'model_name': model_name,
+        }
+        results = score_parallel(files, jobs, state, embedder, v_lines, out_dir)
+    else:
+        profiles = ProfileStore(profiles_dir)
+        corpus_profiles = [profiles.get(f) for f in files]
+        # one model load and one batched encode for the Voynich sample plus every missing centroid
+        embedder.prefetch_profiles(corpus_profiles, profiles, extra=[v_lines[:SAMPLE_LINES]])
+        results = [stamp_detail(d, run_id, str(voynich_path))
+                   for d in corpus_details(files, corpus_profiles, voy, v_lines, embedder=embedder, profiles=profiles)]
+        for detail in results:
+            write_detail(detail, out_dir)
+        if profiles.store_dir:
+            print(f'Corpus profiles: {profiles.loaded} loaded, {profiles.built} built ({profiles.store_dir})')
+    if bootstrap:
+        if jobs > 1 and len(files) > 1:
+            profiles = ProfileStore(profiles_dir)
+            corpus_profiles = [profiles.get(f) for f in files]
+        bootstrap_scores(results, corpus_profiles, voy, bootstrap, jobs, embedder, v_lines)
+        for detail in results:
+            write_detail(detail, out_dir)
+        write_intervals(results, out_dir)
+    write_summary(results, out_dir, meta)
+    print('Wrote comparison outputs to', out_dir)
+
+
+GROUP_FEATURES = ('unigram', 'bigram')
+
+
+def group_matrix(group_counts: List[Tuple[Counter, Counter]], profiles: List[CorpusProfile]) -> Dict[str, np.ndarray]:
+    """JSD of every Voynich group (rows) against every corpus profile (columns), per feature.
+
+    `group_counts` holds the (unigram, bigram) counts of each group. Each
+    feature is one `Postings.jsd` pass over all groups; cells where either
+    side has no tokens are NaN.
+    """
+    out = {}
+    for i, feature in enumerate(GROUP_FEATURES):
+        index = Vocabulary()
+        corpora = [SparseCounts.from_mapping(p.unigrams if i == 0 else p.bigrams, index) for p in profiles]
+        groups = [SparseCounts.from_mapping(counts[i], index, grow=False) for counts in group_counts]
+        out[feature] = Postings(corpora, len(index)).jsd(groups)
+    return out
+
+
+def plot_group_heatmap(matrix: np.ndarray, groups: List[str], corpora: List[str], title: str, path: Path):
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    fig, ax = plt.subplots(figsize=(min(4 + 0.4 * len(corpora), 30), min(3 + 0.15 * len(groups), 60)))
+    im = ax.imshow(np.ma.masked_invalid(matrix), aspect='auto', cmap='viridis_r', interpolation='nearest')
+    # label at most ~80 ticks per axis; hundreds of labels dominate the render time
+    xstep, ystep = max(1, len(corpora) // 80), max(1, len(groups) // 80)
+    ax.set_xticks(range(0, len(corpora), xstep))
+    ax.set_xticklabels(corpora[::xstep], rotation=90, fontsize=7)
+    ax.set_yticks(range(0, len(groups), ystep))
+    ax.set_yticklabels(groups[::ystep], fontsize=6)
+    fig.colorbar(im, ax=ax, label='JSD (lower = closer)')
+    ax.set_title(title)
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+    plt.close(fig)
+
+
+def compare_groups(voynich_path: Path, corpora_dir: Path, out_dir: Path, field: str,
+                   profiles_dir: Path | None = None) -> Dict[str, np.ndarray]:
+    """Compare every `field` group of the Voynich text with every corpus and write the matrices."""
+    meta = {
+        'run_id': make_run_id(),
+        'voynich_source': str(voynich_path),
+        'corpora_dir': str(corpora_dir),
+        'group_by': field,
+    }
+    groups = read_voynich_groups(voynich_path, field)
+    names = list(groups)
+    group_counts = [voynich_counts(groups[g]) for g in names]
+    files = corpus_files(corpora_dir)
+    profiles = ProfileStore(profiles_dir)
+    corpora = [f.stem for f in files]
+    matrices = group_matrix(group_counts, [profiles.get(f) for f in files])
+
+    write_metadata(meta, out_dir)
+    n_tokens = np.array([sum(uni.values()) for uni, _ in group_counts], dtype=np.int64)
+    np.savez_compressed(out_dir / f'{field}_jsd.npz', groups=np.array(names), corpora=np.array(corpora),
+                        n_tokens=n_tokens, **{f: m.astype(np.float32) for f, m in matrices.items()})
+    import csv
+    with (out_dir / f'{field}_nearest.csv').open('w', encoding='utf-8', newline='') as fh:
+        w = csv.writer(fh)
+        w.writerow([field, 'n_tokens'] + [c for f in GROUP_FEATURES for c in (f'nearest_{f}', f'jsd_{f}')])
+        for gi, g in enumerate(names):
+            row = [g, int(n_tokens[gi])]
+            for f in GROUP_FEATURES:
+                m = matrices[f][gi]
+                if len(m) and not np.isnan(m).all():
+                    best = int(np.nanargmin(m))
+                    row += [corpora[best], float(m[best])]
+                else:
+                    row += ['', '']
+            w.writerow(row)
+    for f, m in matrices.items():
+        plot_group_heatmap(m, names, corpora, f'{f.capitalize()} JSD by {field}', out_dir / f'{field}_jsd_{f}.png')
+    print(f'Compared {len(names)} {field} groups with {len(corpora)} corpora; wrote outputs to {out_dir}')
+    return matrices
+
+
 def main():
     parser = argparse.ArgumentParser(description='Compare Voynich with corpora')
     parser.add_argument('--voynich', required=True, help='Path to processed Voynich JSONL with text field')
     parser.add_argument('--corpora', required=True, help='Path to corpora directory (text files)')
     parser.add_argument('--out', default='reports/comparison', help='Output directory')
+    parser.add_argument('--profiles', default='.cache/profiles', help='Corpus profile store directory')
+    parser.add_argument('--no-profiles', action='store_true', help='Profile corpora in memory without storing them')
+    parser.add_argument('--embed-model', default=DEFAULT_MODEL, help='SentenceTransformer model for embedding similarity')
+    parser.add_argument('--embed-cache', default='.cache/embeddings', help='Embedding cache directory')
+    parser.add_argument('--no-embed-cache', action='store_true', help='Keep embeddings in memory only')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for profiling and scoring corpora')
+    parser.add_argument('--bootstrap', type=int, default=0, metavar='N',
+                        help='Add 95%% bootstrap intervals from N resamples (e.g. 1000)')
+    parser.add_argument('--group-by', default=None,
+                        help="Compare each group of this record field (e.g. 'folio') with every corpus instead")
     args = parser.parse_args()
-    compare(Path(args.voynich), Path(args.corpora), Path(args.out))
+    if args.group_by:
+        compare_groups(Path(args.voynich), Path(args.corpora), Path(args.out), args.group_by,
+                       profiles_dir=None if args.no_profiles else Path(args.profiles))
+        return
+    compare(Path(args.voynich), Path(args.corpora), Path(args.out),
+            profiles_dir=None if args.no_profiles else Path(args.profiles),
+            model_name=args.embed_model, embed_cache=None if args.no_embed_cache else Path(args.embed_cache),
+            jobs=args.jobs, bootstrap=args.bootstrap)
 
 
 if __name__ == '__main__':
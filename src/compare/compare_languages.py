@@ -7,18 +7,47 @@ the Voynich token set (from `models/minimal/.../terms.npy`) using Jensen-Shannon
 divergence and top-k overlap.
 
 Writes results to `reports/comparison/compare_report.json` and per-corpus CSVs.
+Corpus n-gram counts come from the profile store (`profiles.py`,
+`.cache/profiles` or `--profiles DIR`), so each corpus file is only read and
+counted once; `--no-profiles` profiles every corpus in memory instead.
+With `--jobs N` corpora are analyzed in N worker processes; per-corpus CSVs
+are written as results arrive and the report keeps corpus file order.
+
+The Voynich side (n-gram counts, key index and top-k keys per order) is
+profiled once per run by `voynich_profile`; every corpus is aligned with its
+key index and `analyze_corpora` scores all of them with one divergence pass
+per order, plus a partial top-k selection per corpus and order.
+
+Very large corpora can be sampled with `--token-budget N`: the profiler streams
+the file and counts a systematic sample of about N tokens, and each JSD is then
+reported with a bootstrap interval (`js_divergence_ci`, `--ci-draws` replicates;
+`--ci` adds it for unsampled corpora too).
 
 If no corpora are found, writes a short README explaining how to add corpora or
 auto-download examples.
 """
+import argparse
 import json
+from multiprocessing import Pool
 from pathlib import Path
-from collections import Counter
 import numpy as np
-import math
 import csv
 import sys
 
+try:
+    from ..analytics.bootstrap import jsd_interval
+    from ..analytics.divergence import SparseCounts, divergences, jensen_shannon
+    from ..analytics.vocab import Vocabulary, top_k
+    from .profiles import ProfileStore
+    from .profiles import char_ngram_counts as ngram_counts
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.analytics.bootstrap import jsd_interval
+    from src.analytics.divergence import SparseCounts, divergences, jensen_shannon
+    from src.analytics.vocab import Vocabulary, top_k
+    from src.compare.profiles import ProfileStore
+    from src.compare.profiles import char_ngram_counts as ngram_counts
+
 
 ROOT = Path('.').resolve()
 OUT = ROOT / 'reports' / 'comparison'
@@ -46,18 +75,6 @@ def load_terms():
     return [str(x) for x in arr]
 
 
-def ngram_counts(strings, n=3):
-    c = Counter()
-    for s in strings:
-        s = s.lower()
-        if len(s) < n:
-            c[s] += 1
-        else:
-            for i in range(len(s)-n+1):
-                c[s[i:i+n]] += 1
-    return c
-
-
 def normalize_counter(c):
     total = sum(c.values())
     if total == 0:
@@ -67,48 +84,136 @@ def normalize_counter(c):
 
 def js_divergence(p, q):
     # p and q are dicts of probabilities over same universe (may differ keys)
-    keys = set(p) | set(q)
-    p_vec = np.array([p.get(k, 0.0) for k in keys], dtype=float)
-    q_vec = np.array([q.get(k, 0.0) for k in keys], dtype=float)
-    m = 0.5 * (p_vec + q_vec)
-    def kl(a, b):
-        mask = (a > 0)
-        return float(np.sum(a[mask] * np.log2(a[mask] / b[mask])))
-    return 0.5 * (kl(p_vec, m) + kl(q_vec, m))
-
-
-def topk_overlap(p, q, k=50):
-    pk = [x for x, _ in sorted(p.items(), key=lambda t: -t[1])][:k]
-    qk = [x for x, _ in sorted(q.items(), key=lambda t: -t[1])][:k]
-    setp = set(pk)
-    setq = set(qk)
-    inter = setp & setq
-    return len(inter) / k if k > 0 else 0.0, list(inter)[:20]
-
-
-def analyze_corpus(corpus_path, voy_terms):
-    txt = corpus_path.read_text(encoding='utf-8', errors='ignore')
-    # simple tokenization by whitespace
-    words = [w for w in (txt.replace('\n', ' ').split(' ')) if w]
-    results = {}
-    for n in range(1, 5):
-        c_corpus = ngram_counts(words, n=n)
-        c_voy = ngram_counts(voy_terms, n=n)
-        p_corpus, _ = normalize_counter(c_corpus)
-        p_voy, _ = normalize_counter(c_voy)
-        jsd = js_divergence(p_voy, p_corpus)
-        overlap, common = topk_overlap(p_voy, p_corpus, k=50)
-        results[f'{n}gram'] = {
-            'js_divergence': jsd,
-            'top50_overlap': overlap,
-            'example_common': common,
-            'voy_total_ngrams': sum(c_voy.values()),
-            'corpus_total_ngrams': sum(c_corpus.values())
+    return jensen_shannon(p, q)
+
+
+NGRAM_ORDERS = range(1, 5)
+TOP_K = 50
+
+
+def top_keys(counter, k=TOP_K):
+    """The `k` most frequent keys (ties in insertion order), via partial selection."""
+    keys = list(counter)
+    counts = np.fromiter(counter.values(), dtype=float, count=len(keys))
+    return [keys[i] for i in top_k(counts, k).tolist()]
+
+
+def overlap_of(p_top, q_top, k=TOP_K):
+    """Share of the top-k keys in common; common keys listed in `p_top` order."""
+    setq = set(q_top)
+    inter = [x for x in p_top if x in setq]
+    return len(inter) / k if k > 0 else 0.0, inter[:20]
+
+
+def topk_overlap(p, q, k=TOP_K):
+    return overlap_of(top_keys(p, k), top_keys(q, k), k)
+
+
+def voynich_profile(voy_terms, k=TOP_K):
+    """Per-order Voynich n-gram counts, key index and top-k keys, computed once per run."""
+    prof = {}
+    for n in NGRAM_ORDERS:
+        c = ngram_counts(voy_terms, n=n)
+        index = Vocabulary(c.keys())
+        counts = np.fromiter(c.values(), dtype=float, count=len(c))
+        prof[n] = {
+            'index': index,
+            'vector': SparseCounts(np.arange(len(c)), counts),
+            'top': [index.tokens[i] for i in top_k(counts, k).tolist()],
+            'total': sum(c.values()),
         }
+    return prof
+
+
+def aligned_counts(counter, index):
+    """Counts of `counter` on the ids of `index`; keys missing from it get fresh ids past its end."""
+    return SparseCounts.from_mapping(counter, index, grow=False)
+
+
+def analyze_corpus(corpus_path, voy, profiles=None, token_budget=None, ci_draws=0):
+    """Compare one corpus with the Voynich profile (or raw `voy_terms`, profiled here)."""
+    return analyze_corpora([corpus_path], voy, profiles, token_budget, ci_draws)[0]
+
+
+def analyze_corpora(corpus_paths, voy, profiles=None, token_budget=None, ci_draws=0):
+    """Compare corpora with the Voynich profile, one `divergences` pass per order over all of them.
+
+    Only the aligned n-gram counts of each corpus are kept, not its profile.
+    With `ci_draws`, each JSD also gets a 95% bootstrap interval over that
+    many resamples of the corpus counts.
+    """
+    if not isinstance(voy, dict):
+        voy = voynich_profile(voy)
+    profiles = profiles or ProfileStore(None)
+    aligned = {n: [] for n in NGRAM_ORDERS}
+    results = []
+    for corpus_path in corpus_paths:
+        # character n-grams of whitespace-separated words, counted once per distinct word
+        profile = profiles.get(corpus_path, token_budget)
+        res = {}
+        for n in NGRAM_ORDERS:
+            c_corpus = profile.char_ngrams[n]
+            v = voy[n]
+            aligned[n].append(aligned_counts(c_corpus, v['index']))
+            overlap, common = overlap_of(v['top'], top_keys(c_corpus))
+            res[f'{n}gram'] = {
+                'js_divergence': None,
+                'top50_overlap': overlap,
+                'example_common': common,
+                'voy_total_ngrams': v['total'],
+                'corpus_total_ngrams': sum(c_corpus.values())
+            }
+        if token_budget:
+            res['sample_fraction'] = profile.sample_fraction
+        results.append(res)
+
+    for n in NGRAM_ORDERS:
+        ref = voy[n]['vector']
+        jsd = divergences(ref, aligned[n], ('jsd',))['jsd'].tolist()
+        for res, counts, value in zip(results, aligned[n], jsd):
+            res[f'{n}gram']['js_divergence'] = value
+            if ci_draws:
+                res[f'{n}gram']['js_divergence_ci'] = list(jsd_interval(ref, counts, draws=ci_draws))
     return results
 
 
-def main():
+def write_corpus_csv(corpus, results):
+    csv_p = OUT / (corpus.stem + '_summary.csv')
+    with csv_p.open('w', encoding='utf-8', newline='') as fh:
+        w = csv.writer(fh)
+        w.writerow(['ngram','js_divergence','top50_overlap','voy_total','corpus_total','example_common'])
+        for n in range(1,5):
+            r = results[f'{n}gram']
+            w.writerow([f'{n}', r['js_divergence'], r['top50_overlap'], r['voy_total_ngrams'], r['corpus_total_ngrams'], ';'.join(r['example_common'])])
+
+
+# per-process state of --jobs workers, set once by _init_worker
+_worker = {}
+
+
+def _init_worker(voy, profiles_dir, options):
+    _worker['voy'] = voy
+    _worker['profiles'] = ProfileStore(profiles_dir)
+    _worker['options'] = options
+
+
+def _analyze_task(corpus):
+    return corpus, analyze_corpus(corpus, _worker['voy'], _worker['profiles'], **_worker['options'])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare Voynich character n-grams with language corpora')
+    parser.add_argument('--jobs', type=int, default=1, help='Worker processes for analyzing corpora')
+    parser.add_argument('--token-budget', type=int, default=None,
+                        help='Count only a systematic sample of about this many tokens per corpus')
+    parser.add_argument('--ci-draws', type=int, default=200, help='Bootstrap replicates for JSD intervals')
+    parser.add_argument('--ci', action='store_true', help='Report JSD intervals for unsampled corpora too')
+    parser.add_argument('--profiles', default='.cache/profiles', help='Corpus profile store directory')
+    parser.add_argument('--no-profiles', action='store_true', help='Profile corpora in memory without storing them')
+    args = parser.parse_args(argv)
+    options = {'token_budget': args.token_budget,
+               'ci_draws': args.ci_draws if (args.token_budget or args.ci) else 0}
+
     voy_terms = load_terms()
     corpora = sorted((ROOT / 'data' / 'corpora').glob('*.txt')) if (ROOT / 'data' / 'corpora').exists() else []
     report = {'voy_terms_count': len(voy_terms), 'corpora_analyzed': []}
@@ -124,19 +229,24 @@ def main():
         print('No corpora found; wrote README and empty report to', OUT)
         return
 
+    # relative store paths are taken from ROOT, like the corpora
+    profiles_dir = None if args.no_profiles else ROOT / args.profiles
+    voy = voynich_profile(voy_terms)
+    done = {}
+    if args.jobs > 1 and len(corpora) > 1:
+        with Pool(min(args.jobs, len(corpora)), initializer=_init_worker, initargs=(voy, profiles_dir, options)) as pool:
+            for corpus, results in pool.imap_unordered(_analyze_task, corpora):
+                print('Analyzed', corpus)
+                write_corpus_csv(corpus, results)
+                done[corpus] = results
+    else:
+        print(f'Analyzing {len(corpora)} corpora')
+        for corpus, results in zip(corpora, analyze_corpora(corpora, voy, ProfileStore(profiles_dir), **options)):
+            # write per-corpus CSV summary
+            write_corpus_csv(corpus, results)
+            done[corpus] = results
     for corpus in corpora:
-        print('Analyzing', corpus)
-        results = analyze_corpus(corpus, voy_terms)
-        entry = {'corpus': str(corpus), 'results': results}
-        report['corpora_analyzed'].append(entry)
-        # write per-corpus CSV summary
-        csv_p = OUT / (corpus.stem + '_summary.csv')
-        with csv_p.open('w', encoding='utf-8', newline='') as fh:
-            w = csv.writer(fh)
-            w.writerow(['ngram','js_divergence','top50_overlap','voy_total','corpus_total','example_common'])
-            for n in range(1,5):
-                r = results[f'{n}gram']
-                w.writerow([f'{n}', r['js_divergence'], r['top50_overlap'], r['voy_total_ngrams'], r['corpus_total_ngrams'], ';'.join(r['example_common'])])
+        report['corpora_analyzed'].append({'corpus': str(corpus), 'results': done[corpus]})
 
     with (OUT / 'compare_report.json').open('w', encoding='utf-8') as fh:
         json.dump(report, fh, ensure_ascii=False, indent=2)
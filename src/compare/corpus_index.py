@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Nearest-corpus index over corpus profiles.
+
+Ranking the Voynich text (or one folio or section of it) against hundreds of
+language/period sub-corpora should not mean an exhaustive divergence pass per
+query. `CorpusIndex` keeps, for every feature, each corpus distribution as a
+sparse row over a shared key index:
+
+- `unigram`, `bigram`: token distributions (`compare_corpora.counter_to_prob`
+  of the profile counts, as `compare_corpora` scores them)
+- `char1`..`char4`: character n-gram distributions of whitespace-separated
+  words (the `compare_languages.ngram_counts` counts kept on the profile)
+- `embedding`: the profiles' sentence-embedding centroids, when built with
+  `--embed`
+
+Character n-gram and token queries use an inverted index: for every key, the
+corpora holding it and their probabilities. JSD depends only on the keys two
+distributions share (`divergence.Postings`), so one pass over the posting
+lists of a query's keys gives its exact JSD with every corpus, at a cost
+proportional to those postings rather than to the size of all corpora.
+Embedding queries are a single cosine product against the centroid matrix.
+
+Usage:
+  python3 src/compare/corpus_index.py build --corpora data/corpora --index .cache/corpus_index
+  python3 src/compare/corpus_index.py query --index .cache/corpus_index \\
+      --voynich data/processed/voynich_takahashi.jsonl --group-by folio --feature char3 --k 5
+"""
+from __future__ import annotations
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from ..analytics.divergence import Postings, SparseCounts
+    from ..analytics.vocab import Vocabulary, top_k
+    from .compare_corpora import corpus_files, counter_to_prob, read_voynich_groups
+    from .embeddings import DEFAULT_MODEL, EmbeddingService
+    from .profiles import CorpusProfile, ProfileStore, build_profile
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.analytics.divergence import Postings, SparseCounts
+    from src.analytics.vocab import Vocabulary, top_k
+    from src.compare.compare_corpora import corpus_files, counter_to_prob, read_voynich_groups
+    from src.compare.embeddings import DEFAULT_MODEL, EmbeddingService
+    from src.compare.profiles import CorpusProfile, ProfileStore, build_profile
+
+INDEX_VERSION = 1
+FEATURES = ('unigram', 'bigram', 'char1', 'char2', 'char3', 'char4')
+
+
+def profile_features(profile: CorpusProfile) -> Dict[str, Dict[str, float]]:
+    """Probability distribution of every index feature of a profile."""
+    feats = {'unigram': counter_to_prob(profile.unigrams), 'bigram': counter_to_prob(profile.bigrams)}
+    for n, counts in profile.char_ngrams.items():
+        feats[f'char{n}'] = counter_to_prob(counts)
+    return feats
+
+
+def text_features(lines: Sequence[str]) -> Dict[str, Dict[str, float]]:
+    """Query distributions of some text, counted exactly like corpus profiles."""
+    return profile_features(build_profile('\n'.join(lines), 'query'))
+
+
+class FeatureIndex:
+    """Distributions of one feature over a shared key index, with per-key posting lists."""
+
+    def __init__(self, vocab: Vocabulary | None = None):
+        self.vocab = vocab or Vocabulary()
+        self.rows: List[SparseCounts] = []
+        self._postings: Postings | None = None
+
+    def add(self, dist: Mapping[str, float]):
+        self.rows.append(SparseCounts.from_mapping(dist, self.vocab))
+        self._postings = None
+
+    def encode(self, dist: Mapping[str, float]) -> SparseCounts:
+        """A query on this index's ids; keys it has never seen get fresh ids past its end."""
+        return SparseCounts.from_mapping(dist, self.vocab, grow=False)
+
+    @property
+    def postings(self) -> Postings:
+        if self._postings is None:
+            self._postings = Postings(self.rows, len(self.vocab))
+        return self._postings
+
+    def search(self, dists: Sequence[Mapping[str, float]], k: int) -> List[List[Tuple[int, float]]]:
+        """The `k` rows of least JSD to each query, as (row, jsd) pairs; empty rows are skipped."""
+        jsd = self.postings.jsd([self.encode(d) for d in dists])
+        out = []
+        for row in np.where(np.isnan(jsd), np.inf, jsd):
+            best = top_k(-row, k)
+            out.append([(i, float(row[i])) for i in best.tolist() if np.isfinite(row[i])])
+        return out
+
+
+class CorpusIndex:
+    """Top-k nearest-corpus queries over the profiles of many corpora.
+
+    Args:
+        features: Distribution features to index (see `FEATURES`)
+    """
+
+    def __init__(self, features: Sequence[str] = FEATURES):
+        self.names: List[str] = []
+        self.files: List[str] = []
+        self.digests: List[str] = []
+        self.features: Dict[str, FeatureIndex] = {f: FeatureIndex() for f in features}
+        self.embed_model: str | None = None
+        self.centroids: np.ndarray | None = None
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, path: Path, profile: CorpusProfile):
+        self.names.append(Path(path).stem)
+        self.files.append(str(path))
+        self.digests.append(profile.digest)
+        feats = profile_features(profile)
+        for name, index in self.features.items():
+            index.add(feats.get(name, {}))
+
+    def set_centroids(self, model_name: str, centroids: Sequence[np.ndarray | None]):
+        """Embedding centroids in corpus order; corpora without one are never returned."""
+        rows = [np.asarray(c, dtype=float) for c in centroids if c is not None]
+        width = len(rows[0]) if rows else 0
+        mat = np.full((len(centroids), width), np.nan)
+        for i, c in enumerate(centroids):
+            if c is not None:
+                mat[i] = np.asarray(c, dtype=float) / (np.linalg.norm(c) + 1e-12)
+        self.embed_model, self.centroids = model_name, mat
+
+    @classmethod
+    def build(cls, files: Sequence[Path], profiles: ProfileStore | None = None, features: Sequence[str] = FEATURES,
+              embedder: EmbeddingService | None = None) -> 'CorpusIndex':
+        profiles = profiles or ProfileStore(None)
+        index = cls(features)
+        corpus_profiles = [profiles.get(f) for f in files]
+        for f, prof in zip(files, corpus_profiles):
+            index.add(f, prof)
+        if embedder is not None:
+            embedder.prefetch_profiles(corpus_profiles, profiles)
+            index.set_centroids(embedder.model_name, [embedder.profile_centroid(p, profiles) for p in corpus_profiles])
+        return index
+
+    def query(self, dists: Sequence[Mapping[str, float]], feature: str = 'char3',
+              k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Nearest corpora (name, jsd) to each query distribution, least divergent first."""
+        hits = self.features[feature].search(dists, k)
+        return [[(self.names[i], jsd) for i, jsd in row] for row in hits]
+
+    def query_lines(self, groups: Mapping[str, Sequence[str]], feature: str = 'char3',
+                    k: int = 5) -> Dict[str, List[Tuple[str, float]]]:
+        """Nearest corpora to each named group of text lines (e.g. the lines of each folio)."""
+        names = list(groups)
+        dists = [text_features(groups[g])[feature] for g in names]
+        return dict(zip(names, self.query(dists, feature, k)))
+
+    def query_embedding(self, vectors: Sequence[np.ndarray], k: int = 5) -> List[List[Tuple[str, float]]]:
+        """Nearest corpora (name, cosine) to each embedding vector, most similar first."""
+        if self.centroids is None or not self.centroids.size:
+            raise ValueError('index has no embedding centroids; build it with --embed')
+        q = np.array([np.asarray(v, dtype=float) / (np.linalg.norm(v) + 1e-12) for v in vectors])
+        sims = np.nan_to_num(q @ self.centroids.T, nan=-np.inf)
+        out = []
+        for row in sims:
+            best = top_k(row, k)
+            out.append([(self.names[i], float(row[i])) for i in best.tolist() if np.isfinite(row[i])])
+        return out
+
+    def save(self, index_dir: Path):
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'version': INDEX_VERSION, 'names': self.names, 'files': self.files,
+            'digests': self.digests, 'embed_model': self.embed_model,
+            'keys': {f: index.vocab.tokens for f, index in self.features.items()},
+        }
+        arrays = {}
+        for f, index in self.features.items():
+            arrays[f'{f}_lengths'] = np.array([len(r) for r in index.rows], dtype=np.int64)
+            arrays[f'{f}_ids'] = np.concatenate([r.ids for r in index.rows]) if index.rows else np.zeros(0, np.int64)
+            arrays[f'{f}_counts'] = np.concatenate([r.counts for r in index.rows]) if index.rows else np.zeros(0)
+        if self.centroids is not None:
+            arrays['centroids'] = self.centroids
+        np.savez_compressed(index_dir / 'index.npz', **arrays)
+        (index_dir / 'index.json').write_text(json.dumps(meta, ensure_ascii=False), encoding='utf-8')
+
+    @classmethod
+    def load(cls, index_dir: Path) -> 'CorpusIndex':
+        index_dir = Path(index_dir)
+        meta = json.loads((index_dir / 'index.json').read_text(encoding='utf-8'))
+        if meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"{index_dir} holds index version {meta.get('version')}, expected {INDEX_VERSION}")
+        index = cls(list(meta['keys']))
+        index.names, index.files, index.digests = meta['names'], meta['files'], meta['digests']
+        with np.load(index_dir / 'index.npz') as arrays:
+            for f, feat in index.features.items():
+                feat.vocab = Vocabulary(meta['keys'][f])
+                bounds = np.cumsum(arrays[f'{f}_lengths'])[:-1]
+                feat.rows = [SparseCounts(i, c) for i, c in zip(np.split(arrays[f'{f}_ids'], bounds),
+                                                                np.split(arrays[f'{f}_counts'], bounds))]
+            if 'centroids' in arrays:
+                index.embed_model, index.centroids = meta['embed_model'], arrays['centroids']
+        return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nearest-corpus index over corpus profiles')
+    sub = parser.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build', help='Index every corpus file in a directory')
+    b.add_argument('--corpora', default='data/corpora', help='Directory of corpus text files')
+    b.add_argument('--index', default='.cache/corpus_index', help='Index output directory')
+    b.add_argument('--profiles', default='.cache/profiles', help='Corpus profile store directory')
+    b.add_argument('--embed', action='store_true', help='Also index embedding centroids')
+    b.add_argument('--embed-model', default=DEFAULT_MODEL, help='SentenceTransformer model for centroids')
+    b.add_argument('--embed-cache', default='.cache/embeddings', help='Embedding cache directory')
+    q = sub.add_parser('query', help='Rank indexed corpora for Voynich text')
+    q.add_argument('--index', default='.cache/corpus_index', help='Index directory')
+    q.add_argument('--voynich', required=True, help='Processed Voynich JSONL (line or token records)')
+    q.add_argument('--group-by', default=None, help="Record field to rank separately, e.g. 'folio'")
+    q.add_argument('--feature', default='char3', choices=FEATURES + ('embedding',), help='Feature to rank by')
+    q.add_argument('--k', type=int, default=5, help='Corpora returned per query')
+    q.add_argument('--out', default=None, help='Write the ranking as JSON here instead of printing it')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        files = corpus_files(Path(args.corpora))
+        embedder = EmbeddingService(args.embed_model, cache_dir=Path(args.embed_cache)) if args.embed else None
+        index = CorpusIndex.build(files, ProfileStore(Path(args.profiles)), embedder=embedder)
+        index.save(Path(args.index))
+        print(f'Indexed {len(index)} corpora into {args.index}')
+        return
+
+    index = CorpusIndex.load(Path(args.index))
+    groups = read_voynich_groups(Path(args.voynich), args.group_by)
+    if args.feature == 'embedding':
+        embedder = EmbeddingService(index.embed_model or DEFAULT_MODEL)
+        vectors = [embedder.centroid(lines) for lines in groups.values()]
+        if any(v is None for v in vectors):
+            parser.error('embedding queries need sentence-transformers')
+        ranking = dict(zip(groups, index.query_embedding(vectors, args.k)))
+        score = 'cosine'
+    else:
+        ranking = index.query_lines(groups, args.feature, args.k)
+        score = 'jsd'
+    result = {g: [{'corpus': name, score: value} for name, value in hits] for g, hits in ranking.items()}
+    if args.out:
+        Path(args.out).write_text(json.dumps(result, indent=2, ensure_ascii=False), encoding='utf-8')
+        print(f'Ranked {len(result)} groups into {args.out}')
+    else:
+        for g, hits in result.items():
+            print(g + ': ' + ', '.join(f"{h['corpus']} ({h[score]:.4f})" for h in hits))
+
+
+if __name__ == '__main__':
+    main()
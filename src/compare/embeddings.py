@@ -0,0 +1,159 @@
+"""Sentence-embedding similarity for corpus comparison.
+
+`EmbeddingService` loads the SentenceTransformer model once, on first use,
+and reuses it for the whole run. Encoded samples are cached in memory and,
+with `cache_dir`, on disk as `.npy` files keyed by (model name, SHA-256 of
+the sample text), so the Voynich sample is encoded once per run and unchanged
+samples are never re-encoded across runs. `prefetch` encodes every uncached
+sample in one batched `encode` call.
+
+Similarity is the mean pairwise cosine between two samples, computed as the
+dot product of their centroids (mean of L2-normalized embeddings); corpus
+centroids are also kept on the corpus profile.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+DEFAULT_MODEL = 'all-MiniLM-L6-v2'
+# lines sampled from each side, as embed_similarity always did
+SAMPLE_LINES = 200
+
+
+def sample_key(model_name: str, texts: Sequence[str]) -> str:
+    payload = json.dumps([model_name, list(texts)], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def centroid(emb: np.ndarray) -> np.ndarray:
+    """Mean of the L2-normalized rows of `emb`."""
+    return (emb / (np.linalg.norm(emb, axis=1, keepdims=True) + 1e-12)).mean(axis=0)
+
+
+class EmbeddingService:
+    """One SentenceTransformer per run plus a (model, text hash) embedding cache.
+
+    Args:
+        model_name: SentenceTransformer model to load
+        cache_dir: Directory for cached embeddings; None keeps them in memory only
+        batch_size: Batch size passed to `encode`
+    """
+
+    def __init__(self, model_name: str = DEFAULT_MODEL, cache_dir: Path | None = None, batch_size: int = 64):
+        self.model_name = model_name
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.batch_size = batch_size
+        self._model = None
+        self._unavailable = False
+        self._memo: Dict[str, np.ndarray] = {}
+        self.loads = 0
+        self.encoded = 0
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @property
+    def model(self):
+        """The loaded model, or None if sentence-transformers is not installed."""
+        if self._model is None and not self._unavailable:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except Exception:
+                self._unavailable = True
+                return None
+            self._model = SentenceTransformer(self.model_name)
+            self.loads += 1
+        return self._model
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.npy'
+
+    def _cached(self, key: str) -> np.ndarray | None:
+        if key in self._memo:
+            return self._memo[key]
+        if self.cache_dir:
+            try:
+                self._memo[key] = np.load(self._path(key))
+                return self._memo[key]
+            except (OSError, ValueError):
+                pass
+        return None
+
+    def _store(self, key: str, emb: np.ndarray):
+        self._memo[key] = emb
+        if self.cache_dir:
+            tmp = self._path(key).with_suffix(f'.{os.getpid()}.tmp.npy')
+            np.save(tmp, emb)
+            os.replace(tmp, self._path(key))
+
+    def prefetch(self, samples: Sequence[Sequence[str]]):
+        """Encode every uncached, non-empty sample with a single batched `encode` call."""
+        pending: Dict[str, List[str]] = {}
+        for texts in samples:
+            key = sample_key(self.model_name, texts)
+            if texts and key not in pending and self._cached(key) is None:
+                pending[key] = list(texts)
+        if not pending or self.model is None:
+            return
+        flat = [t for texts in pending.values() for t in texts]
+        emb = self.model.encode(flat, batch_size=self.batch_size, show_progress_bar=False, convert_to_numpy=True)
+        self.encoded += len(flat)
+        start = 0
+        for key, texts in pending.items():
+            self._store(key, emb[start:start + len(texts)])
+            start += len(texts)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray | None:
+        if not texts:
+            return None
+        self.prefetch([texts])
+        return self._cached(sample_key(self.model_name, texts))
+
+    def centroid(self, texts: Sequence[str]) -> np.ndarray | None:
+        emb = self.embed(list(texts)[:SAMPLE_LINES])
+        return None if emb is None else centroid(emb)
+
+    def profile_centroid(self, profile, store=None) -> np.ndarray | None:
+        """Centroid of a corpus profile's line sample, kept on the profile (and saved to `store`)."""
+        cached = profile.centroids.get(self.model_name)
+        if cached is not None:
+            return np.asarray(cached)
+        c = self.centroid(profile.sample_lines)
+        if c is not None:
+            profile.centroids[self.model_name] = c.tolist()
+            if store is not None:
+                store.save(profile)
+        return c
+
+    def prefetch_profiles(self, profiles: Sequence, store=None, extra: Sequence[Sequence[str]] = ()):
+        """Compute the missing centroids of several profiles (plus any `extra` samples) with one batched encode."""
+        missing = [p for p in profiles if self.model_name not in p.centroids and p.sample_lines]
+        self.prefetch(list(extra) + [p.sample_lines[:SAMPLE_LINES] for p in missing])
+        for p in missing:
+            self.profile_centroid(p, store)
+
+    def similarity(self, v_texts: Sequence[str], c_texts: Sequence[str] | None = None,
+                   c_centroid: np.ndarray | None = None) -> float | None:
+        """Mean pairwise cosine similarity between the two samples (None if unavailable)."""
+        if c_centroid is None:
+            if not c_texts:
+                return None
+            c_centroid = self.centroid(c_texts)
+        v_centroid = self.centroid(v_texts) if v_texts else None
+        if v_centroid is None or c_centroid is None:
+            return None
+        return float(v_centroid @ c_centroid)
+
+
+_services: Dict[str, EmbeddingService] = {}
+
+
+def get_service(model_name: str = DEFAULT_MODEL) -> EmbeddingService:
+    """Process-wide in-memory service per model, for callers without their own."""
+    if model_name not in _services:
+        _services[model_name] = EmbeddingService(model_name)
+    return _services[model_name]
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""Precomputed profiles of reference corpora.
+
+Reference corpora rarely change, so each file is read and counted once into a
+`CorpusProfile` (token/bigram counts, character n-gram counts, size stats, a
+line sample for embeddings and per-model embedding centroids). Token and
+bigram counts stay on integer ids (count arrays over the profile's token
+list); strings are only built for reports. `ProfileStore`
+pickles profiles under `store_dir` keyed by the file's SHA-256, and the
+compare modules score profiles instead of re-reading raw text. Editing a
+corpus changes its hash and it is simply profiled again.
+
+Files are profiled in a single streaming pass (`ProfileBuilder`): text is read
+in line-aligned chunks of about `CHUNK_CHARS` characters and every count is
+merged incrementally into int arrays (token and bigram counts) or small
+Counters (character n-grams), so memory grows with the number of distinct
+tokens and bigrams (16 bytes per bigram) rather than with the file size. With
+`token_budget` only a systematic sample of chunks (about that many tokens) is
+counted; size stats and the line sample still cover the whole file, and
+`sample_fraction` records the share of text counted so callers can report
+sampling error (see `analytics.bootstrap.jsd_interval`).
+
+Usage (pre-build profiles for a corpora directory):
+  python3 src/compare/profiles.py --corpora data/corpora --store .cache/profiles
+"""
+from __future__ import annotations
+import argparse
+import operator
+import os
+import pickle
+import re
+import sys
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import repeat
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
+
+try:
+    from ..analytics.vocab import (Vocabulary, count_keys, decode_keys, group_keys, ngram_counter, ngram_keys,
+                                   top_k, unigram_counter, unigram_counts)
+    from ..pipeline.cache import file_digest
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.analytics.vocab import (Vocabulary, count_keys, decode_keys, group_keys, ngram_counter, ngram_keys,
+                                     top_k, unigram_counter, unigram_counts)
+    from src.pipeline.cache import file_digest
+
+# bump when the profile contents or the way they are counted change
+PROFILE_VERSION = 5
+CHAR_NGRAM_ORDERS = (1, 2, 3, 4)
+# lines kept for embedding similarity (compare_corpora samples the first 200)
+EMBED_SAMPLE = 200
+# characters read per chunk when streaming a corpus file
+CHUNK_CHARS = 1 << 20
+# bigram key base: token ids stay far below 2**31, so keys fit in int64
+BIGRAM_BASE = 1 << 31
+# chunk bigram counts held back before merging, unless the merged table is larger
+BIGRAM_MERGE_MIN = 1 << 20
+
+TOKEN_RE = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+
+
+def tokenize(text: str) -> List[str]:
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+def token_counts(tokens: Iterable[str]) -> Tuple[Counter, Counter]:
+    """Unigram and space-joined bigram counts, counted on integer token ids."""
+    vocab = Vocabulary()
+    ids = vocab.encode(tokens)
+    uni = unigram_counter(vocab, unigram_counts(ids, len(vocab)))
+    bi_keys, bi_counts = count_keys(ngram_keys(ids, 2, len(vocab)))
+    return uni, ngram_counter(vocab, bi_keys, bi_counts, 2)
+
+
+def char_ngram_counts(strings, n=3, weights=None) -> Counter:
+    """Character n-gram counts; `weights[i]` counts `strings[i]` that many times."""
+    return char_ngram_orders(strings, (n,), weights)[n]
+
+
+def char_ngram_orders(strings, orders=CHAR_NGRAM_ORDERS, weights=None) -> Dict[int, Counter]:
+    """`char_ngram_counts` for several orders at once, sharing the encoding of `strings`.
+
+    Strings shorter than `n` count as one n-gram of their own. Every window is
+    cut from one codepoint array, packed into an int64 key over the dense
+    alphabet of the strings and counted in one pass; keys keep first-seen
+    order.
+    """
+    strings = [s.lower() for s in strings]
+    if not strings:
+        return {n: Counter() for n in orders}
+    lengths = np.fromiter(map(len, strings), dtype=np.int64, count=len(strings))
+    codes = np.frombuffer(''.join(strings).encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    # dense digits with 0 for padding (shared with NUL, which fixed-width numpy strings drop anyway)
+    present = np.zeros(int(codes.max()) + 1 if len(codes) else 1, dtype=bool)
+    present[codes] = True
+    present[0] = True
+    alphabet = np.flatnonzero(present).astype(np.uint32)
+    digits = (np.cumsum(present) - 1)[codes]
+    w = None if weights is None else np.asarray(weights)
+    out = {}
+    for n in orders:
+        windows = np.maximum(lengths - n + 1, 1)
+        owner = np.repeat(np.arange(len(strings)), windows)
+        # window start = string offset + position of the window within its string
+        first_window = np.cumsum(windows) - windows
+        starts = np.repeat(np.cumsum(lengths) - lengths - first_window, windows) + np.arange(int(windows.sum()))
+        span = np.minimum(lengths, n)[owner]
+        padded = np.append(digits, np.zeros(n, dtype=digits.dtype))
+        if n * np.log2(max(len(alphabet), 2)) < 63:
+            keys = np.zeros(len(starts), dtype=np.int64)
+            for k in range(n):
+                keys *= len(alphabet)
+                keys += np.where(k < span, padded[starts + k], 0)
+        else:
+            # too many distinct characters to pack n of them into an int64
+            cols = np.arange(n)
+            mat = alphabet[np.where(cols < span[:, None], padded[starts[:, None] + cols], 0)]
+            keys = mat.view(f'<U{n}').ravel()
+        uniq, first, inverse, _ = group_keys(keys)
+        if w is None:
+            totals = np.bincount(inverse, minlength=len(uniq))
+        else:
+            totals = np.bincount(inverse, weights=w[owner], minlength=len(uniq))
+            if np.issubdtype(w.dtype, np.integer):
+                totals = totals.astype(np.int64)
+        order = np.argsort(first, kind='stable')
+        if keys.dtype.kind == 'U':
+            grams = uniq[order]
+        else:
+            grams = alphabet[decode_keys(uniq[order], n, len(alphabet))].view(f'<U{n}').ravel()
+        out[n] = Counter(dict(zip(grams.tolist(), totals[order].tolist())))
+    return out
+
+
+@dataclass
+class CorpusProfile:
+    """Everything the comparisons need from one corpus file.
+
+    `unigram_counts[i]` counts `tokens[i]` (ids in first-seen order) and
+    `bigram_counts[j]` counts the bigram packed as `bigram_keys[j]` = first id
+    * BIGRAM_BASE + second id (first-seen order). `unigrams`/`bigrams` are
+    string-keyed views for callers that still compare dictionaries.
+    """
+    digest: str
+    n_chars: int
+    n_lines: int
+    n_tokens: int
+    n_words: int
+    tokens: List[str]
+    unigram_counts: np.ndarray
+    bigram_keys: np.ndarray
+    bigram_counts: np.ndarray
+    # character n-grams over whitespace-separated words, keyed by order
+    char_ngrams: Dict[int, Counter]
+    sample_lines: List[str]
+    # model name -> mean of the L2-normalized embeddings of `sample_lines`
+    centroids: Dict[str, List[float]] = field(default_factory=dict)
+    # share of the text (in characters) the counts were taken from; < 1 with a token budget
+    sample_fraction: float = 1.0
+    token_budget: int | None = None
+
+    @property
+    def unigrams(self) -> Counter:
+        return Counter({t: c for t, c in zip(self.tokens, self.unigram_counts.tolist()) if c})
+
+    @property
+    def bigrams(self) -> Counter:
+        return Counter(dict(zip(self.bigram_strings(self.bigram_keys), self.bigram_counts.tolist())))
+
+    def bigram_strings(self, keys: np.ndarray) -> List[str]:
+        first, second = np.divmod(np.asarray(keys, dtype=np.int64), BIGRAM_BASE)
+        tokens = self.tokens
+        return [f'{tokens[a]} {tokens[b]}' for a, b in zip(first.tolist(), second.tolist())]
+
+    def top_unigrams(self, n: int) -> List[Tuple[str, int]]:
+        """The `n` most frequent tokens, ties in first-seen order (like `Counter.most_common`)."""
+        best = top_k(self.unigram_counts, n)
+        return list(zip([self.tokens[i] for i in best.tolist()], self.unigram_counts[best].tolist()))
+
+    def top_bigrams(self, n: int) -> List[Tuple[str, int]]:
+        best = top_k(self.bigram_counts, n)
+        return list(zip(self.bigram_strings(self.bigram_keys[best]), self.bigram_counts[best].tolist()))
+
+
+class ProfileBuilder:
+    """Builds a `CorpusProfile` incrementally from line-aligned text chunks.
+
+    Chunks must end at line boundaries (except the last), so no token or word
+    spans two chunks; bigrams across chunks are joined through the last token
+    id. The result equals profiling the concatenated text in one go.
+
+    Bigram counts of each chunk are queued and merged into the key/count
+    arrays (first-seen order) once the queue is as large as the merged table,
+    so merging stays O(n log n) overall. Character n-grams are counted per
+    chunk over its distinct words, so words are never kept.
+    """
+
+    def __init__(self):
+        self.vocab = Vocabulary()
+        self.uni = np.zeros(0, dtype=np.int64)
+        self.bigram_keys = np.zeros(0, dtype=np.int64)
+        self.bigram_counts = np.zeros(0, dtype=np.int64)
+        self._queued: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._queued_size = 0
+        self.prev = -1
+        self.char_ngrams: Dict[int, Counter] = {n: Counter() for n in CHAR_NGRAM_ORDERS}
+        self.n_chars = 0
+        self.n_lines = 0
+        self.n_words = 0
+        self.counted_chars = 0
+        self.sample_lines: List[str] = []
+
+    @property
+    def n_tokens(self) -> int:
+        return int(self.uni.sum())
+
+    def add(self, chunk: str, count: bool = True):
+        """Add one chunk; with `count=False` it only contributes size stats and sample lines."""
+        self.n_chars += len(chunk)
+        lines = chunk.splitlines()
+        self.n_lines += len(lines)
+        if len(self.sample_lines) < EMBED_SAMPLE:
+            self.sample_lines.extend(lines[:EMBED_SAMPLE - len(self.sample_lines)])
+        if not count:
+            # the next counted chunk does not follow this one's predecessor
+            self.prev = -1
+            return
+        self.counted_chars += len(chunk)
+
+        ids = self.vocab.encode(tokenize(chunk)).astype(np.int64)
+        if len(self.uni) < len(self.vocab):
+            self.uni = np.concatenate([self.uni, np.zeros(len(self.vocab) - len(self.uni), dtype=np.int64)])
+        self.uni += unigram_counts(ids, len(self.vocab))
+        if len(ids):
+            seq = np.concatenate([[self.prev], ids]) if self.prev >= 0 else ids
+            keys, counts = count_keys(seq[:-1] * BIGRAM_BASE + seq[1:])
+            if len(keys):
+                self._queued.append((keys, counts))
+                self._queued_size += len(keys)
+            if self._queued_size >= max(len(self.bigram_keys), BIGRAM_MERGE_MIN):
+                self._merge_bigrams()
+            self.prev = int(ids[-1])
+
+        # simple tokenization by whitespace; char n-grams are counted once per distinct word of the chunk
+        words = [w for w in chunk.replace('\n', ' ').split(' ') if w]
+        self.n_words += len(words)
+        chunk_words = Counter(words)
+        types, freqs = list(chunk_words), list(chunk_words.values())
+        for n, c in char_ngram_orders(types, CHAR_NGRAM_ORDERS, freqs).items():
+            merged = self.char_ngrams[n]
+            # Counter.update loops in Python; this merge (same key order) stays in C
+            dict.update(merged, zip(c.keys(), map(operator.add, map(merged.get, c.keys(), repeat(0)), c.values())))
+
+    def _merge_bigrams(self):
+        if not self._queued:
+            return
+        keys = np.concatenate([self.bigram_keys] + [k for k, _ in self._queued])
+        counts = np.concatenate([self.bigram_counts] + [c for _, c in self._queued])
+        self._queued, self._queued_size = [], 0
+        # a stable sort keeps the first occurrence of each key at the start of its run
+        order = np.argsort(keys, kind='stable')
+        keys, counts = keys[order], counts[order]
+        bounds = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        first = np.argsort(order[bounds], kind='stable')
+        self.bigram_keys = keys[bounds][first]
+        self.bigram_counts = np.add.reduceat(counts, bounds)[first]
+
+    def profile(self, digest: str) -> CorpusProfile:
+        self._merge_bigrams()
+        return CorpusProfile(
+            digest=digest,
+            n_chars=self.n_chars,
+            n_lines=self.n_lines,
+            n_tokens=self.n_tokens,
+            n_words=self.n_words,
+            tokens=list(self.vocab.tokens),
+            unigram_counts=self.uni.copy(),
+            bigram_keys=self.bigram_keys.copy(),
+            bigram_counts=self.bigram_counts.copy(),
+            char_ngrams={n: Counter(c) for n, c in self.char_ngrams.items()},
+            sample_lines=self.sample_lines,
+            sample_fraction=self.counted_chars / self.n_chars if self.n_chars else 1.0,
+        )
+
+
+def build_profile(text: str, digest: str) -> CorpusProfile:
+    builder = ProfileBuilder()
+    builder.add(text)
+    return builder.profile(digest)
+
+
+def iter_chunks(fh, chunk_chars: int = CHUNK_CHARS) -> Iterator[str]:
+    """Line-aligned chunks of about `chunk_chars` characters from a text file handle."""
+    while True:
+        lines = fh.readlines(chunk_chars)
+        if not lines:
+            return
+        yield ''.join(lines)
+
+
+def profile_file(path: Path, digest: str | None = None, token_budget: int | None = None,
+                 chunk_chars: int = CHUNK_CHARS) -> CorpusProfile:
+    """Profile `path` in one streaming pass.
+
+    With `token_budget`, a chunk is counted whenever the tokens counted so far
+    are below the budget's share of the file read up to the end of that chunk
+    (budget * bytes read / file size). This is a systematic sample starting at
+    the first chunk and spread over the whole file rather than its head, and
+    it follows changes in token density along the file instead of relying on
+    an estimate from its start.
+    """
+    builder = ProfileBuilder()
+    size = path.stat().st_size
+    read = 0
+    with path.open('r', encoding='utf-8', errors='ignore') as fh:
+        for chunk in iter_chunks(fh, chunk_chars):
+            read += len(chunk.encode('utf-8'))
+            builder.add(chunk, count=not token_budget or builder.n_tokens < token_budget * read / max(size, 1))
+    profile = builder.profile(digest or file_digest(path))
+    profile.token_budget = token_budget
+    return profile
+
+
+class ProfileStore:
+    """Pickle-backed corpus profiles keyed by file content hash.
+
+    Args:
+        store_dir: Directory holding profiles; None profiles every file in memory only
+    """
+
+    def __init__(self, store_dir: Path | None):
+        self.store_dir = Path(store_dir) if store_dir else None
+        self.built = 0
+        self.loaded = 0
+        if self.store_dir:
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str, token_budget: int | None = None) -> Path:
+        budget = f'.b{token_budget}' if token_budget else ''
+        return self.store_dir / f'{digest}{budget}.v{PROFILE_VERSION}.pkl'
+
+    def get(self, path: Path, token_budget: int | None = None) -> CorpusProfile:
+        """Load the stored profile of `path`, profiling (and storing) it if missing.
+
+        Profiles sampled to different token budgets are stored separately.
+        """
+        digest = file_digest(path)
+        if self.store_dir:
+            try:
+                with self._path(digest, token_budget).open('rb') as fh:
+                    profile = CorpusProfile(**pickle.load(fh))
+                self.loaded += 1
+                return profile
+            except (OSError, pickle.UnpicklingError, EOFError, TypeError):
+                pass
+        profile = profile_file(path, digest, token_budget)
+        self.built += 1
+        self.save(profile)
+        return profile
+
+    def save(self, profile: CorpusProfile):
+        if not self.store_dir:
+            return
+        p = self._path(profile.digest, profile.token_budget)
+        # per-process temp name: --jobs workers may store the same profile concurrently
+        tmp = p.with_suffix(f'.{os.getpid()}.tmp')
+        # stored as a plain dict so script and package imports can both read it
+        with tmp.open('wb') as fh:
+            pickle.dump(vars(profile), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-build corpus profiles for the compare modules')
+    parser.add_argument('--corpora', default='data/corpora', help='Directory of corpus text files')
+    parser.add_argument('--store', default='.cache/profiles', help='Profile store directory')
+    args = parser.parse_args()
+
+    store = ProfileStore(Path(args.store))
+    for f in sorted(Path(args.corpora).iterdir()):
+        if f.is_file():
+            prof = store.get(f)
+            print(f'{f.name}: {prof.n_tokens} tokens, {len(prof.tokens)} types, {prof.n_lines} lines')
+    print(f'Profiles: {store.built} built, {store.loaded} already stored ({store.store_dir})')
+
+
+if __name__ == '__main__':
+    main()
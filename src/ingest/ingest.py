@@ -3,6 +3,12 @@
 
 Creates a JSONL with fields: `line`, `raw`, `text` (normalized).
 
+The input is streamed line by line and records are written as they are
+produced, so memory use does not grow with the size of the transcription.
+With `--workers N` the file is split into newline-aligned byte ranges that
+are normalized in a process pool and written back in original line order,
+with at most `CHUNKS_IN_FLIGHT` chunks per worker held in memory at once.
+
 Usage:
   python src/ingest/ingest.py path/to/transcription.txt -o data/processed/transcription.jsonl
 """
@@ -10,14 +16,41 @@ import re
 import json
 import os
 import argparse
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+
+UNCERTAINTY_CHARS = "?*†()¶[]"
+PUNCT_CHARS = ".,:;!\"'`/<>"
+# default size of the output write buffer, in bytes
+WRITE_BUFFER = 1 << 20
+# default size of the byte ranges handed to each ingest worker
+CHUNK_BYTES = 8 << 20
+# normalized chunks submitted or waiting to be written, per worker
+CHUNKS_IN_FLIGHT = 2
+
+HTML_TAG_RE = re.compile(r"<[^>]+>")
+# runs of whitespace, backslash escapes (\n, \t, ...) and optionally digits
+# all collapse to a single space
+SPACE_RUN_RE = re.compile(r"(?:\s|\\[ntbrf])+")
+SPACE_OR_DIGIT_RUN_RE = re.compile(r"(?:\s|\d|\\[ntbrf])+")
+
+
+def _translation_table(remove_uncertainty: bool) -> dict:
+    # punctuation (including < > /) is deleted, hyphens split joined tokens
+    table = {ord(c): None for c in PUNCT_CHARS}
+    table[ord("-")] = " "
+    if remove_uncertainty:
+        table.update({ord(c): None for c in UNCERTAINTY_CHARS})
+    return table
 
-UNCERTAINTY_PATTERN = r"[?*†()¶\[\]]"
-PUNCT_PATTERN = r"[.,:;!\"'`/<>]"
+
+TRANSLATION_TABLES = {flag: _translation_table(flag) for flag in (False, True)}
 
 
 def remove_html_tags(text: str) -> str:
     # simple HTML tag stripper
-    return re.sub(r"<[^>]+>", " ", text)
+    return HTML_TAG_RE.sub(" ", text)
 
 
 def normalize_text(text: str,
@@ -30,52 +63,129 @@ def normalize_text(text: str,
     - strip_html: remove tags like <p>, </n>, etc.
     - remove_numbers: remove digit-only tokens or numeric sequences
     - remove_uncertainty: remove characters used as uncertainty markers
+
+    Tags are stripped first (their contents may hold punctuation), then a
+    single `str.translate` deletes uncertainty markers and punctuation and
+    splits hyphens, and one regex pass turns every run of whitespace, escapes
+    and digits into one space before lowercasing.
     """
     if text is None:
         return ""
     s = text
     if strip_html:
-        s = remove_html_tags(s)
-    # remove uncertainty/annotation chars
-    if remove_uncertainty:
-        s = re.sub(UNCERTAINTY_PATTERN, "", s)
-    # replace hyphens with space to separate joined tokens
-    s = s.replace("-", " ")
-    # remove punctuation
-    s = re.sub(PUNCT_PATTERN, "", s)
-    # optionally remove numbers (either standalone or within tokens)
-    if remove_numbers:
-        s = re.sub(r"\d+", " ", s)
-    # remove backslash escapes like \n, \t
-    s = re.sub(r"\\[ntbrf]", " ", s)
-    # remove any remaining angle brackets or stray slashes
-    s = re.sub(r"[<>]", " ", s)
-    s = re.sub(r"/(?=[A-Za-z])", " ", s)
-    # collapse whitespace and lowercase
-    s = re.sub(r"\s+", " ", s).strip().lower()
-    return s
+        s = HTML_TAG_RE.sub(" ", s)
+    s = s.translate(TRANSLATION_TABLES[bool(remove_uncertainty)])
+    space_re = SPACE_OR_DIGIT_RUN_RE if remove_numbers else SPACE_RUN_RE
+    return space_re.sub(" ", s).strip().lower()
 
 def load_transcription(path: str) -> str:
     with open(path, "r", encoding="utf-8") as f:
         return f.read()
 
-def write_jsonl(records, path: str):
+def iter_lines(path: str):
+    """Yield the lines of a transcription one at a time.
+
+    Each physical line is passed through `str.splitlines` so numbering matches
+    `load_transcription(path).splitlines()` exactly, including the extra
+    separators (form feed, U+2028, ...) that `splitlines` recognises.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for physical in f:
+            yield from physical.splitlines()
+
+def write_jsonl(records, path: str, buffer_size: int = WRITE_BUFFER) -> int:
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
+    n = 0
+    with open(path, "w", encoding="utf-8", buffering=buffer_size) as f:
         for r in records:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            n += 1
+    return n
 
-def process_file(in_path: str, out_path: str, **norm_kwargs):
-    text = load_transcription(in_path)
-    lines = text.splitlines()
-    records = []
+def iter_records(lines, **norm_kwargs):
+    """Yield `{"line", "raw", "text"}` records for non-empty normalized lines."""
     for i, l in enumerate(lines, start=1):
         norm = normalize_text(l, **norm_kwargs)
         if not norm:
             continue
-        records.append({"line": i, "raw": l, "text": norm})
-    write_jsonl(records, out_path)
-    print(f"Wrote {len(records)} records to {out_path}")
+        yield {"line": i, "raw": l, "text": norm}
+
+def chunk_offsets(path: str, chunk_bytes: int = CHUNK_BYTES):
+    """Split a file into `(start, end)` byte ranges that each end on a newline."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as f:
+        pos = chunk_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk_bytes
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _normalize_chunk(task):
+    """Normalize one byte range; returns its line count and pre-encoded fields.
+
+    Line numbers are only known once earlier chunks are counted, so workers
+    return `(offset_in_chunk, raw_json, text_json)` and the parent fills them in.
+    """
+    path, start, end, norm_kwargs = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    lines = data.decode("utf-8").splitlines()
+    out = []
+    for i, l in enumerate(lines):
+        norm = normalize_text(l, **norm_kwargs)
+        if not norm:
+            continue
+        out.append((i, json.dumps(l, ensure_ascii=False), json.dumps(norm, ensure_ascii=False)))
+    return len(lines), out
+
+
+def bounded_imap(pool, func, tasks, limit: int):
+    """Like `pool.imap`, but with at most `limit` tasks submitted and not yet consumed.
+
+    `imap` queues every task at once, so finished chunks pile up in memory
+    whenever the consumer (the writer) is slower than the workers.
+    """
+    tasks = iter(tasks)
+    pending = deque(pool.apply_async(func, (task,)) for task in islice(tasks, limit))
+    while pending:
+        yield pending.popleft().get()
+        # refill once the result is consumed
+        pending.extend(pool.apply_async(func, (task,)) for task in islice(tasks, 1))
+
+
+def process_file_parallel(in_path: str, out_path: str, workers: int, chunk_bytes: int = CHUNK_BYTES,
+                          buffer_size: int = WRITE_BUFFER, **norm_kwargs) -> int:
+    tasks = ((in_path, start, end, norm_kwargs) for start, end in chunk_offsets(in_path, chunk_bytes))
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    n = 0
+    line_base = 0
+    with Pool(workers) as pool, open(out_path, "w", encoding="utf-8", buffering=buffer_size) as f:
+        for n_lines, items in bounded_imap(pool, _normalize_chunk, tasks, CHUNKS_IN_FLIGHT * workers):
+            for i, raw_json, text_json in items:
+                f.write(f'{{"line": {line_base + i + 1}, "raw": {raw_json}, "text": {text_json}}}\n')
+            n += len(items)
+            line_base += n_lines
+    return n
+
+
+def process_file(in_path: str, out_path: str, buffer_size: int = WRITE_BUFFER, workers: int = 1,
+                 chunk_bytes: int = CHUNK_BYTES, **norm_kwargs):
+    if workers > 1:
+        n = process_file_parallel(in_path, out_path, workers, chunk_bytes=chunk_bytes,
+                                  buffer_size=buffer_size, **norm_kwargs)
+    else:
+        records = iter_records(iter_lines(in_path), **norm_kwargs)
+        n = write_jsonl(records, out_path, buffer_size=buffer_size)
+    print(f"Wrote {n} records to {out_path}")
 
 
 def main():
@@ -85,8 +195,14 @@ def main():
     parser.add_argument("--no-strip-html", dest="strip_html", action="store_false", help="Don't remove HTML tags")
     parser.add_argument("--no-remove-numbers", dest="remove_numbers", action="store_false", help="Don't remove numbers")
     parser.add_argument("--no-remove-uncertainty", dest="remove_uncertainty", action="store_false", help="Don't remove uncertainty markers")
+    parser.add_argument("--buffer-size", type=int, default=WRITE_BUFFER, help="Output write buffer size in bytes")
+    parser.add_argument("--workers", type=int, default=1, help="Normalize in N worker processes")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_BYTES, help="Bytes per worker chunk (with --workers)")
     args = parser.parse_args()
     process_file(args.input, args.output,
+                 buffer_size=args.buffer_size,
+                 workers=args.workers,
+                 chunk_bytes=args.chunk_size,
                  strip_html=args.strip_html,
                  remove_numbers=args.remove_numbers,
                  remove_uncertainty=args.remove_uncertainty)
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Columnar, memory-mappable store for per-token records.
+
+A store is a directory (conventionally `*.tokens`) holding:
+  - meta.json        : format version, record count, name of the line field
+  - vocab.json       : token strings; `token_id` indexes into it
+  - folios.json      : folio identifiers; `folio_id` indexes into it (-1 = none)
+  - token_id.npy     : int32 [N]
+  - line.npy         : int64 [N] (`line` for tokenizer output, `line_id` for coords;
+                       -1 for records without one)
+  - token_index.npy  : int32 [N]
+  - folio_id.npy     : int32 [N]
+  - bbox.npy         : int32 [N, 4] as x, y, w, h (only when any record carries a
+                       bbox; -1 rows for records without one)
+
+Arrays are loaded with `np.load(..., mmap_mode='r')`, so opening a store does
+not parse anything per token. The schema is taken from all records: records
+mixing `line` and `line_id` are rejected, and a bbox column is written as
+soon as one record has a box.
+
+A store is a snapshot of its source: `store_is_current` tells whether the
+JSONL it was built from has changed since.
+
+Usage:
+  python3 src/ingest/token_store.py data/processed/token_coords.jsonl -o data/processed/token_coords.tokens
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List
+
+import numpy as np
+
+STORE_VERSION = 2
+STORE_SUFFIX = '.tokens'
+# line.npy value for records that carry no line number
+NO_LINE = -1
+
+
+def is_token_store(path) -> bool:
+    p = Path(path)
+    return p.is_dir() and (p / 'meta.json').exists()
+
+
+def store_is_current(path, source) -> bool:
+    """True if `path` is a token store written after `source` was last modified."""
+    if not is_token_store(path):
+        return False
+    source = Path(source)
+    return not source.exists() or (Path(path) / 'meta.json').stat().st_mtime >= source.stat().st_mtime
+
+
+def write_token_store(records: Iterable[Dict[str, Any]], path) -> int:
+    """Write token (or token-coordinate) records as a columnar store; returns the count.
+
+    Raises:
+        ValueError: if some records number lines with `line` and others with `line_id`
+    """
+    out = Path(path)
+    out.mkdir(parents=True, exist_ok=True)
+    vocab: Dict[str, int] = {}
+    folios: Dict[str, int] = {}
+    token_id = array('i')
+    line = array('q')
+    token_index = array('i')
+    folio_id = array('i')
+    bbox = array('i')
+    line_field = None
+    has_bbox = False
+
+    for i, rec in enumerate(records):
+        field = 'line_id' if 'line_id' in rec else 'line' if 'line' in rec else None
+        if field and field != line_field:
+            if line_field is not None:
+                raise ValueError(f"Token record {i} has a '{field}' field but earlier records use '{line_field}'")
+            line_field = field
+        box = rec.get('bbox')
+        if box is not None and not has_bbox:
+            # earlier records had no box
+            has_bbox = True
+            bbox.extend([-1] * (4 * len(token_id)))
+        tok = rec.get('token', '')
+        token_id.append(vocab.setdefault(tok, len(vocab)))
+        value = rec.get(field) if field else None
+        line.append(NO_LINE if value is None else int(value))
+        token_index.append(int(rec.get('token_index') or 0))
+        folio = rec.get('folio')
+        folio_id.append(-1 if folio is None else folios.setdefault(str(folio), len(folios)))
+        if has_bbox:
+            bbox.extend(int(v) for v in (box if box is not None else (-1, -1, -1, -1)))
+
+    n = len(token_id)
+    np.save(out / 'token_id.npy', np.frombuffer(token_id, dtype=np.int32) if n else np.zeros(0, np.int32))
+    np.save(out / 'line.npy', np.frombuffer(line, dtype=np.int64) if n else np.zeros(0, np.int64))
+    np.save(out / 'token_index.npy', np.frombuffer(token_index, dtype=np.int32) if n else np.zeros(0, np.int32))
+    np.save(out / 'folio_id.npy', np.frombuffer(folio_id, dtype=np.int32) if n else np.zeros(0, np.int32))
+    if has_bbox:
+        np.save(out / 'bbox.npy', np.frombuffer(bbox, dtype=np.int32).reshape(n, 4))
+    elif (out / 'bbox.npy').exists():
+        (out / 'bbox.npy').unlink()
+
+    with (out / 'vocab.json').open('w', encoding='utf-8') as fh:
+        json.dump(list(vocab), fh, ensure_ascii=False)
+    with (out / 'folios.json').open('w', encoding='utf-8') as fh:
+        json.dump(list(folios), fh, ensure_ascii=False)
+    meta = {'version': STORE_VERSION, 'count': n, 'line_field': line_field or 'line', 'has_bbox': bool(has_bbox)}
+    with (out / 'meta.json').open('w', encoding='utf-8') as fh:
+        json.dump(meta, fh, indent=2)
+    return n
+
+
+class TokenStore:
+    """Read-only view over a columnar token store."""
+
+    def __init__(self, path, mmap: bool = True):
+        self.path = Path(path)
+        with (self.path / 'meta.json').open('r', encoding='utf-8') as fh:
+            self.meta = json.load(fh)
+        if self.meta.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported token store version {self.meta.get('version')} in {self.path}")
+        with (self.path / 'vocab.json').open('r', encoding='utf-8') as fh:
+            self.vocab: List[str] = json.load(fh)
+        with (self.path / 'folios.json').open('r', encoding='utf-8') as fh:
+            self.folios: List[str] = json.load(fh)
+        mode = 'r' if mmap else None
+        self.token_id = np.load(self.path / 'token_id.npy', mmap_mode=mode)
+        self.line = np.load(self.path / 'line.npy', mmap_mode=mode)
+        self.token_index = np.load(self.path / 'token_index.npy', mmap_mode=mode)
+        self.folio_id = np.load(self.path / 'folio_id.npy', mmap_mode=mode)
+        self.bbox = np.load(self.path / 'bbox.npy', mmap_mode=mode) if self.meta.get('has_bbox') else None
+        self.line_field = self.meta.get('line_field', 'line')
+
+    def __len__(self) -> int:
+        return int(self.meta.get('count', len(self.token_id)))
+
+    def to_dataframe(self, bbox: bool = True):
+        """DataFrame with categorical `token`/`folio` columns (no per-row strings).
+
+        Stores with boxes get a `bbox` column of [x, y, w, h] lists (None where
+        a record had no box), as when the JSONL is loaded; `bbox=False` skips
+        building those per-row lists. Missing line numbers are NaN.
+        """
+        import pandas as pd
+
+        line = np.asarray(self.line)
+        missing = line == NO_LINE
+        if missing.any():
+            line = np.where(missing, np.nan, line)
+        data = {
+            'token': pd.Categorical.from_codes(np.asarray(self.token_id), categories=self.vocab),
+            self.line_field: line,
+            'token_index': np.asarray(self.token_index),
+        }
+        if self.folios:
+            data['folio'] = pd.Categorical.from_codes(np.asarray(self.folio_id), categories=self.folios)
+        if bbox and self.bbox is not None:
+            data['bbox'] = pd.Series(self.bbox_rows(), dtype=object)
+        return pd.DataFrame(data)
+
+    def bbox_rows(self) -> List[List[int] | None]:
+        """Per-record [x, y, w, h] boxes, None for records stored without one."""
+        boxes = np.asarray(self.bbox)
+        rows = boxes.tolist()
+        for i in np.flatnonzero((boxes == -1).all(axis=1)).tolist():
+            rows[i] = None
+        return rows
+
+    def iter_records(self, folio: str | None = None) -> Iterator[Dict[str, Any]]:
+        """Yield dict records shaped like the JSONL the store was built from.
+
+        With `folio`, only that folio's records are read from the arrays.
+        """
+        vocab = self.vocab
+        folios = self.folios
+        if folio is None:
+            rows = slice(None)
+        elif str(folio) in folios:
+            rows = np.flatnonzero(np.asarray(self.folio_id) == folios.index(str(folio)))
+        else:
+            return
+        token_id, line = self.token_id[rows], self.line[rows]
+        token_index, folio_id = self.token_index[rows], self.folio_id[rows]
+        bbox = None
+        if self.bbox is not None:
+            boxes = np.asarray(self.bbox[rows])
+            bbox = boxes.tolist()
+            no_box = (boxes == -1).all(axis=1).tolist()
+        for i, (tid, ln, ti, fid) in enumerate(zip(token_id.tolist(), line.tolist(),
+                                                   token_index.tolist(), folio_id.tolist())):
+            rec: Dict[str, Any] = {'token': vocab[tid]}
+            if fid >= 0:
+                rec['folio'] = folios[fid]
+            if bbox is not None and not no_box[i]:
+                rec['bbox'] = bbox[i]
+            if ln != NO_LINE:
+                rec[self.line_field] = ln
+            rec['token_index'] = ti
+            yield rec
+
+
+def load_token_store(path, mmap: bool = True) -> TokenStore:
+    return TokenStore(path, mmap=mmap)
+
+
+def read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert per-token JSONL into a columnar token store')
+    parser.add_argument('input', help='Token or token-coordinate JSONL')
+    parser.add_argument('-o', '--output', help='Output store directory (default: input with .tokens suffix)')
+    args = parser.parse_args()
+    out = args.output or os.path.splitext(args.input)[0] + STORE_SUFFIX
+    n = write_token_store(read_jsonl(args.input), out)
+    print(f'Wrote {n} token records to {out}')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,10 +6,15 @@ Output: JSONL where each record is a token with fields:
   - line: original line number
   - token_index: position of token in the line (1-based)
   - token: the token string
-  - raw: original raw line (for reference)
+  - raw: original raw line (for reference); omitted with `--raw ref`, in
+    which case `line` is the key into the input JSONL (see `load_raw_lines`)
+
+Records are streamed to disk as they are produced. With `--format store` the
+output is a columnar, memory-mappable token store (see `token_store.py`).
 
 Usage:
   python3 src/ingest/tokenize.py data/processed/transcription.jsonl -o data/processed/tokens.jsonl
+  python3 src/ingest/tokenize.py data/processed/transcription.jsonl -o data/processed/tokens.jsonl --raw ref
 """
 import argparse
 import json
@@ -31,30 +36,63 @@ def read_jsonl(path):
 
 def write_jsonl(records, path):
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    n = 0
     with open(path, "w", encoding="utf-8") as f:
         for r in records:
             f.write(json.dumps(r, ensure_ascii=False) + "\n")
+            n += 1
+    return n
+
+
+def load_raw_lines(path):
+    """Map `line` -> `raw` from a normalized JSONL, to resolve `--raw ref` tokens."""
+    return {rec.get("line"): rec.get("raw", "") for rec in read_jsonl(path)}
+
+
+def tokenize_text(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def token_records(line_no, raw, tokens):
+    """Yield one token record per token of a single line; `raw=None` omits it."""
+    for i, t in enumerate(tokens, start=1):
+        if raw is None:
+            yield {"line": line_no, "token_index": i, "token": t}
+        else:
+            yield {"line": line_no, "token_index": i, "token": t, "raw": raw}
+
+
+def iter_token_records(records, include_raw=True):
+    for rec in records:
+        tokens = tokenize_text(rec.get("text", ""))
+        raw = rec.get("raw", "") if include_raw else None
+        yield from token_records(rec.get("line"), raw, tokens)
 
 
-def tokenize_jsonl(input_path, output_path):
-    out = []
-    for rec in read_jsonl(input_path):
-        line_no = rec.get("line")
-        raw = rec.get("raw", "")
-        text = rec.get("text", "")
-        tokens = TOKEN_RE.findall(text.lower())
-        for i, t in enumerate(tokens, start=1):
-            out.append({"line": line_no, "token_index": i, "token": t, "raw": raw})
-    write_jsonl(out, output_path)
-    print(f"Wrote {len(out)} token records to {output_path}")
+def tokenize_jsonl(input_path, output_path, raw="inline", fmt="jsonl"):
+    if fmt == "store":
+        try:
+            from .token_store import write_token_store
+        except ImportError:
+            from token_store import write_token_store
+        records = iter_token_records(read_jsonl(input_path), include_raw=False)
+        n = write_token_store(records, output_path)
+    else:
+        records = iter_token_records(read_jsonl(input_path), include_raw=(raw == "inline"))
+        n = write_jsonl(records, output_path)
+    print(f"Wrote {n} token records to {output_path}")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Tokenize normalized JSONL into per-token JSONL")
     parser.add_argument("input", help="Path to normalized JSONL (with `text` field)")
     parser.add_argument("-o", "--output", default="data/processed/tokens.jsonl", help="Output tokens JSONL path")
+    parser.add_argument("--raw", choices=["inline", "ref"], default="inline",
+                        help="Copy the raw line into every token (inline) or reference it by `line` (ref)")
+    parser.add_argument("--format", dest="fmt", choices=["jsonl", "store"], default="jsonl",
+                        help="Write per-token JSONL or a columnar token store directory")
     args = parser.parse_args()
-    tokenize_jsonl(args.input, args.output)
+    tokenize_jsonl(args.input, args.output, raw=args.raw, fmt=args.fmt)
 
 
 if __name__ == "__main__":
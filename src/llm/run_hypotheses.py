@@ -81,9 +81,14 @@ def read_inputs(path: Path) -> Iterable[str]:
             yield fh.read()
 
 
-def generate_records(input_path: Path, model_name: str | None = None, run_id: str | None = None):
-    run_id = run_id or make_run_id()
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
+def build_records(texts: Iterable[str], model_name: str | None = None, run_id: str | None = None, input_file: str = '') -> list:
+    """Generate hypothesis records for already-loaded input texts."""
+    return stamp_records(generate_responses(texts, model_name=model_name), model_name=model_name, run_id=run_id,
+                         input_file=input_file)
+
+
+def generate_responses(texts: Iterable[str], model_name: str | None = None) -> list:
+    """Hypothesis records for `texts` without provenance, so they can be cached across runs."""
     records = []
 
     generator = None
@@ -92,7 +97,7 @@ def generate_records(input_path: Path, model_name: str | None = None, run_id: st
         if generator is None:
             print('Warning: requested local model', model_name, 'but transformers or model not available. Falling back to rule-based generator.')
 
-    for txt in read_inputs(input_path):
+    for txt in texts:
         if generator:
             try:
                 resp = generator(txt)
@@ -106,15 +111,29 @@ def generate_records(input_path: Path, model_name: str | None = None, run_id: st
             'response': resp,
             'model': model_name or 'local-rule',
         }
-        rec = enrich_record(rec, run_id=run_id, input_file=str(input_path), model=model_name or 'local-rule')
         records.append(rec)
+    return records
+
 
-    with OUT_PATH.open('w', encoding='utf-8') as fh:
+def stamp_records(records: list, model_name: str | None = None, run_id: str | None = None, input_file: str = '') -> list:
+    """Attach the provenance metadata of one run to every record."""
+    run_id = run_id or make_run_id()
+    return [enrich_record(rec, run_id=run_id, input_file=input_file, model=model_name or 'local-rule') for rec in records]
+
+
+def write_records(records: list, out_path: Path = OUT_PATH) -> Path:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with out_path.open('w', encoding='utf-8') as fh:
         for r in records:
             fh.write(json.dumps(r, ensure_ascii=False) + '\n')
 
-    print('Wrote', len(records), 'hypothesis records to', OUT_PATH)
-    return OUT_PATH
+    print('Wrote', len(records), 'hypothesis records to', out_path)
+    return out_path
+
+
+def generate_records(input_path: Path, model_name: str | None = None, run_id: str | None = None):
+    records = build_records(read_inputs(input_path), model_name=model_name, run_id=run_id, input_file=str(input_path))
+    return write_records(records)
 
 
 def main(argv=None):
@@ -0,0 +1,137 @@
+"""Content-addressed cache for pipeline stage outputs.
+
+Stage outputs are pickled under `cache_dir` keyed by a SHA-256 over the stage
+name and its fingerprinted inputs (file hashes, normalization options,
+parameters). Downstream stages chain the upstream key into their own, so
+editing one input only invalidates the stages that actually depend on it.
+
+The cache is bounded by `max_bytes`; least recently used entries are evicted
+after each write.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+# bump when a stage's output format or logic changes to invalidate old entries (comparison
+# scores are also keyed on compare_corpora.scoring_params, which carries SCORE_VERSION)
+CACHE_VERSION = 3
+
+_digest_memo: Dict[Tuple[str, int, int], str] = {}
+
+
+def file_digest(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, memoized on (path, mtime, size)."""
+    st = path.stat()
+    memo_key = (str(path.resolve()), st.st_mtime_ns, st.st_size)
+    if memo_key in _digest_memo:
+        return _digest_memo[memo_key]
+    h = hashlib.sha256()
+    with path.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            h.update(chunk)
+    _digest_memo[memo_key] = h.hexdigest()
+    return _digest_memo[memo_key]
+
+
+def stage_key(stage: str, *parts: Any) -> str:
+    payload = json.dumps([CACHE_VERSION, stage, *parts], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class StageCache:
+    """Pickle-backed key/value store for stage outputs.
+
+    Args:
+        cache_dir: Directory holding cached entries; None disables caching
+        max_bytes: Total size above which least recently used entries are evicted
+        force: Recompute every stage and overwrite existing entries
+    """
+
+    def __init__(self, cache_dir: Path | None, max_bytes: int = 512 * 1024 * 1024, force: bool = False):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.max_bytes = max_bytes
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f'{key}.pkl'
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        if not self.cache_dir or self.force:
+            return False, None
+        p = self._path(key)
+        try:
+            with p.open('rb') as fh:
+                value = pickle.load(fh)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return False, None
+        # refresh mtime so eviction is least-recently-used
+        os.utime(p)
+        return True, value
+
+    def put(self, key: str, value: Any):
+        if not self.cache_dir:
+            return
+        p = self._path(key)
+        tmp = p.with_suffix('.tmp')
+        with tmp.open('wb') as fh:
+            pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+        self.evict()
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], label: str = '') -> Any:
+        hit, value = self.get(key)
+        if hit:
+            self.hits += 1
+            if label:
+                print(f'cache hit: {label}')
+            return value
+        self.misses += 1
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def get_or_compute_many(self, keys: List[str], compute: Callable[[List[int]], List[Any]],
+                            labels: List[str] | None = None) -> List[Any]:
+        """`get_or_compute` for several keys whose misses are computed together.
+
+        `compute` receives the positions of the missing keys and returns their
+        values in that order.
+        """
+        values, missing = [], []
+        for i, key in enumerate(keys):
+            hit, value = self.get(key)
+            if hit:
+                self.hits += 1
+                if labels:
+                    print(f'cache hit: {labels[i]}')
+            else:
+                missing.append(i)
+            values.append(value)
+        if missing:
+            self.misses += len(missing)
+            for i, value in zip(missing, compute(missing)):
+                self.put(keys[i], value)
+                values[i] = value
+        return values
+
+    def evict(self):
+        entries = []
+        total = 0
+        for p in self.cache_dir.glob('*.pkl'):
+            st = p.stat()
+            entries.append((st.st_mtime, st.st_size, p))
+            total += st.st_size
+        entries.sort()
+        for _, size, p in entries:
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
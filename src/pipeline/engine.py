@@ -0,0 +1,187 @@
+"""In-process pipeline engine.
+
+Each stage is a plain function that receives the `Corpus` produced by the
+previous one, so a transcription is read, normalized and tokenized exactly once
+per run. Nothing is written to disk until `write_artifacts` is called.
+
+Stages: ingest -> tokenize -> metrics -> hypotheses -> compare -> aggregate.
+When a `StageCache` is given, each stage is keyed on its fingerprinted inputs
+and skipped if a cached output exists; comparison is cached per corpus file.
+"""
+from __future__ import annotations
+import inspect
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from ..ingest.ingest import iter_lines, iter_records, normalize_text, write_jsonl
+from ..ingest.tokenize import token_records, tokenize_text
+from ..analysis import report_metrics
+from ..analytics.vocab import Vocabulary, count_keys, ngram_counter, ngram_keys, unigram_counter, unigram_counts
+from ..compare import compare_corpora
+from ..compare.embeddings import EmbeddingService
+from ..compare.profiles import ProfileStore
+from ..llm import aggregate_hypotheses, run_hypotheses
+from ..utils.experiment_logger import make_run_id
+from .cache import StageCache, file_digest, stage_key
+
+
+@dataclass
+class Corpus:
+    """A normalized transcription held in memory between stages.
+
+    `ids` is the flat token stream encoded with `vocab`; `unigrams`/`bigrams`
+    are string-keyed views for callers that still compare dictionaries.
+    """
+    source: Path
+    records: List[Dict[str, Any]]
+    tokens: List[List[str]] = field(default_factory=list)
+    vocab: Vocabulary = field(default_factory=Vocabulary)
+    ids: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=np.int32))
+
+    @property
+    def lines(self) -> List[str]:
+        return [r['text'] for r in self.records]
+
+    @property
+    def unigrams(self) -> Counter:
+        return unigram_counter(self.vocab, unigram_counts(self.ids, len(self.vocab)))
+
+    @property
+    def bigrams(self) -> Counter:
+        keys, counts = count_keys(ngram_keys(self.ids, 2, len(self.vocab)))
+        return ngram_counter(self.vocab, keys, counts, 2)
+
+
+@dataclass
+class PipelineResult:
+    corpus: Corpus
+    metrics: dict | None = None
+    hypotheses: list | None = None
+    comparison: list | None = None
+    comparison_meta: dict | None = None
+
+
+def stage_ingest(path: Path, **norm_kwargs) -> Corpus:
+    return Corpus(source=Path(path), records=list(iter_records(iter_lines(str(path)), **norm_kwargs)))
+
+
+def stage_tokenize(corpus: Corpus) -> Corpus:
+    corpus.tokens = [tokenize_text(r['text']) for r in corpus.records]
+    corpus.vocab = Vocabulary()
+    corpus.ids = corpus.vocab.encode(t for toks in corpus.tokens for t in toks)
+    return corpus
+
+
+def stage_metrics(corpus: Corpus) -> dict:
+    return report_metrics.metrics_from_ids(len(corpus.records), corpus.vocab, corpus.ids)
+
+
+def stage_hypotheses(corpus: Corpus, model_name: str | None = None, run_id: str | None = None,
+                     cache: StageCache | None = None, corpus_key: str = '') -> list:
+    """Hypothesis records for every line, stamped with this run.
+
+    With a cache, the responses are keyed on `corpus_key` and the model; the
+    cache holds them without provenance.
+    """
+    cache = cache or StageCache(None)
+    responses = cache.get_or_compute(
+        stage_key('hypotheses', corpus_key, model_name),
+        lambda: run_hypotheses.generate_responses(corpus.lines, model_name=model_name), label='hypotheses')
+    return run_hypotheses.stamp_records(responses, model_name=model_name, run_id=run_id,
+                                        input_file=str(corpus.source))
+
+
+def stage_compare(corpus: Corpus, corpora_dir: Path, run_id: str | None = None, voynich_source: str | None = None,
+                  cache: StageCache | None = None, corpus_key: str = '', profiles: ProfileStore | None = None,
+                  embedder: EmbeddingService | None = None):
+    """Score every corpus file against the in-memory Voynich counts.
+
+    Returns `(meta, results)`; `results` is None when `corpora_dir` is missing.
+    With a cache, each corpus is keyed on `corpus_key` plus its file hash so
+    only edited or new corpora are re-scored, together in one batch; corpora
+    that are re-scored are read from `profiles` when stored there. One `embedder` (model load, Voynich
+    sample encoding) is shared by every corpus. The cache holds scores only;
+    provenance is attached for this run.
+    """
+    run_id = run_id or make_run_id()
+    voynich_source = voynich_source or str(corpus.source)
+    cache = cache or StageCache(None)
+    profiles = profiles or ProfileStore(None)
+    meta = {
+        'run_id': run_id,
+        'voynich_source': voynich_source,
+        'corpora_dir': str(corpora_dir),
+    }
+    if not corpora_dir.is_dir():
+        print('No corpora directory at', corpora_dir, '- skipping comparison')
+        return meta, None
+    voy = compare_corpora.VoynichCounts(corpus.vocab, corpus.ids)
+    lines = corpus.lines
+    embedder = embedder or EmbeddingService()
+    # scoring code version and options, so changed compare logic is never served from the cache
+    params = compare_corpora.scoring_params(embedder)
+    files = compare_corpora.corpus_files(corpora_dir)
+    keys = [stage_key('compare', corpus_key, f.stem, file_digest(f), voynich_source, params) for f in files]
+
+    def score_missing(missing):
+        # one batched divergence pass over every corpus that is not cached
+        todo = [files[i] for i in missing]
+        return compare_corpora.corpus_details(todo, [profiles.get(f) for f in todo], voy, lines,
+                                              embedder=embedder, profiles=profiles)
+
+    details = cache.get_or_compute_many(keys, score_missing, labels=[f'compare[{f.stem}]' for f in files])
+    return meta, [compare_corpora.stamp_detail(d, run_id, voynich_source) for d in details]
+
+
+def normalization_params(norm_kwargs: dict) -> dict:
+    """Resolve normalization options against `normalize_text` defaults."""
+    params = {k: p.default for k, p in inspect.signature(normalize_text).parameters.items()
+              if p.default is not inspect.Parameter.empty}
+    params.update(norm_kwargs)
+    return params
+
+
+def run_pipeline(input_path: Path, corpora_dir: Path, processed_dir: Path, model_name: str | None = None,
+                 cache: StageCache | None = None, profiles: ProfileStore | None = None,
+                 embedder: EmbeddingService | None = None, **norm_kwargs) -> PipelineResult:
+    """Run every stage in memory; call `write_artifacts` to persist the result."""
+    run_id = make_run_id()
+    cache = cache or StageCache(None)
+
+    ingest_key = stage_key('ingest', file_digest(Path(input_path)), normalization_params(norm_kwargs))
+    tok_key = stage_key('tokenize', ingest_key)
+    corpus = cache.get_or_compute(
+        tok_key, lambda: stage_tokenize(stage_ingest(input_path, **norm_kwargs)), label='ingest+tokenize')
+    result = PipelineResult(corpus=corpus)
+    result.metrics = cache.get_or_compute(
+        stage_key('metrics', tok_key), lambda: stage_metrics(corpus), label='metrics')
+    result.hypotheses = stage_hypotheses(corpus, model_name, run_id, cache=cache, corpus_key=ingest_key)
+    result.comparison_meta, result.comparison = stage_compare(
+        corpus, corpora_dir, run_id=run_id, voynich_source=str(processed_dir / 'voynich_run.jsonl'),
+        cache=cache, corpus_key=tok_key, profiles=profiles, embedder=embedder)
+    return result
+
+
+def write_artifacts(result: PipelineResult, processed_dir: Path, reports_dir: Path):
+    """Write every stage output, then aggregate the hypothesis logs."""
+    corpus = result.corpus
+    write_jsonl(corpus.records, str(processed_dir / 'voynich_run.jsonl'))
+    print(f"Wrote {len(corpus.records)} records to {processed_dir / 'voynich_run.jsonl'}")
+
+    tok_records = (tr for rec, toks in zip(corpus.records, corpus.tokens)
+                   for tr in token_records(rec.get('line'), rec.get('raw', ''), toks))
+    write_jsonl(tok_records, str(processed_dir / 'voynich_run_tokens.jsonl'))
+    print(f"Wrote {sum(len(t) for t in corpus.tokens)} token records to {processed_dir / 'voynich_run_tokens.jsonl'}")
+
+    if result.metrics is not None:
+        report_metrics.save_results(result.metrics, reports_dir)
+    if result.hypotheses is not None:
+        run_hypotheses.write_records(result.hypotheses, reports_dir / 'hypotheses' / 'run_hypotheses.jsonl')
+    if result.comparison is not None:
+        compare_corpora.write_comparison(result.comparison, reports_dir / 'comparison', result.comparison_meta)
+
+    aggregate_hypotheses.aggregate()
@@ -1,46 +1,54 @@
 #!/usr/bin/env python3
 """Orchestrate a full experiment run: ingest -> tokenize -> metrics -> hypotheses -> compare -> aggregate.
 
-This script calls existing utilities and writes a lightweight final report pointer.
-It prefers existing scripts in `src/` and will fail fast if any step errors.
+All stages run in this interpreter (see `src/pipeline/engine.py`) and share one
+in-memory corpus; artifacts are written once every stage has finished.
+Stage outputs are cached under `.cache/pipeline` keyed by input hashes and
+parameters, so unchanged inputs are not recomputed (`--force` to override).
+Reference corpora are profiled once into `.cache/profiles` (keyed by file hash)
+and sentence embeddings are cached in `.cache/embeddings`.
+Any stage error propagates and aborts the run before artifacts are written.
 """
 from __future__ import annotations
-import subprocess
+import argparse
 import sys
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[2]
 
-def run(cmd, cwd=None):
-    print('>',' '.join(cmd))
-    p = subprocess.run(cmd, cwd=cwd or str(ROOT))
-    if p.returncode != 0:
-        raise SystemExit(p.returncode)
+if __package__ in (None, ''):
+    sys.path.insert(0, str(ROOT))
+from src.compare.embeddings import EmbeddingService
+from src.compare.profiles import ProfileStore
+from src.pipeline.cache import StageCache
+from src.pipeline.engine import run_pipeline, write_artifacts
 
 
 def main(argv=None):
-    # default inputs/outputs
-    example = ROOT / 'example_transcription.txt'
-    processed = ROOT / 'data' / 'processed'
-
-    # 1) ingest
-    run([sys.executable, str(ROOT / 'src' / 'ingest' / 'ingest.py'), str(example), '-o', str(processed / 'voynich_run.jsonl')])
-
-    # 2) tokenize
-    run([sys.executable, str(ROOT / 'src' / 'ingest' / 'tokenize.py'), str(processed / 'voynich_run.jsonl'), '-o', str(processed / 'voynich_run_tokens.jsonl')])
-
-    # 3) metrics
-    run([sys.executable, str(ROOT / 'src' / 'analysis' / 'report_metrics.py'), '--input', str(processed / 'voynich_run.jsonl'), '--out', str(ROOT / 'reports')])
-
-    # 4) hypotheses (LLM or rule)
-    run([sys.executable, str(ROOT / 'src' / 'llm' / 'run_hypotheses.py'), str(processed / 'voynich_run.jsonl')])
-
-    # 5) compare corpora (use all files in data/corpora)
-    run([sys.executable, str(ROOT / 'src' / 'compare' / 'compare_corpora.py'), '--voynich', str(processed / 'voynich_run.jsonl'), '--corpora', str(ROOT / 'data' / 'corpora'), '--out', str(ROOT / 'reports' / 'comparison')])
-
-    # 6) aggregate hypotheses
-    run([sys.executable, str(ROOT / 'src' / 'llm' / 'aggregate_hypotheses.py')])
+    parser = argparse.ArgumentParser(description='Run the full Voynich experiment pipeline in-process')
+    parser.add_argument('--input', default=str(ROOT / 'example_transcription.txt'), help='Transcription text file')
+    parser.add_argument('--corpora', default=str(ROOT / 'data' / 'corpora'), help='Directory of reference corpora')
+    parser.add_argument('--model', default=None, help='Optional local model for hypothesis generation')
+    parser.add_argument('--cache-dir', default=str(ROOT / '.cache' / 'pipeline'), help='Stage cache directory')
+    parser.add_argument('--cache-max-mb', type=int, default=512, help='Evict least recently used entries above this size')
+    parser.add_argument('--profiles-dir', default=str(ROOT / '.cache' / 'profiles'), help='Corpus profile store')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the stage cache, profile and embedding stores')
+    parser.add_argument('--force', action='store_true', help='Recompute every stage and refresh the cache')
+    args = parser.parse_args(argv)
 
+    processed = ROOT / 'data' / 'processed'
+    reports = ROOT / 'reports'
+
+    cache = StageCache(None if args.no_cache else Path(args.cache_dir),
+                       max_bytes=args.cache_max_mb * 1024 * 1024, force=args.force)
+    profiles = ProfileStore(None if args.no_cache else Path(args.profiles_dir))
+    embedder = EmbeddingService(cache_dir=None if args.no_cache else ROOT / '.cache' / 'embeddings')
+    result = run_pipeline(Path(args.input), Path(args.corpora), processed, model_name=args.model,
+                          cache=cache, profiles=profiles, embedder=embedder)
+    write_artifacts(result, processed, reports)
+
+    if cache.cache_dir:
+        print(f'\nStage cache: {cache.hits} hits, {cache.misses} misses ({cache.cache_dir})')
     print('\nFull pipeline finished. Important artifacts:')
     print('- reports/experiment_metrics.json')
     print('- reports/hypotheses/hypotheses_aggregated.jsonl')
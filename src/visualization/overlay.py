@@ -5,6 +5,10 @@ This module expects:
 - a token->coords JSONL at `data/processed/token_coords.jsonl` with records:
   {"token": "daiin", "folio": "f001r", "bbox": [x,y,w,h], "line_id": 123, "token_index": 4}
 
+A columnar token store built from it (`data/processed/token_coords.tokens`,
+see `src/ingest/token_store.py`) is used instead when it is at least as new
+as the JSONL; records are then read from its arrays one folio at a time.
+
 If token_coords is missing, the module will report what is required.
 """
 from pathlib import Path
@@ -13,17 +17,30 @@ import json
 from collections import defaultdict
 from PIL import Image, ImageDraw, ImageFont
 import random
+import sys
+
+import numpy as np
+
+try:
+    from ..ingest.token_store import TokenStore, load_token_store, store_is_current
+except ImportError:
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+    from src.ingest.token_store import TokenStore, load_token_store, store_is_current
 
 
 # Always use project root, regardless of where script is called from
 ROOT = Path(__file__).resolve().parents[2]
 IM_DIR = ROOT / 'data' / 'external' / 'images'
 COORDS = ROOT / 'data' / 'processed' / 'token_coords.jsonl'
+COORDS_STORE = ROOT / 'data' / 'processed' / 'token_coords.tokens'
 OUT = ROOT / 'reports' / 'figures' / 'overlays'
 OUT.mkdir(parents=True, exist_ok=True)
 
 
 def load_coords():
+    """Coordinate records: the token store if it is current, else a list of dicts."""
+    if store_is_current(COORDS_STORE, COORDS):
+        return load_token_store(COORDS_STORE)
     if not COORDS.exists():
         print('No token_coords.jsonl found at', COORDS)
         return []
@@ -37,6 +54,21 @@ def load_coords():
     return recs
 
 
+def coords_folios(coords) -> List[Any]:
+    """Folios that have coordinate records, in sorted order."""
+    if isinstance(coords, TokenStore):
+        return sorted(coords.folios)
+    # records without a folio cannot be placed on an image
+    return sorted({r['folio'] for r in coords if r.get('folio') is not None})
+
+
+def folio_records(coords, folio: str) -> List[Dict[str, Any]]:
+    """Coordinate records of one folio, from a record list or a token store."""
+    if isinstance(coords, TokenStore):
+        return list(coords.iter_records(folio=folio))
+    return [r for r in coords if str(r.get('folio')) == str(folio)]
+
+
 def generate_color_palette(n: int, seed: int = 42) -> List[tuple]:
     """Generate n visually distinct colors."""
     random.seed(seed)
@@ -72,7 +104,7 @@ def overlays_for_folio(
     
     Args:
         folio: Folio identifier (e.g., '1r', '103v')
-        coords: List of coordinate records
+        coords: List of coordinate records or a TokenStore
         out_dir: Output directory for overlay images
         image_dir: Directory containing manuscript images
         color_by_token: If True, color boxes by token; else use single color
@@ -100,7 +132,7 @@ def overlays_for_folio(
             font = None
 
     # Get colors for tokens
-    folio_coords = [r for r in coords if str(r.get('folio')) == str(folio)]
+    folio_coords = folio_records(coords, folio)
     if not folio_coords:
         print(f'No coordinates found for folio {folio}')
         return None
@@ -143,7 +175,7 @@ def overlays_for_folio(
         meta = {
             'folio': folio,
             'image': str(img_p),
-            'coords_source': str(COORDS),
+            'coords_source': str(coords.path if isinstance(coords, TokenStore) else COORDS),
             'output': str(out_p),
             'num_tokens': len(folio_coords),
             'unique_tokens': len(set(r.get('token') for r in folio_coords)),
@@ -202,10 +234,10 @@ def generate_all_overlays(limit: int = 10, **kwargs):
         **kwargs: Additional arguments passed to overlays_for_folio
     """
     recs = load_coords()
-    if not recs:
+    if not len(recs):
         print('No coords to generate overlays.')
         return
-    folios = sorted({r.get('folio') for r in recs})
+    folios = coords_folios(recs)
     print(f'Generating overlays for {len(folios)} folios (limit={limit})')
     count = 0
     outputs = []
@@ -220,29 +252,56 @@ def generate_all_overlays(limit: int = 10, **kwargs):
     return outputs
 
 
-def generate_summary_report(coords: List[Dict[str, Any]], out_dir: Path = OUT):
-    """Generate a summary report of overlay statistics."""
-    if not coords:
-        return
-    
-    # Statistics
-    folios = defaultdict(list)
-    for rec in coords:
-        folios[rec.get('folio')].append(rec)
-    
+def summarize_store(store: TokenStore) -> Dict[str, Any]:
+    """Overlay statistics computed on the store's arrays."""
+    token_id = np.asarray(store.token_id)
+    folio_id = np.asarray(store.folio_id)
+    line = np.asarray(store.line)
     report = {
-        'total_tokens': len(coords),
-        'unique_tokens': len(set(r.get('token') for r in coords)),
-        'folios': len(folios),
+        'total_tokens': len(store),
+        'unique_tokens': len(np.unique(token_id)),
+        'folios': 0,
         'folio_stats': {}
     }
+    fids, first = np.unique(folio_id, return_index=True)
+    report['folios'] = len(fids)
+    # folios in order of first appearance, as when grouping the records
+    for fid in fids[np.argsort(first)].tolist():
+        rows = folio_id == fid
+        report['folio_stats'][store.folios[fid] if fid >= 0 else None] = {
+            'tokens': int(rows.sum()),
+            'unique_tokens': len(np.unique(token_id[rows])),
+            'lines': len(np.unique(line[rows]))
+        }
+    return report
+
+
+def generate_summary_report(coords, out_dir: Path = OUT):
+    """Generate a summary report of overlay statistics."""
+    if not len(coords):
+        return
     
-    for folio, folio_coords in folios.items():
-        report['folio_stats'][folio] = {
-            'tokens': len(folio_coords),
-            'unique_tokens': len(set(r.get('token') for r in folio_coords)),
-            'lines': len(set(r.get('line_id') for r in folio_coords))
+    if isinstance(coords, TokenStore):
+        report = summarize_store(coords)
+    else:
+        # Statistics
+        folios = defaultdict(list)
+        for rec in coords:
+            folios[rec.get('folio')].append(rec)
+        
+        report = {
+            'total_tokens': len(coords),
+            'unique_tokens': len(set(r.get('token') for r in coords)),
+            'folios': len(folios),
+            'folio_stats': {}
         }
+        
+        for folio, folio_coords in folios.items():
+            report['folio_stats'][folio] = {
+                'tokens': len(folio_coords),
+                'unique_tokens': len(set(r.get('token') for r in folio_coords)),
+                'lines': len(set(r.get('line_id') for r in folio_coords))
+            }
     
     # Write report
     report_path = out_dir / 'overlay_summary.json'
@@ -263,7 +322,7 @@ if __name__ == '__main__':
     
     # Load coordinates
     coords = load_coords()
-    if not coords:
+    if not len(coords):
         print('ERROR: No coordinates found. Run src/ingest/generate_token_coords.py first.')
         sys.exit(1)
     
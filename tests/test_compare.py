@@ -0,0 +1,168 @@
+import json
+import random
+import sys
+import types
+import zlib
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.compare import compare_corpora, compare_languages  # noqa: E402
+from src.compare.embeddings import EmbeddingService, sample_key  # noqa: E402
+from src.compare.profiles import ProfileStore  # noqa: E402
+
+
+class StubEncoder:
+    """Deterministic stand-in for a SentenceTransformer: one seeded vector per text."""
+
+    def __init__(self, dim=8):
+        self.dim = dim
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        return np.array([np.random.default_rng(zlib.crc32(t.encode("utf-8"))).normal(size=self.dim)
+                         for t in texts])
+
+
+def stub_sentence_transformers(monkeypatch):
+    """Install a fake `sentence_transformers` module; returns the encoders it creates."""
+    created = []
+
+    def SentenceTransformer(name):
+        created.append(StubEncoder())
+        return created[-1]
+
+    fake = types.SimpleNamespace(SentenceTransformer=SentenceTransformer)
+    monkeypatch.setitem(sys.modules, "sentence_transformers", fake)
+    return created
+
+
+def write_corpora(root, n=4, seed=5):
+    rng = random.Random(seed)
+    words = ["".join(rng.choice("aeiodlnrsty") for _ in range(rng.randint(1, 6))) for _ in range(120)]
+    root.mkdir(parents=True, exist_ok=True)
+    for i in range(n):
+        lines = [" ".join(rng.choices(words[i * 15:], k=rng.randint(1, 12))) for _ in range(rng.randint(20, 300))]
+        (root / f"c{i}.txt").write_text("\n".join(lines), encoding="utf-8")
+    return words
+
+
+def read_outputs(out_dir):
+    return {p.name: p.read_bytes() for p in sorted(out_dir.iterdir()) if p.is_file()}
+
+
+def test_parallel_comparison_matches_serial_byte_for_byte(tmp_path, monkeypatch):
+    words = write_corpora(tmp_path / "corpora")
+    rng = random.Random(1)
+    voynich = tmp_path / "voynich.jsonl"
+    voynich.write_text("\n".join(json.dumps({"text": " ".join(rng.choices(words[:40], k=9))}) for _ in range(60)),
+                       encoding="utf-8")
+    # pin the provenance fields so two runs can be compared byte for byte
+    enrich = compare_corpora.enrich_record
+    monkeypatch.setattr(compare_corpora, "make_run_id", lambda: "run")
+    monkeypatch.setattr(compare_corpora, "enrich_record", lambda r, **kw: enrich(dict(r, timestamp="t"), **kw))
+    stub_sentence_transformers(monkeypatch)
+    written = []
+    write_detail = compare_corpora.write_detail
+
+    def record_detail(detail, out_dir):
+        written.append((detail["corpus"], (out_dir / "summary.csv").exists()))
+        write_detail(detail, out_dir)
+
+    monkeypatch.setattr(compare_corpora, "write_detail", record_detail)
+
+    outputs = {}
+    for jobs in (1, 2):
+        written.clear()
+        out = tmp_path / f"out{jobs}"
+        compare_corpora.compare(voynich, tmp_path / "corpora", out, profiles_dir=tmp_path / f"profiles{jobs}",
+                                jobs=jobs, bootstrap=20)
+        outputs[jobs] = read_outputs(out)
+        # each detail file is written once as its corpus is scored, then once more with its intervals,
+        # all before the summaries
+        assert sorted(written[:4]) == [(f"c{i}", False) for i in range(4)] and len(written) == 8
+        assert not any(summary for _, summary in written)
+    assert {"summary.csv", "summary_ci.csv", "c0_details.json"} <= set(outputs[1])
+    assert json.loads(outputs[1]["c0_details.json"])["embedding_similarity"] is not None
+    assert outputs[2] == outputs[1]
+
+
+def test_parallel_language_comparison_matches_serial_byte_for_byte(tmp_path, monkeypatch):
+    words = write_corpora(tmp_path / "data" / "corpora", seed=9)
+    monkeypatch.setattr(compare_languages, "ROOT", tmp_path)
+    monkeypatch.setattr(compare_languages, "load_terms", lambda: words[:60])
+    written = []
+    write_csv = compare_languages.write_corpus_csv
+
+    def record_csv(corpus, results):
+        written.append((corpus.name, (compare_languages.OUT / "compare_report.json").exists()))
+        write_csv(corpus, results)
+
+    monkeypatch.setattr(compare_languages, "write_corpus_csv", record_csv)
+
+    outputs = {}
+    runs = {1: [], 2: ["--profiles", "store"], 3: ["--no-profiles"]}
+    for jobs, store_args in runs.items():
+        written.clear()
+        out = tmp_path / f"out{jobs}"
+        out.mkdir()
+        monkeypatch.setattr(compare_languages, "OUT", out)
+        compare_languages.main(["--jobs", str(jobs), "--ci"] + store_args)
+        outputs[jobs] = read_outputs(out)
+        assert sorted(written) == [(f"c{i}.txt", False) for i in range(4)]
+    assert set(outputs[1]) == {"compare_report.json"} | {f"c{i}_summary.csv" for i in range(4)}
+    assert outputs[2] == outputs[1] and outputs[3] == outputs[1]
+    # relative store paths are under ROOT; --no-profiles stores nothing
+    assert len(list((tmp_path / ".cache" / "profiles").glob("*.pkl"))) == 4
+    assert len(list((tmp_path / "store").glob("*.pkl"))) == 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".cache", "data", "out1", "out2", "out3", "store"]
+
+
+def test_embedding_service_loads_once_and_caches_on_disk(tmp_path, monkeypatch):
+    created = stub_sentence_transformers(monkeypatch)
+    v_texts = ["qokeedy daiin", "shedy qokain", "ol chedy"]
+    c_texts = ["arma virumque", "cano troiae", "qui primus", "ab oris"]
+
+    service = EmbeddingService("stub-model", cache_dir=tmp_path / "emb")
+    service.prefetch([v_texts, c_texts, v_texts])
+    sim = service.similarity(v_texts, c_texts)
+    assert service.similarity(v_texts, c_texts) == sim
+    # one model per service and one batched encode for both samples
+    assert service.loads == 1 and len(created) == 1 and len(created[0].calls) == 1
+    assert service.encoded == len(v_texts) + len(c_texts)
+    assert (tmp_path / "emb" / f"{sample_key('stub-model', c_texts)}.npy").exists()
+
+    # the centroid dot product is the mean pairwise cosine
+    v, c = service.embed(v_texts), service.embed(c_texts)
+    v, c = v / np.linalg.norm(v, axis=1, keepdims=True), c / np.linalg.norm(c, axis=1, keepdims=True)
+    assert sim == pytest.approx(float((v @ c.T).mean()), abs=1e-12)
+
+    # a new run reads the disk cache instead of encoding; another model does not
+    again = EmbeddingService("stub-model", cache_dir=tmp_path / "emb")
+    assert again.similarity(v_texts, c_texts) == sim and again.encoded == 0
+    other = EmbeddingService("other-model", cache_dir=tmp_path / "emb")
+    other.embed(c_texts)
+    assert other.encoded == len(c_texts)
+
+    corpus = tmp_path / "latin.txt"
+    corpus.write_text("\n".join(c_texts), encoding="utf-8")
+    store = ProfileStore(tmp_path / "profiles")
+    profile = store.get(corpus)
+    assert again.profile_centroid(profile, store) == pytest.approx(again.centroid(c_texts))
+    assert ProfileStore(tmp_path / "profiles").get(corpus).centroids["stub-model"] == profile.centroids["stub-model"]
+
+
+def test_parallel_comparison_stores_centroids(tmp_path, monkeypatch):
+    stub_sentence_transformers(monkeypatch)
+    write_corpora(tmp_path / "corpora", n=3)
+    voynich = tmp_path / "voynich.jsonl"
+    voynich.write_text(json.dumps({"text": "qokeedy daiin"}), encoding="utf-8")
+    compare_corpora.compare(voynich, tmp_path / "corpora", tmp_path / "out", profiles_dir=tmp_path / "profiles",
+                            model_name="stub-model", jobs=2)
+    store = ProfileStore(tmp_path / "profiles")
+    for f in sorted((tmp_path / "corpora").iterdir()):
+        assert "stub-model" in store.get(f).centroids
+    assert store.built == 0
@@ -0,0 +1,84 @@
+import json
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analytics.divergence import jensen_shannon  # noqa: E402
+from src.compare.compare_corpora import (compare_groups, counter_to_prob, js_divergence,  # noqa: E402
+                                         read_voynich_groups, voynich_counts)
+from src.compare.corpus_index import CorpusIndex, profile_features, text_features  # noqa: E402
+from src.compare.profiles import ProfileStore  # noqa: E402
+
+
+def test_index_ranks_corpora_by_exact_jsd_and_round_trips(tmp_path):
+    rng = random.Random(3)
+    files = []
+    for i in range(12):
+        alphabet = rng.sample("abcdefghijklmnopqrstuvwxyz", 8)
+        words = ["".join(rng.choices(alphabet, k=rng.randint(1, 6))) for _ in range(60)]
+        f = tmp_path / f"c{i:02d}.txt"
+        f.write_text("\n".join(" ".join(rng.choices(words, k=8)) for _ in range(40)), encoding="utf-8")
+        files.append(f)
+    (tmp_path / "empty.txt").write_text("", encoding="utf-8")
+    files.append(tmp_path / "empty.txt")
+
+    records = [{"token": t, "folio": f"f{line % 3}r", "line_id": line, "token_index": j}
+               for line in range(30) for j, t in enumerate(files[line % 3].read_text().split()[:5])]
+    coords = tmp_path / "coords.jsonl"
+    coords.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    groups = read_voynich_groups(coords, "folio")
+    assert list(groups) == ["f0r", "f1r", "f2r"] and len(groups["f0r"]) == 10
+
+    store = ProfileStore(None)
+    index = CorpusIndex.build(files, store)
+    index.set_centroids("m", [np.eye(len(files))[i] if i % 2 else None for i in range(len(files))])
+    index.save(tmp_path / "idx")
+    loaded = CorpusIndex.load(tmp_path / "idx")
+    corpus_feats = [profile_features(store.get(f)) for f in files[:-1]]
+    for feature in ("char2", "char4", "bigram"):
+        ranked = loaded.query_lines(groups, feature, k=20)
+        assert ranked == index.query_lines(groups, feature, k=20)
+        for g, lines in groups.items():
+            q = text_features(lines)[feature]
+            expected = {path.stem: jensen_shannon(q, feats[feature]) for path, feats in zip(files, corpus_feats)}
+            assert dict(ranked[g]) == pytest.approx(expected, abs=1e-12)
+            scores = [jsd for _, jsd in ranked[g]]
+            assert scores == sorted(scores) and ranked[g][0][0] == f"c0{g[1]}"
+    assert loaded.query_embedding([np.eye(len(files))[3]], k=2)[0][0] == ("c03", pytest.approx(1.0))
+
+
+def test_group_matrix_matches_per_group_scoring(tmp_path):
+    rng = random.Random(5)
+    words = ["daiin", "chedy", "ol", "qokeedy", "arma", "virum", "cano", "the", "and"]
+    corpora = tmp_path / "corpora"
+    corpora.mkdir()
+    for i in range(4):
+        (corpora / f"c{i}.txt").write_text(" ".join(rng.choices(words[i:], k=300)), encoding="utf-8")
+    (corpora / "empty.txt").write_text("", encoding="utf-8")
+    records = [{"text": " ".join(rng.choices(words, k=6)), "folio": f"f{i % 5}v"} for i in range(40)]
+    records.append({"text": "", "folio": "blank"})
+    voynich = tmp_path / "v.jsonl"
+    voynich.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+
+    out = tmp_path / "out"
+    matrices = compare_groups(voynich, corpora, out, "folio")
+    saved = np.load(out / "folio_jsd.npz")
+    groups = read_voynich_groups(voynich, "folio")
+    assert list(saved["groups"]) == list(groups) == [f"f{i}v" for i in range(5)]
+    assert list(saved["corpora"]) == ["c0", "c1", "c2", "c3", "empty"]
+    store = ProfileStore(None)
+    for gi, lines in enumerate(groups.values()):
+        uni, bi = voynich_counts(lines)
+        for ci, f in enumerate(sorted(corpora.iterdir())[:4]):
+            prof = store.get(f)
+            assert matrices["unigram"][gi, ci] == pytest.approx(
+                js_divergence(counter_to_prob(uni), counter_to_prob(prof.unigrams)), abs=1e-12)
+            assert matrices["bigram"][gi, ci] == pytest.approx(
+                js_divergence(counter_to_prob(bi), counter_to_prob(prof.bigrams)), abs=1e-12)
+    assert np.isnan(matrices["unigram"][:, 4]).all()
+    assert np.allclose(saved["unigram"], matrices["unigram"], atol=1e-6, equal_nan=True)
+    assert (out / "folio_jsd_bigram.png").exists() and (out / "folio_nearest.csv").read_text().count("\n") == 6
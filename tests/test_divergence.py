@@ -0,0 +1,109 @@
+import math
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analytics.bootstrap import bootstrap_jsd, bootstrap_similarity  # noqa: E402
+from src.analytics.divergence import SparseCounts, compare_mappings, divergences, jensen_shannon  # noqa: E402
+from src.analytics.vocab import Vocabulary  # noqa: E402
+
+
+def random_counts(rng, keys, k):
+    return {key: rng.randint(1, 50) for key in rng.sample(keys, k)}
+
+
+def reference(p, q):
+    tp, tq = sum(p.values()), sum(q.values())
+    p = {k: v / tp for k, v in p.items()}
+    q = {k: v / tq for k, v in q.items()}
+    keys = set(p) | set(q)
+    m = {k: 0.5 * (p.get(k, 0.0) + q.get(k, 0.0)) for k in keys}
+
+    def kl(a, b):
+        if any(b.get(k, 0.0) == 0 for k in a):
+            return math.inf
+        return sum(v * math.log2(v / b[k]) for k, v in a.items())
+
+    dot = sum(v * q.get(k, 0.0) for k, v in p.items())
+    return {
+        'jsd': 0.5 * (kl(p, m) + kl(q, m)),
+        'kl': kl(p, q),
+        'kl_reverse': kl(q, p),
+        'hellinger': math.sqrt(0.5 * sum((math.sqrt(p.get(k, 0.0)) - math.sqrt(q.get(k, 0.0))) ** 2 for k in keys)),
+        'cosine': dot / (math.sqrt(sum(v * v for v in p.values())) * math.sqrt(sum(v * v for v in q.values()))),
+    }
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_batch_matches_reference(seed):
+    rng = random.Random(seed)
+    keys = [f"k{i}" for i in range(200)]
+    ref = random_counts(rng, keys, 120)
+    others = [random_counts(rng, keys, rng.randint(1, 200)) for _ in range(8)]
+    others.append(dict(ref))
+    others.append({k: 3 * v for k, v in ref.items()} | {"extra": 5})
+
+    index = Vocabulary()
+    ref_counts = SparseCounts.from_mapping(ref, index)
+    other_counts = [SparseCounts.from_mapping(o, index) for o in others]
+    res = divergences(ref_counts, other_counts)
+    for i, other in enumerate(others):
+        expected = reference(ref, other)
+        for metric, value in expected.items():
+            assert res[metric][i] == pytest.approx(value, abs=1e-12)
+        # bit-identical to scoring the row on its own, so --jobs runs match serial ones
+        single = divergences(ref_counts, [other_counts[i]])
+        assert all(single[metric][0] == res[metric][i] for metric in res)
+    assert res['jsd'][len(others) - 2] == pytest.approx(0.0, abs=1e-12)
+
+
+def test_mapping_helpers_and_empty_inputs():
+    p = {"a": 0.5, "b": 0.5}
+    assert jensen_shannon(p, {"c": 1.0}) == pytest.approx(1.0)
+    assert jensen_shannon(p, {}) == pytest.approx(0.5)
+    assert jensen_shannon({}, {}) == 0.0
+    assert compare_mappings(p, {"a": 2})['kl_reverse'] == pytest.approx(1.0)
+    assert np.isinf(compare_mappings(p, {"a": 2})['kl'])
+    assert len(divergences(SparseCounts.from_mapping(p, Vocabulary()), [])['jsd']) == 0
+
+
+def test_pooled_bootstrap_matches_full_support_resampling():
+    rng = np.random.default_rng(0)
+    ref = SparseCounts(np.arange(40), rng.integers(1, 30, 40))
+    others = [SparseCounts(np.arange(i, i + 40), rng.integers(1, 30, 40)) for i in (5, 20, 35)]
+    res = bootstrap_jsd(ref, others, draws=2000, keep=True)
+    assert res["point"] == pytest.approx(divergences(ref, others, ("jsd",))["jsd"])
+    assert res["p_best"].sum() == pytest.approx(1.0) and res["p_best"][0] > 0.99
+    assert np.all(res["low"] < res["high"])
+
+    # full-support draws of the same pair give the same JSD distribution
+    brute = []
+    for _ in range(2000):
+        p = SparseCounts(ref.ids, rng.multinomial(int(ref.total), ref.probs()))
+        q = SparseCounts(others[1].ids, rng.multinomial(int(others[1].total), others[1].probs()))
+        brute.append(divergences(p, [q], ("jsd",))["jsd"][0])
+    assert res["samples"][:, 1].mean() == pytest.approx(np.mean(brute), abs=2e-3)
+    assert res["samples"][:, 1].std() == pytest.approx(np.std(brute), rel=0.1)
+
+    again = bootstrap_jsd(ref, others, draws=2000, keep=True, jobs=2, batch=300)
+    assert np.array_equal(again["samples"], res["samples"])
+
+
+def test_bootstrap_similarity_and_ties():
+    rng = np.random.default_rng(1)
+    u = np.eye(8)[0]
+    v = rng.normal(size=(30, 8)) + 2 * u
+    near, far = rng.normal(size=(25, 8)) + 2 * u, rng.normal(size=(20, 8)) - 2 * u
+    res = bootstrap_similarity(v, [near, far, None], draws=200)
+    unit = lambda e: (e / np.linalg.norm(e, axis=1, keepdims=True)).mean(0)  # noqa: E731
+    assert res["point"][:2] == pytest.approx([unit(v) @ unit(near), unit(v) @ unit(far)])
+    assert res["p_best"].tolist()[:2] == [1.0, 0.0] and np.isnan(res["point"][2])
+    assert res["low"][0] <= res["point"][0] <= res["high"][0]
+
+    ref = SparseCounts([0, 1], [5, 5])
+    disjoint = [SparseCounts([2], [3]), SparseCounts([3], [4])]
+    assert bootstrap_jsd(ref, disjoint, draws=50)["p_best"].tolist() == [0.5, 0.5]
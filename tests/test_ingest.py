@@ -0,0 +1,75 @@
+import json
+import random
+import sys
+from multiprocessing.pool import ThreadPool
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.ingest.ingest import bounded_imap, chunk_offsets, iter_records, process_file  # noqa: E402
+from src.ingest.tokenize import load_raw_lines, read_jsonl, tokenize_jsonl  # noqa: E402
+
+
+def make_transcription(path, n_lines=400, seed=7):
+    rng = random.Random(seed)
+    pieces = ["qokedy", "daiin", "<p>", "ol-shedy", "12", "?", "[unclear]", "chedy.", "İx", ""]
+    seps = ["\n", "\r\n", "\n", "\x0c"]
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for _ in range(n_lines):
+            f.write(" ".join(rng.choice(pieces) for _ in range(rng.randint(0, 6))) + rng.choice(seps))
+
+
+def test_parallel_ingest_matches_sequential(tmp_path):
+    src = tmp_path / "in.txt"
+    make_transcription(src)
+    seq = tmp_path / "seq.jsonl"
+    par = tmp_path / "par.jsonl"
+    process_file(str(src), str(seq))
+    process_file(str(src), str(par), workers=3, chunk_bytes=200)
+    assert len(chunk_offsets(str(src), 200)) > 3
+    assert seq.read_bytes() == par.read_bytes()
+
+
+def test_parallel_ingest_bounds_chunks_in_flight():
+    pulled = []
+
+    def tasks():
+        for i in range(50):
+            pulled.append(i)
+            yield i
+
+    with ThreadPool(3) as pool:
+        results = []
+        for value in bounded_imap(pool, lambda x: x * x, tasks(), limit=4):
+            # never more than `limit` tasks submitted ahead of the consumer
+            assert len(pulled) - len(results) <= 4
+            results.append(value)
+    assert results == [i * i for i in range(50)]
+
+
+def test_streaming_ingest_matches_whole_file_split(tmp_path):
+    src = tmp_path / "in.txt"
+    make_transcription(src)
+    out = tmp_path / "out.jsonl"
+    process_file(str(src), str(out))
+    expected = list(iter_records(src.read_text(encoding="utf-8").splitlines()))
+    written = [json.loads(ln) for ln in out.read_text(encoding="utf-8").splitlines()]
+    assert written == expected
+
+
+def test_raw_ref_tokens_resolve_to_ingest_records(tmp_path):
+    src = tmp_path / "in.txt"
+    make_transcription(src, seed=11)
+    lines = tmp_path / "lines.jsonl"
+    process_file(str(src), str(lines))
+    tokenize_jsonl(str(lines), str(tmp_path / "inline.jsonl"))
+    tokenize_jsonl(str(lines), str(tmp_path / "ref.jsonl"), raw="ref")
+
+    inline = list(read_jsonl(tmp_path / "inline.jsonl"))
+    ref = list(read_jsonl(tmp_path / "ref.jsonl"))
+    assert ref and all("raw" not in r for r in ref)
+    raw = load_raw_lines(lines)
+    by_line = {rec["line"]: rec for rec in read_jsonl(lines)}
+    assert len(raw) == len(by_line)
+    for r in ref:
+        assert raw[r["line"]] == by_line[r["line"]]["raw"]
+    assert [dict(r, raw=raw[r["line"]]) for r in ref] == inline
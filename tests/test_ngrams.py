@@ -0,0 +1,136 @@
+import json
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analytics.count_table import iter_count_table, read_count_table, write_count_table  # noqa: E402
+from src.analytics.ngrams import count_ngrams  # noqa: E402
+from src.analytics.sketch import NgramSketch, sketch_lines  # noqa: E402
+from src.analytics.stats import analyze, ngrams  # noqa: E402
+from src.analytics.vocab import encode_lines  # noqa: E402
+
+
+def random_lines(seed, n_lines=300, vocab_size=40):
+    rng = random.Random(seed)
+    words = [f"w{i}" for i in range(vocab_size)]
+    # skewed draws so there are plenty of ties and repeats
+    return [[words[min(int(rng.expovariate(0.3)), vocab_size - 1)] for _ in range(rng.randint(0, 9))]
+            for _ in range(n_lines)]
+
+
+def reference_counts(lines, n):
+    c = Counter()
+    for toks in lines:
+        c.update(" ".join(t) for t in ngrams(toks, n))
+    return c
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_engine_matches_reference_ngrams(seed):
+    lines = random_lines(seed)
+    vocab, ids, segments = encode_lines(lines)
+    counts = count_ngrams(ids, vocab, max_n=5, segments=segments)
+    for n in range(1, 6):
+        ref = reference_counts(lines, n)
+        got = counts[n].to_dict()
+        assert got == dict(ref)
+        # same insertion order, hence the same most_common tie order
+        assert list(got) == list(ref)
+        for k in (1, 5, 17, None):
+            assert counts[n].top(k) == ref.most_common(k)
+
+
+def test_engine_without_segments_spans_lines():
+    lines = [["a", "b"], ["c"], [], ["a", "b", "c"]]
+    vocab, ids, _ = encode_lines(lines)
+    counts = count_ngrams(ids, vocab, max_n=3)
+    flat = [t for toks in lines for t in toks]
+    assert counts[2].to_dict() == dict(Counter(" ".join(t) for t in ngrams(flat, 2)))
+    assert counts[3].to_dict() == dict(Counter(" ".join(t) for t in ngrams(flat, 3)))
+    assert count_ngrams(ids[:0], vocab, max_n=2)[2].top(3) == []
+
+
+def test_sketch_merge_matches_unsharded_counts():
+    lines = random_lines(3, n_lines=600)
+    whole = sketch_lines(lines, max_n=3)
+    a, b, c = (sketch_lines(part, batch_lines=50, max_n=3) for part in (lines[:100], lines[100:350], lines[350:]))
+    assert ((a + b) + c).to_dict() == (a + (b + c)).to_dict() == whole.to_dict()
+    for n in (1, 2, 3):
+        assert dict(whole.exact[n]) == dict(reference_counts(lines, n))
+    restored = NgramSketch.from_dict(whole.to_dict())
+    assert restored.entropy(1) == whole.entropy(1)
+    assert restored.top(2, 5) == whole.top(2, 5)
+
+
+def test_heavy_sketch_keeps_frequent_ngrams_within_bounds():
+    lines = random_lines(4, n_lines=2000, vocab_size=60)
+    exact = reference_counts(lines, 2)
+    shards = [sketch_lines(lines[i:i + 500], max_n=2, mode="heavy", capacity=50, width=1 << 10)
+              for i in range(0, len(lines), 500)]
+    merged = shards[0] + shards[1] + shards[2] + shards[3]
+    heavy = merged.heavy[2]
+    assert len(heavy.counts) <= 50
+    assert dict(merged.exact[1]) == dict(reference_counts(lines, 1))
+    for gram, true in exact.items():
+        assert true - heavy.error <= heavy.counts.get(gram, 0) <= true
+        assert merged.estimate(2, gram) >= true
+    # anything occurring more often than the error bound must survive as a candidate
+    assert {g for g, c in exact.items() if c > heavy.error} <= set(heavy.counts)
+
+
+def test_count_table_round_trip_and_top_k(tmp_path):
+    # multi-byte tokens so byte offsets and character offsets disagree
+    lines = [[t + "ė" * (len(t) % 3) + "語" * (t[-1] == "7") for t in toks] for toks in random_lines(5)]
+    vocab, ids, segments = encode_lines(lines)
+    counts = count_ngrams(ids, vocab, max_n=3, segments=segments)
+    path = str(tmp_path / "ngrams.tsv")
+    write_count_table(path, counts, chunk_rows=7)
+    for n in (1, 2, 3):
+        assert list(iter_count_table(path, n)) == counts[n].top(None)
+        assert read_count_table(path, n, top=10)[n] == counts[n].top(10)
+
+    write_count_table(path, counts, sort=False, min_count=3)
+    for n in (1, 2, 3):
+        assert dict(iter_count_table(path, n)) == {g: c for g, c in counts[n].items() if c >= 3}
+
+
+def test_json_output_honours_min_count_and_order(tmp_path):
+    lines = random_lines(6)
+    src = tmp_path / "lines.jsonl"
+    src.write_text("\n".join(json.dumps({"text": " ".join(toks)}) for toks in lines), encoding="utf-8")
+    vocab, ids, segments = encode_lines(lines)
+    counts = count_ngrams(ids, vocab, max_n=2, segments=segments)
+
+    # by default JSON keeps first-occurrence order and count tables are sorted
+    for sort in (None, True, False):
+        out = tmp_path / f"ngrams_{sort}.json"
+        res = analyze(str(src), str(out), max_n=2, min_count=3, sort=sort)
+        analyze(str(src), str(tmp_path / "ngrams.tsv"), max_n=2, min_count=3, sort=sort)
+        assert res["lines"] == len(lines) and res["tokens"] == len(ids)
+        tables = json.loads(out.read_text(encoding="utf-8"))
+        for n, name in ((1, "unigrams"), (2, "bigrams")):
+            ordered = [(g, c) for g, c in counts[n].items() if c >= 3]
+            ranked = [(g, c) for g, c in counts[n].top(None) if c >= 3]
+            assert list(tables[name].items()) == (ranked if sort else ordered)
+            table = list(iter_count_table(str(tmp_path / "ngrams.tsv"), n))
+            assert table == (ordered if sort is False else ranked)
+
+
+def test_encode_lines_reads_a_generator_once():
+    lines = random_lines(7)
+    seen = []
+
+    def stream():
+        for toks in lines:
+            seen.append(toks)
+            yield toks
+
+    vocab, ids, segments = encode_lines(stream())
+    expected = encode_lines(lines)
+    assert len(seen) == len(lines)
+    assert vocab.tokens == expected[0].tokens
+    assert ids.tolist() == expected[1].tolist() and segments.tolist() == expected[2].tolist()
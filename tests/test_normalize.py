@@ -0,0 +1,53 @@
+import itertools
+import random
+import re
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.ingest.ingest import normalize_text  # noqa: E402
+
+
+def reference_normalize(text, strip_html=True, remove_numbers=True, remove_uncertainty=True):
+    """The original sequential regex chain, kept as the parity oracle."""
+    if text is None:
+        return ""
+    s = text
+    if strip_html:
+        s = re.sub(r"<[^>]+>", " ", s)
+    if remove_uncertainty:
+        s = re.sub(r"[?*†()¶\[\]]", "", s)
+    s = s.replace("-", " ")
+    s = re.sub(r"[.,:;!\"'`/<>]", "", s)
+    if remove_numbers:
+        s = re.sub(r"\d+", " ", s)
+    s = re.sub(r"\\[ntbrf]", " ", s)
+    s = re.sub(r"[<>]", " ", s)
+    s = re.sub(r"/(?=[A-Za-z])", " ", s)
+    s = re.sub(r"\s+", " ", s).strip().lower()
+    return s
+
+
+# characters chosen to exercise every rule and their interactions
+ALPHABET = list("aqoKEdyn tbrf") + list("<>/\\-?*†()¶[].,:;!\"'`") + \
+    ["0", "7", "٣", "\t", "\n", " ", " ", "İ", "<p>", "</n>", "\\n"]
+
+OPTIONS = list(itertools.product([True, False], repeat=3))
+
+
+@pytest.mark.parametrize("strip_html,remove_numbers,remove_uncertainty", OPTIONS)
+def test_normalize_matches_reference(strip_html, remove_numbers, remove_uncertainty):
+    rng = random.Random(1234)
+    kw = dict(strip_html=strip_html, remove_numbers=remove_numbers, remove_uncertainty=remove_uncertainty)
+    for _ in range(3000):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 24)))
+        assert normalize_text(text, **kw) == reference_normalize(text, **kw), repr(text)
+
+
+def test_normalize_example_transcription():
+    root = Path(__file__).resolve().parents[1]
+    for line in (root / "example_transcription.txt").read_text(encoding="utf-8").splitlines():
+        assert normalize_text(line) == reference_normalize(line)
+    assert normalize_text(None) == ""
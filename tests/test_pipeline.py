@@ -0,0 +1,82 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.compare import compare_corpora  # noqa: E402
+from src.pipeline.cache import StageCache, stage_key  # noqa: E402
+from src.pipeline.engine import run_pipeline, stage_hypotheses, stage_ingest, stage_tokenize  # noqa: E402
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def pipeline_inputs(tmp_path):
+    transcription = tmp_path / "transcription.txt"
+    shutil.copy(ROOT / "example_transcription.txt", transcription)
+    corpora = tmp_path / "corpora"
+    corpora.mkdir()
+    (corpora / "latin.txt").write_text("arma virumque cano troiae qui primus ab oris\n", encoding="utf-8")
+    (corpora / "english.txt").write_text("the quick brown fox jumps over the lazy dog\n", encoding="utf-8")
+    return transcription, corpora
+
+
+def test_cached_records_carry_the_current_run_id(tmp_path, monkeypatch):
+    transcription, corpora = pipeline_inputs(tmp_path)
+    cache = StageCache(tmp_path / "cache")
+
+    first = run_pipeline(transcription, corpora, tmp_path / "processed", cache=cache)
+    second = run_pipeline(transcription, corpora, tmp_path / "processed", cache=cache)
+    assert cache.hits >= 4
+
+    run_id = second.comparison_meta["run_id"]
+    assert run_id != first.comparison_meta["run_id"]
+    records = second.hypotheses + second.comparison
+    assert records and all(r["run_id"] == run_id for r in records)
+    assert all(r["timestamp"] >= max(f["timestamp"] for f in first.hypotheses + first.comparison) for r in records)
+    assert [r["jsd_unigram"] for r in second.comparison] == [r["jsd_unigram"] for r in first.comparison]
+
+    # a new scoring version re-scores every corpus but keeps the other stages cached
+    monkeypatch.setattr(compare_corpora, "SCORE_VERSION", compare_corpora.SCORE_VERSION + 1)
+    misses = cache.misses
+    run_pipeline(transcription, corpora, tmp_path / "processed", cache=cache)
+    assert cache.misses - misses == 2
+
+
+def test_editing_one_corpus_rescores_only_that_corpus(tmp_path):
+    transcription, corpora = pipeline_inputs(tmp_path)
+    cache = StageCache(tmp_path / "cache")
+    first = run_pipeline(transcription, corpora, tmp_path / "processed", cache=cache)
+
+    (corpora / "latin.txt").write_text("gallia est omnis divisa in partes tres\n", encoding="utf-8")
+    hits, misses = cache.hits, cache.misses
+    second = run_pipeline(transcription, corpora, tmp_path / "processed", cache=cache)
+    # ingest+tokenize, metrics, hypotheses and english come from the cache
+    assert (cache.hits - hits, cache.misses - misses) == (4, 1)
+    scores = {r["corpus"]: r["jsd_unigram"] for r in first.comparison}
+    rescored = {r["corpus"]: r["jsd_unigram"] for r in second.comparison}
+    assert rescored["english"] == scores["english"] and rescored["latin"] != scores["latin"]
+
+    # the hypotheses stage caches responses and stamps them per run
+    corpus = stage_tokenize(stage_ingest(transcription))
+    key = stage_key("test-corpus")
+    once = stage_hypotheses(corpus, run_id="once", cache=cache, corpus_key=key)
+    hits = cache.hits
+    again = stage_hypotheses(corpus, run_id="again", cache=cache, corpus_key=key)
+    assert cache.hits == hits + 1 and [r["run_id"] for r in again] == ["again"] * len(once)
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path):
+    cache = StageCache(tmp_path / "cache")
+    payload = b"x" * 1000
+    for i, key in enumerate("abc"):
+        cache.put(key, payload)
+        os.utime(cache._path(key), (1000 + i, 1000 + i))
+    assert cache.get("a") == (True, payload)  # a becomes the most recently used entry
+    cache.max_bytes = 3 * (cache._path("a").stat().st_size + 10)
+    cache.put("d", payload)
+    assert [cache.get(k)[0] for k in "abcd"] == [True, False, True, True]
+
+    cache.max_bytes = 0
+    cache.put("e", payload)
+    assert not list((tmp_path / "cache").glob("*.pkl"))
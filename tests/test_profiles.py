@@ -0,0 +1,152 @@
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analytics.divergence import jensen_shannon  # noqa: E402
+from src.compare.compare_corpora import (VoynichCounts, corpus_detail, corpus_details, counter_to_prob,  # noqa: E402
+                                         score_corpus, voynich_counts)
+from src.compare.compare_languages import (analyze_corpora, analyze_corpus, ngram_counts, topk_overlap,  # noqa: E402
+                                           voynich_profile)
+from src.compare.profiles import ProfileStore, build_profile, char_ngram_orders, profile_file  # noqa: E402
+
+
+def assert_same_profile(a, b):
+    assert vars(a).keys() == vars(b).keys()
+    for k, v in vars(a).items():
+        if isinstance(v, np.ndarray):
+            assert v.dtype == vars(b)[k].dtype and np.array_equal(v, vars(b)[k]), k
+        else:
+            assert v == vars(b)[k], k
+
+
+def test_profile_store_round_trip_and_invalidation(tmp_path):
+    corpus = tmp_path / "latin.txt"
+    corpus.write_text("Arma virumque cano, Troiae qui primus ab oris\nItaliam fato profugus\n\narma cano\n",
+                      encoding="utf-8")
+    store = ProfileStore(tmp_path / "profiles")
+    built = store.get(corpus)
+    loaded = ProfileStore(tmp_path / "profiles").get(corpus)
+    assert_same_profile(loaded, built)
+    assert list(loaded.unigrams) == list(built.unigrams)
+    assert loaded.unigrams["arma"] == 2 and loaded.bigrams["arma cano"] == 1
+    assert loaded.char_ngrams[2]["ar"] == 2
+    assert loaded.sample_lines[2] == ""
+
+    p_v = {"arma": 0.5, "cano": 0.5}
+    args = (["arma cano"], p_v, {"arma cano": 1.0}, "run", "voynich.jsonl")
+    stored, fresh = score_corpus(corpus, *args, profiles=store), score_corpus(corpus, *args)
+    stored.pop("timestamp", None)
+    fresh.pop("timestamp", None)
+    assert stored == fresh
+
+    corpus.write_text("alia verba\n", encoding="utf-8")
+    assert set(store.get(corpus).unigrams) == {"alia", "verba"}
+    assert store.built == 2 and len(list((tmp_path / "profiles").iterdir())) == 2
+
+
+def test_batched_scores_match_dictionary_scoring(tmp_path):
+    rng = random.Random(3)
+    words = ["".join(rng.choice("aeiodlnrsty") for _ in range(rng.randint(1, 5))) for _ in range(80)]
+    v_lines = [" ".join(rng.choices(words[:50], k=8)) for _ in range(40)]
+    files = [tmp_path / f"c{i}.txt" for i in range(4)] + [tmp_path / "empty.txt"]
+    for i, f in enumerate(files):
+        f.write_text("\n".join(" ".join(rng.choices(words[i * 10:], k=10)) for _ in range(30 if i < 4 else 0)),
+                     encoding="utf-8")
+    store = ProfileStore(None)
+    profiles = [store.get(f) for f in files]
+
+    for lines in (v_lines, []):
+        uni, bi = voynich_counts(lines)
+        p_v_uni, p_v_bi = counter_to_prob(uni), counter_to_prob(bi)
+        batched = corpus_details(files, profiles, VoynichCounts.from_lines(lines), lines, embed=False)
+        for f, prof, got in zip(files, profiles, batched):
+            expected = corpus_detail(f, prof, lines, p_v_uni, p_v_bi, embed=False)
+            for key in ("jsd_unigram", "jsd_bigram"):
+                assert got.pop(key) == pytest.approx(expected.pop(key), abs=1e-12)
+            assert got == expected
+
+
+def test_hoisted_voynich_profile_matches_per_corpus_counting(tmp_path):
+    rng = random.Random(7)
+    words = ["".join(rng.choice("aeiodlnrsty") for _ in range(rng.randint(1, 7))) for _ in range(300)]
+    voy_terms = ["qokeedy", "daiin", "chedy", "ol", "shedy", "okaiin", "dy"]
+    voy = voynich_profile(voy_terms)
+    for i in range(3):
+        corpus = tmp_path / f"c{i}.txt"
+        corpus.write_text("\n".join(" ".join(rng.choices(words, k=9)) for _ in range(200)), encoding="utf-8")
+        got = analyze_corpus(corpus, voy)
+        assert got == analyze_corpus(corpus, voy_terms)
+        text_words = corpus.read_text(encoding="utf-8").replace("\n", " ").split(" ")
+        for n in range(1, 5):
+            c_voy, c_corpus = ngram_counts(voy_terms, n), ngram_counts([w for w in text_words if w], n)
+            r = got[f"{n}gram"]
+            assert r["js_divergence"] == pytest.approx(jensen_shannon(c_voy, c_corpus), abs=1e-12)
+            pk = [x for x, _ in sorted(c_voy.items(), key=lambda t: -t[1])][:50]
+            qk = [x for x, _ in sorted(c_corpus.items(), key=lambda t: -t[1])][:50]
+            assert r["top50_overlap"] == len(set(pk) & set(qk)) / 50
+            assert r["example_common"] == [x for x in pk if x in qk][:20]
+            assert topk_overlap(c_voy, c_corpus) == (r["top50_overlap"], r["example_common"])
+    paths = sorted(tmp_path.glob("c*.txt"))
+    assert analyze_corpora(paths, voy) == [analyze_corpus(c, voy) for c in paths]
+
+
+def test_char_ngram_counts_match_window_loop():
+    rng = random.Random(5)
+    # the last alphabet is too large to pack 5 characters into an int64 key
+    for alphabet, size in (("aeiodlnr", 60), ("aÉéßİΣ", 60), ("".join(map(chr, range(0x4E00, 0x9FA0))), 3000)):
+        strings = ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 7))) for _ in range(size)]
+        weights = [rng.randint(1, 5) for _ in strings]
+        got = char_ngram_orders(strings, (1, 2, 3, 4, 5), weights)
+        for n, counts in got.items():
+            expected = Counter()
+            for s, w in zip(strings, weights):
+                s = s.lower()
+                for gram in ([s] if len(s) < n else [s[i:i + n] for i in range(len(s) - n + 1)]):
+                    expected[gram] += w
+            assert counts == expected and list(counts) == list(expected)
+
+
+def test_streaming_profile_matches_whole_text_and_samples_to_budget(tmp_path, monkeypatch):
+    rng = random.Random(11)
+    words = ["".join(rng.choice("aeiodlnrsty") for _ in range(rng.randint(1, 7))) for _ in range(200)]
+    lines = [" ".join(rng.choices(words, k=rng.randint(0, 12))) + rng.choice(["", ".", ", x"]) for _ in range(800)]
+    corpus = tmp_path / "big.txt"
+    corpus.write_text("\n".join(lines), encoding="utf-8")
+    whole = build_profile(corpus.read_text(encoding="utf-8"), "d")
+    # merge queued bigram counts after (nearly) every chunk
+    monkeypatch.setattr("src.compare.profiles.BIGRAM_MERGE_MIN", 1)
+    for chunk_chars in (1, 50, 4096):
+        streamed = profile_file(corpus, "d", chunk_chars=chunk_chars)
+        assert_same_profile(streamed, whole)
+        assert list(streamed.bigrams) == list(whole.bigrams)
+        assert list(streamed.char_ngrams[3]) == list(whole.char_ngrams[3])
+    assert whole.top_unigrams(15) == whole.unigrams.most_common(15)
+    assert whole.top_bigrams(15) == whole.bigrams.most_common(15)
+
+    budget = whole.n_tokens // 4
+    sampled = profile_file(corpus, "d", token_budget=budget, chunk_chars=500)
+    assert 0.15 < sampled.sample_fraction < 0.35 and abs(sampled.n_tokens - budget) < 150
+    assert (sampled.n_lines, sampled.sample_lines) == (whole.n_lines, whole.sample_lines)
+    # skipped chunks break the bigram chain, so sampling never invents a bigram
+    assert set(sampled.bigrams) <= set(whole.bigrams)
+    # the sample follows the token density instead of extrapolating from the first chunk
+    sparse = tmp_path / "sparse_head.txt"
+    sparse.write_text("\n".join(["-- ... --"] * 600 + lines), encoding="utf-8")
+    sampled = profile_file(sparse, "d", token_budget=budget, chunk_chars=500)
+    assert abs(sampled.n_tokens - budget) < 150
+    assert set(sampled.bigrams) <= set(whole.bigrams)
+    assert profile_file(corpus, "d", token_budget=whole.n_tokens, chunk_chars=500).n_tokens > 0.9 * whole.n_tokens
+
+    store = ProfileStore(tmp_path / "profiles")
+    assert store.get(corpus, 1000).token_budget == 1000 and store.get(corpus).token_budget is None
+    assert ProfileStore(tmp_path / "profiles").get(corpus, 1000).token_budget == 1000 and store.built == 2
+
+    got = analyze_corpus(corpus, voynich_profile(["qokeedy", "daiin", "dy"]), token_budget=1000, ci_draws=50)
+    for n in range(1, 5):
+        lo, hi = got[f"{n}gram"]["js_divergence_ci"]
+        assert 0 <= lo <= hi <= 1
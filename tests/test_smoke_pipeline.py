@@ -1,12 +1,15 @@
+import os
 import subprocess
 import sys
 from pathlib import Path
 
 
-def test_smoke_runs():
+def test_smoke_runs(tmp_path):
     root = Path(__file__).resolve().parents[1]
     sh = root / 'scripts' / 'smoke_run.sh'
     assert sh.exists(), 'smoke_run.sh missing'
-    # run smoke script
-    p = subprocess.run(["/bin/bash", str(sh)], cwd=str(root.parent))
+    # run smoke script, keeping its outputs out of the working tree
+    env = dict(os.environ, SMOKE_OUT_DIR=str(tmp_path))
+    p = subprocess.run(["/bin/bash", str(sh)], cwd=str(root.parent), env=env)
     assert p.returncode == 0, f"smoke script failed (code {p.returncode})"
+    assert (tmp_path / 'example_ngrams.json').stat().st_size > 0
@@ -0,0 +1,209 @@
+import json
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analysis.change_points import SegmentCost, pelt  # noqa: E402
+from src.analysis.temporal_evolution import TemporalAnalyzer  # noqa: E402
+
+
+def write_coords(path, seed=4, n_folios=30):
+    rng = random.Random(seed)
+    folios = [f"{n}{side}" for n in range(1, n_folios // 2 + 1) for side in "rv"]
+    rng.shuffle(folios)
+    records = []
+    for folio in folios + ["unnumbered"]:
+        words = [f"w{min(int(rng.expovariate(0.2)), 60)}" for _ in range(rng.randint(1, 80))]
+        records += [{"token": w, "folio": folio, "line_id": i // 8, "token_index": i} for i, w in enumerate(words)]
+    rng.shuffle(records)
+    path.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    return records
+
+
+def test_folio_statistics_match_per_folio_counting(tmp_path):
+    records = write_coords(tmp_path / "coords.jsonl")
+    analyzer = TemporalAnalyzer(str(tmp_path / "coords.jsonl"), str(tmp_path / "out"))
+    stats = analyzer.compute_folio_statistics()
+
+    by_folio = {}
+    for r in records:
+        by_folio.setdefault(r["folio"], []).append(r["token"])
+    order = sorted(by_folio, key=lambda f: analyzer.extract_folio_order(f)[0])
+    assert list(stats["folio"]) == order and order[0] == "unnumbered"
+    assert "tokens" not in stats
+    for row, folio in zip(stats.itertuples(), order):
+        counts = Counter(by_folio[folio])
+        top, freq = counts.most_common(1)[0]
+        assert (row.token_count, row.unique_tokens) == (len(by_folio[folio]), len(counts))
+        assert (row.most_common_token, row.most_common_freq) == (top, freq)
+        assert row.repetition_rate == pytest.approx(freq / len(by_folio[folio]))
+
+    overall = Counter(t for folio in order for t in by_folio[folio])
+    assert analyzer.most_common_tokens(8) == overall.most_common(8)
+    evo = analyzer.analyze_token_evolution("w3")
+    assert list(evo["evolution"]["absolute_count"]) == [Counter(by_folio[f])["w3"] for f in order]
+    assert analyzer.analyze_token_evolution("missing")["total_occurrences"] == 0
+
+
+def test_batch_token_evolution_matches_single_token_analysis(tmp_path):
+    write_coords(tmp_path / "coords.jsonl", seed=9)
+    analyzer = TemporalAnalyzer(str(tmp_path / "coords.jsonl"), str(tmp_path / "out"))
+    summary = analyzer.analyze_token_evolutions()
+    assert list(summary.index) == analyzer.vocab
+    tokens = analyzer.vocab[::3] + ["missing"]
+    freqs = analyzer.token_evolution_matrix(tokens)
+    counts = analyzer.token_evolution_matrix(tokens, relative=False)
+    assert list(freqs.columns) == list(analyzer.folio_stats["folio"])
+    for token in tokens:
+        single = analyzer.analyze_token_evolution(token)
+        evolution = single.pop("evolution")
+        assert list(freqs.loc[token]) == pytest.approx(list(evolution["frequency"]))
+        assert list(counts.loc[token]) == list(evolution["absolute_count"])
+        row = analyzer.analyze_token_evolutions([token]).iloc[0]
+        assert tuple(row) == (single["first_appearance"], single["last_appearance"],
+                              single["total_occurrences"], single["appears_in_folios"])
+        if token != "missing":
+            assert tuple(summary.loc[token]) == tuple(row)
+            present = evolution[evolution["absolute_count"] > 0]["folio"]
+            assert (single["first_appearance"], single["last_appearance"]) == (present.iloc[0], present.iloc[-1])
+    assert single["first_appearance"] is None and single["total_occurrences"] == 0
+
+
+def reference_shift(tokens1, tokens2):
+    c1, c2 = Counter(tokens1), Counter(tokens2)
+    union = sorted(set(c1) | set(c2))
+    p = np.array([c1[t] for t in union]) / len(tokens1)
+    q = np.array([c2[t] for t in union]) / len(tokens2)
+    m = (p + q) / 2
+    kl = lambda a: float(np.sum(a[a > 0] * np.log(a[a > 0] / m[a > 0])))  # noqa: E731
+    return (len(set(c1) & set(c2)) / len(union), 0.5 * kl(p) + 0.5 * kl(q),
+            len(c1), len(c2), len(set(c2) - set(c1)), len(set(c1) - set(c2)))
+
+
+def test_shift_scan_matches_window_by_window_counting(tmp_path, monkeypatch):
+    records = write_coords(tmp_path / "coords.jsonl", seed=13)
+    analyzer = TemporalAnalyzer(str(tmp_path / "coords.jsonl"), str(tmp_path / "out"))
+    stats = analyzer.compute_folio_statistics()
+    by_folio = {}
+    for r in records:
+        by_folio.setdefault(r["folio"], []).append(r["token"])
+    folios = list(stats["folio"])
+
+    # tiny blocks so the vocabulary is split across many column blocks
+    monkeypatch.setattr("src.analysis.temporal_evolution.SHIFT_BLOCK", 500)
+    scan = analyzer.scan_vocabulary_shifts([1, 3, 7])
+    for w in (1, 3, 7):
+        rows = scan[scan["window_size"] == w]
+        assert list(rows["position"]) == list(range(len(folios) - w))
+        for row in rows.itertuples():
+            i = row.position
+            first = [t for f in folios[i:i + w] for t in by_folio[f]]
+            second = [t for f in folios[i + w:i + 2 * w] for t in by_folio[f]]
+            assert (row.window_start, row.window_end) == (folios[i], folios[min(i + 2 * w, len(folios)) - 1])
+            expected = reference_shift(first, second)
+            got = (row.jaccard_similarity, row.jsd_distance, row.vocab_size_1, row.vocab_size_2,
+                   row.new_tokens, row.disappeared_tokens)
+            assert got == pytest.approx(expected, abs=1e-12)
+
+    single = analyzer.detect_vocabulary_shifts(3)
+    assert list(single.columns[:2]) == ["window_start", "window_end"]
+    assert single.equals(scan[scan["window_size"] == 3].drop(columns=["window_size", "position"])
+                         .reset_index(drop=True))
+    # memoized: asking again for computed sizes does not rescan
+    monkeypatch.setattr(analyzer, "_window_shifts", None)
+    assert analyzer.scan_vocabulary_shifts([7, 1]).equals(
+        pd.concat([scan[scan["window_size"] == 7], scan[scan["window_size"] == 1]], ignore_index=True))
+
+
+def optimal_segmentation(cost, penalty, min_size):
+    """O(n^2) dynamic program over all segmentations."""
+    n = cost.n_folios
+    best, last = [-penalty] + [np.inf] * n, [0] * (n + 1)
+    for t in range(min_size, n + 1):
+        for s in [0] + list(range(min_size, t - min_size + 1)):
+            value = best[s] + cost([s], [t])[0] + penalty
+            if value < best[t]:
+                best[t], last[t] = value, s
+    bounds, t = [], n
+    while last[t] > 0:
+        t = last[t]
+        bounds.append(t)
+    return sorted(bounds)
+
+
+def test_change_points_recover_planted_sections(tmp_path):
+    rng = np.random.default_rng(2)
+    vocab = [f"w{i}" for i in range(400)]
+    base = 1 / np.arange(1, 401)
+    sections = [(0, 24), (24, 50), (50, 80)]
+    records = []
+    for k, (start, end) in enumerate(sections):
+        p = 0.6 * base / base.sum() + 0.4 * np.roll(base, 40 * k) / base.sum()
+        for i in range(start, end):
+            folio = f"{i // 2 + 1}{'rv'[i % 2]}"
+            records += [{"token": vocab[j], "folio": folio} for j in rng.choice(400, rng.integers(40, 120), p=p)]
+    (tmp_path / "coords.jsonl").write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    analyzer = TemporalAnalyzer(str(tmp_path / "coords.jsonl"), str(tmp_path / "out"))
+
+    for method in ("binseg", "pelt"):
+        found = analyzer.detect_change_points(method)
+        assert sorted(found["position"]) == [24, 50]
+        assert list(found["folio"]) == [analyzer.folio_stats["folio"][p] for p in found["position"]]
+        assert list(found["rank"]) == [1, 2] and (found["score"] > 1).all()
+        assert found["gain"].is_monotonic_decreasing
+    assert "## Change Points" in analyzer.generate_timeline_report()
+    assert "## Change Points" not in analyzer.generate_timeline_report(change_points=False)
+
+    cost = SegmentCost(analyzer.folio_token_counts[:30])
+    for penalty in (50.0, 200.0, 800.0):
+        assert pelt(cost, penalty, 2) == optimal_segmentation(cost, penalty, 2)
+    # a boundary's gain is the token-weighted JSD of the two sides
+    left, right = (np.asarray(analyzer.folio_token_counts[a:b].sum(axis=0)).ravel() for a, b in ((0, 24), (24, 50)))
+    n = left.sum() + right.sum()
+    mix = (left + right) / n
+    kl = lambda c: float(np.sum(c[c > 0] * np.log(c[c > 0] / c.sum() / mix[c > 0])))  # noqa: E731
+    assert SegmentCost(analyzer.folio_token_counts[:50]).best_split(0, 50) == (24, pytest.approx(kl(left) + kl(right)))
+    assert analyzer.detect_change_points(penalty=1e9).empty
+
+
+def test_metrics_only_run_and_deferred_parallel_rendering(tmp_path, monkeypatch):
+    write_coords(tmp_path / "coords.jsonl", seed=21, n_folios=12)
+    figures = tmp_path / "out" / "figures"
+    analyzer = TemporalAnalyzer(str(tmp_path / "coords.jsonl"), str(figures), figure_format="svg", dpi=72)
+    monkeypatch.setattr(analyzer, "detect_change_points", lambda *a, **kw: pytest.fail("change points detected"))
+    report = analyzer.run_full_analysis(render=False, change_points=False)
+    assert (tmp_path / "out" / "timeline_analysis.md").read_text(encoding="utf-8") == report
+    # the figure directory is only created once figures are drawn
+    assert "`vocabulary_shifts.svg`" in report and not figures.exists()
+
+    paths = analyzer.render_figures(jobs=2, top_n=5)
+    assert paths == [figures / f"{name}.svg" for name in
+                     ("token_frequency_heatmap", "vocabulary_diversity_evolution", "vocabulary_shifts")]
+    assert all(p.read_text(encoding="utf-8").lstrip().startswith("<?xml") for p in paths)
+    with pytest.raises(ValueError):
+        analyzer.render_figures(["nope"])
+
+
+def test_rendering_keeps_the_backend_and_passes_annotate(tmp_path):
+    import matplotlib
+    write_coords(tmp_path / "coords.jsonl", seed=22, n_folios=8)
+    analyzer = TemporalAnalyzer(str(tmp_path / "coords.jsonl"), str(tmp_path / "figures"), figure_format="svg",
+                                dpi=72, annotate=False)
+    assert analyzer.figure_jobs(["token_frequency_heatmap"])[0][-1] == {"annotate": False}
+    assert analyzer.figure_jobs(["vocabulary_shifts"])[0][-1] == {}
+
+    backend = matplotlib.get_backend()
+    matplotlib.use("pdf")
+    try:
+        analyzer.visualize_token_frequency_evolution(top_n=3)
+        # in-process drawing leaves a notebook's (here: pdf) backend in place
+        assert matplotlib.get_backend() == "pdf"
+    finally:
+        matplotlib.use(backend)
+    assert (tmp_path / "figures" / "token_frequency_heatmap.svg").stat().st_size > 0
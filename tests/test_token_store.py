@@ -0,0 +1,86 @@
+import json
+import os
+import random
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from src.analysis.temporal_evolution import TemporalAnalyzer  # noqa: E402
+from src.ingest.token_store import TokenStore, write_token_store  # noqa: E402
+
+
+def make_coords(seed=3, n=300):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        rec = {"token": rng.choice(["daiin", "qokedy", "ol", "chedy", "shey"]),
+               "folio": f"{rng.randint(1, 6)}{rng.choice('rv')}", "line_id": i // 7, "token_index": i % 7}
+        # the first records have no box, so the schema cannot be read off record 0
+        if i >= 5 and rng.random() < 0.8:
+            rec["bbox"] = [rng.randint(0, 900), rng.randint(0, 900), rng.randint(5, 60), rng.randint(5, 30)]
+        if i % 50 == 49:
+            del rec["folio"]
+        records.append(rec)
+    return records
+
+
+def test_store_round_trip_keeps_every_field(tmp_path):
+    records = make_coords()
+    assert write_token_store(records, tmp_path / "coords.tokens") == len(records)
+    store = TokenStore(tmp_path / "coords.tokens")
+    assert store.line_field == "line_id" and store.bbox is not None
+    assert list(store.iter_records()) == records
+
+    df = store.to_dataframe()
+    expected = pd.DataFrame(records)
+    assert list(df["token"]) == list(expected["token"])
+    assert list(df["line_id"]) == list(expected["line_id"])
+    assert list(df["bbox"]) == [r.get("bbox") for r in records]
+    assert df["folio"].isna().sum() == expected["folio"].isna().sum()
+    assert "bbox" not in store.to_dataframe(bbox=False)
+
+    tokenizer_records = [{"line": i // 3, "token_index": i % 3, "token": "ol"} for i in range(9)]
+    # records without a line number keep not having one
+    del tokenizer_records[4]["line"]
+    write_token_store(tokenizer_records, tmp_path / "tok.tokens")
+    plain = TokenStore(tmp_path / "tok.tokens", mmap=False)
+    assert plain.bbox is None and list(plain.iter_records()) == tokenizer_records
+    assert plain.to_dataframe()["line"].isna().tolist() == [i == 4 for i in range(9)]
+
+
+def test_store_rejects_mixed_line_fields(tmp_path):
+    records = [{"token": "ol", "line_id": 1}, {"token": "daiin"}, {"token": "chedy", "line": 2}]
+    with pytest.raises(ValueError, match="line"):
+        write_token_store(records, tmp_path / "mixed.tokens")
+
+
+def test_analyzer_and_overlays_read_stores_like_jsonl(tmp_path, monkeypatch):
+    records = make_coords(seed=8, n=600)
+    jsonl = tmp_path / "coords.jsonl"
+    jsonl.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+    write_token_store(records, tmp_path / "coords.tokens")
+
+    from_jsonl = TemporalAnalyzer(str(jsonl), str(tmp_path / "a")).compute_folio_statistics()
+    from_store = TemporalAnalyzer(str(tmp_path / "coords.tokens"), str(tmp_path / "b")).compute_folio_statistics()
+    pd.testing.assert_frame_equal(from_store, from_jsonl)
+
+    from src.visualization import overlay
+    monkeypatch.setattr(overlay, "COORDS", jsonl)
+    monkeypatch.setattr(overlay, "COORDS_STORE", tmp_path / "coords.tokens")
+    store = overlay.load_coords()
+    assert isinstance(store, TokenStore)
+    assert overlay.coords_folios(store) == overlay.coords_folios(records)
+    for folio in overlay.coords_folios(records):
+        assert overlay.folio_records(store, folio) == overlay.folio_records(records, folio)
+    (tmp_path / "s").mkdir()
+    (tmp_path / "r").mkdir()
+    assert overlay.generate_summary_report(store, tmp_path / "s") == \
+        overlay.generate_summary_report(records, tmp_path / "r")
+
+    # a JSONL edited after the store was built is read instead of the stale store
+    later = (tmp_path / "coords.tokens" / "meta.json").stat().st_mtime + 10
+    os.utime(jsonl, (later, later))
+    assert overlay.load_coords() == records